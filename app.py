@@ -1,50 +1,315 @@
-from flask import Flask, render_template, request, redirect, jsonify
+from flask import (
+    Blueprint,
+    Flask,
+    Response,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    stream_with_context,
+)
 from dotenv import load_dotenv
-import google.generativeai as genai
-import requests
-from datetime import datetime, timedelta
+import contextvars
+import json
+import logging
 import os
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import joblib
-from geopy.distance import geodesic
-import pandas as pd
-import mysql.connector
-from flask_mail import Mail, Message
+from utils.chatbot import ChatbotBusy, ChatbotService, ChatbotTimeout
+from utils.coastline import DEFAULT_COASTLINE_PATH, CoastlineIndex
+from utils.db import SchemaOutOfDate, check_schema, database_configured, get_pool
+from utils.distance_raster import DEFAULT_RASTER_PATH, DistanceRaster
 from utils.email_templates import subscription_thank_you_message
+from utils.ingest import MonitoredRegions
+from utils.metrics import registry as metrics_registry, stage
+from utils.model_registry import (
+    DEFAULT_REGISTRY_PATH,
+    ModelRegistry,
+    ModelReloader,
+    ShadowScorer,
+    load_active_bundle,
+)
+from utils.outbox import OutboxWorker, enqueue_email
+from utils.prediction_cache import PredictionCache
+from utils.prediction import (
+    KMH_PER_KNOT,
+    describe_prediction,
+    format_predictions,
+    parse_ndjson,
+    parse_points,
+    predict_features,
+)
+from utils.risk_grid import (
+    DEFAULT_RISK_GRID_PATH,
+    METADATA_FILE as RISK_GRID_METADATA_FILE,
+    RiskGrid,
+)
+from utils.subscribers import upsert_subscriber
+from utils.track import (
+    chunked,
+    iter_track_points,
+    resample,
+    track_features,
+    with_forecast,
+)
+from utils.weather import WeatherClient, extract_weather_fields
+
+
+bp = Blueprint("main", __name__)
+logger = logging.getLogger(__name__)
+
+# Model artifacts. With gunicorn's preload_app these are loaded once in the
+# master process and shared copy-on-write by every forked worker.
+# `model_bundle` is the live model + preprocessor pair; request handlers read
+# it once so a hot swap never mixes versions. `model` and `preprocessor`
+# mirror it for scripts and benchmarks.
+model_bundle = None
+model = None
+preprocessor = None
+coastline_index = None
+distance_raster = None
+risk_grid = None
+risk_grid_stamp = None
+
+# Per-app services, set up by create_app()
+openweather_api_key = None
+GOOGLE_MAPS_API_KEY = None
+weather_client = None
+pipeline_executor = None
+chatbot = None
+outbox_worker = None
+prediction_cache = None
+model_reloader = None
+shadow_scorer = None
+monitored_regions = None
+
+
+def activate_model(bundle):
+    global model_bundle, model, preprocessor
+    # Plain reference assignments: requests already holding the old bundle
+    # finish with it, new requests pick up this one
+    model_bundle = bundle
+    model, preprocessor = bundle.model, bundle.preprocessor
+    if prediction_cache is not None:
+        prediction_cache.activate(cache_namespace(bundle))
+    check_risk_grid_model()
+
+
+def set_shadow_model(bundle):
+    global shadow_scorer
+    shadow_scorer = (
+        ShadowScorer(bundle, float(os.getenv("MODEL_SHADOW_SAMPLE_RATE", "0.1")))
+        if bundle is not None
+        else None
+    )
+
+
+def load_model_artifacts():
+    global coastline_index, distance_raster
+
+    # Versioned registry (utils/model_registry.py) when one has been set up,
+    # else the compiled forest or pickle under Models/. FAST_PREPROCESS runs
+    # preprocessing in NumPy with the fitted scaler parameters instead of a
+    # DataFrame + ColumnTransformer per request (verified equal at load)
+    activate_model(
+        load_active_bundle(
+            os.getenv("MODEL_REGISTRY_PATH", DEFAULT_REGISTRY_PATH),
+            fast_preprocess=os.getenv("FAST_PREPROCESS", "1") == "1",
+            compact_forest_path=os.getenv("COMPACT_FOREST_PATH", "Models/forest4"),
+        )
+    )
+    # Coastline points are indexed once for distance-to-land queries
+    coastline_index = CoastlineIndex.from_file(
+        os.getenv("COASTLINE_PATH", DEFAULT_COASTLINE_PATH)
+    )
+    # Precomputed raster (scripts/build_distance_raster.py), memory-mapped so
+    # workers share it; the coastline index covers points outside the grid
+    distance_raster_path = os.getenv("DISTANCE_RASTER_PATH", DEFAULT_RASTER_PATH)
+    distance_raster = (
+        DistanceRaster.load(distance_raster_path)
+        if os.path.exists(distance_raster_path)
+        else None
+    )
+    # Precomputed basin-wide predictions (scripts/build_risk_grid.py)
+    load_risk_grid()
+
+
+def load_risk_grid():
+    # (Re)load the grid when scripts/build_risk_grid.py has rewritten it since
+    # the last load; a grid caught mid-rebuild leaves the previous one in use
+    global risk_grid, risk_grid_stamp
+    path = os.getenv("RISK_GRID_PATH", DEFAULT_RISK_GRID_PATH)
+    try:
+        # The manifest is replaced by rename on every build, so its inode
+        # changes even for two builds within the same mtime tick
+        stat = os.stat(os.path.join(path, RISK_GRID_METADATA_FILE))
+    except OSError:
+        risk_grid = None
+        return None
+    stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if risk_grid is None or risk_grid_stamp != stamp:
+        try:
+            risk_grid = RiskGrid.load(path)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load risk grid %s: %s", path, e)
+        else:
+            risk_grid_stamp = stamp
+            check_risk_grid_model()
+    return risk_grid
+
+
+def check_risk_grid_model():
+    grid = risk_grid
+    if grid is not None and grid.model_version != model_bundle.version:
+        logger.warning(
+            "Risk grid was built with model %s but %s is active; rebuild it with "
+            "scripts/build_risk_grid.py",
+            grid.model_version, model_bundle.version,
+        )
+
+
+def create_app():
+    global openweather_api_key, GOOGLE_MAPS_API_KEY
+    global weather_client, pipeline_executor, chatbot, outbox_worker, prediction_cache
+    global model_reloader, monitored_regions
+
+    # Load environment variables from .env
+    load_dotenv()
+    app = Flask(__name__)
+
+    # LOG_LEVEL=DEBUG also logs request payloads; the default skips them
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    # Fraction of requests whose per-stage timings go into /metrics
+    metrics_registry.sample_rate = float(os.getenv("METRICS_SAMPLE_RATE", "1.0"))
+
+    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    openweather_api_key = os.getenv("openweather_api_key")
+    GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+
+    # Check if GEMINI_API_KEY is set (not needed for the offline stub backend)
+    if not GEMINI_API_KEY and os.getenv("GEMINI_BACKEND", "gemini") != "stub":
+        raise ValueError("GEMINI_API_KEY environment variable not set.")
+
+    if model_bundle is None:
+        load_model_artifacts()
+
+    # A database from an older release needs `python -m utils.subscribers
+    # migrate` before the app will serve against it
+    if database_configured():
+        try:
+            check_schema()
+        except SchemaOutOfDate:
+            raise
+        except Exception as e:
+            logger.warning("Could not check the database schema at startup: %s", e)
+
+    # Configure Flask-Mail (imported and initialised on first send)
+    app.config["MAIL_SERVER"] = os.getenv("MAIL_SERVER")
+    app.config["MAIL_PORT"] = os.getenv("MAIL_PORT")
+    app.config["MAIL_USE_TLS"] = os.getenv("MAIL_USE_TLS") == "True"
+    app.config["MAIL_USERNAME"] = os.getenv("MAIL_USERNAME")
+    app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD")
+
+    # Sends queued emails in batches over one SMTP connection, with retries;
+    # without a database there is no outbox to poll
+    outbox_worker = (
+        OutboxWorker(
+            get_pool,
+            app,
+            sender=os.getenv("MAIL_USERNAME"),
+            batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "50")),
+            poll_interval=float(os.getenv("OUTBOX_POLL_INTERVAL", "5")),
+            max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5")),
+        )
+        if database_configured()
+        else None
+    )
+
+    # Shared OpenWeather client: pooled session plus geohash/TTL response cache
+    weather_client = WeatherClient.from_env(openweather_api_key)
+    # Runs the independent stages of /assess alongside the weather request
+    pipeline_executor = ThreadPoolExecutor(
+        max_workers=int(os.getenv("PIPELINE_WORKERS", "8")), thread_name_prefix="pipeline"
+    )
+    # One Gemini client (created on first question), behind a bounded executor
+    chatbot = ChatbotService.from_env()
+    # Results for recently seen (quantized) feature vectors, kept apart per
+    # loaded model bundle
+    if os.getenv("PREDICTION_CACHE_ENABLED", "1") == "1":
+        prediction_cache = PredictionCache.from_env()
+        prediction_cache.activate(cache_namespace(model_bundle))
+
+    # Workers watch the registry and swap in newly promoted versions; before
+    # the first promotion they poll for the registry to appear
+    registry = ModelRegistry(
+        os.getenv("MODEL_REGISTRY_PATH", DEFAULT_REGISTRY_PATH),
+        fast_preprocess=os.getenv("FAST_PREPROCESS", "1") == "1",
+    )
+    model_reloader = ModelReloader(
+        registry,
+        on_activate=activate_model,
+        on_shadow=set_shadow_model,
+        active_version=model_bundle.version,
+        poll_interval=float(os.getenv("MODEL_RELOAD_INTERVAL", "10")),
+    )
+
+    # Latest snapshots written by the ingestion process (python -m utils.ingest)
+    if os.getenv("MONITORED_REGIONS_ENABLED", "1") == "1":
+        monitored_regions = MonitoredRegions.from_env()
+
+    app.register_blueprint(bp)
+    return app
+
+
+def metrics_route():
+    # Templated rule rather than the raw path keeps label cardinality bounded
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
 
 
-   
-app = Flask(__name__)
-# Load environment variables from .env
-load_dotenv()
-    
-    
-model = joblib.load("Models/best_random_forest_model4.pkl")
-preprocessor = joblib.load("Models/preprocessor4.pkl")
-# Configure Flask-Mail
-app.config["MAIL_SERVER"] = os.getenv("MAIL_SERVER")
-app.config["MAIL_PORT"] = os.getenv("MAIL_PORT")
-app.config["MAIL_USE_TLS"] = os.getenv("MAIL_USE_TLS") == "True"
-app.config["MAIL_USERNAME"] = os.getenv("MAIL_USERNAME")
-app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD")
-mail = Mail(app)
+@bp.before_app_request
+def start_request_metrics():
+    request.environ["metrics.started"] = time.perf_counter()
+    metrics_registry.begin_request(metrics_route())
 
 
+@bp.before_app_request
+def start_model_reloader():
+    if model_reloader is not None:
+        model_reloader.ensure_started()
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-openweather_api_key = os.getenv("openweather_api_key")
-GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 
+@bp.before_app_request
+def start_outbox_worker():
+    # Every worker drains the outbox, not just the ones that took a /subscribe
+    if outbox_worker is not None:
+        outbox_worker.ensure_started()
 
-# Check if GEMINI_API_KEY is set
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-else:
-    raise ValueError("GEMINI_API_KEY environment variable not set.")
+
+@bp.after_app_request
+def record_request_metrics(response):
+    # For streamed responses this is the time to the first byte
+    started = request.environ.get("metrics.started")
+    if started is not None:
+        metrics_registry.end_request(
+            metrics_route(), request.method, response.status_code,
+            time.perf_counter() - started,
+        )
+    return response
+
+
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    # Prometheus text format; each gunicorn worker reports its own requests
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
 
 
 # Route for the index page
-@app.route("/")
+@bp.route("/")
 def index():
     # Handle missing API keys for weather and maps gracefully
     if not openweather_api_key or not GOOGLE_MAPS_API_KEY:
@@ -57,7 +322,7 @@ def index():
 
 
 # Route for Gemini chatbot to give hurricane tips
-@app.route("/gemini_chatbot", methods=["POST"])
+@bp.route("/gemini_chatbot", methods=["POST"])
 def gemini_chatbot():
     data = request.get_json()
     question = data.get("question", "").strip()
@@ -65,240 +330,611 @@ def gemini_chatbot():
     if not question:
         return jsonify({"response": "Please ask a valid question."}), 400
 
-    try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(
-            question,
-            generation_config=genai.types.GenerationConfig(
-                candidate_count=1,
-                stop_sequences=["."],
-                max_output_tokens=100,
-                temperature=1.0,
-            ),
-        )
+    # Opt-in streaming: ?stream=sse|ndjson or a matching Accept header
+    stream_format = request.args.get("stream") or request.accept_mimetypes.best_match(
+        ["application/json", "text/event-stream", "application/x-ndjson"]
+    )
+    if stream_format in ("sse", "text/event-stream"):
+        return stream_chatbot_response(question, "sse")
+    if stream_format in ("ndjson", "application/x-ndjson"):
+        return stream_chatbot_response(question, "ndjson")
 
-        # Directly access candidates in the response
-        candidates = response.candidates if hasattr(response, "candidates") else []
+    try:
+        with stage("gemini"):
+            chatbot_response = chatbot.ask(question)
+        return jsonify({"response": chatbot_response})
 
-        if candidates and len(candidates) > 0:
-            chatbot_response = candidates[0].content.parts[0].text
-        else:
-            chatbot_response = "Sorry, I couldn't find an answer."
+    except ChatbotBusy:
+        return jsonify(
+            {"response": "The chatbot is busy right now. Please try again shortly."}
+        ), 503
 
-        return jsonify({"response": chatbot_response})
+    except ChatbotTimeout:
+        return jsonify(
+            {"response": "Sorry, the chatbot took too long to answer."}
+        ), 504
 
     except Exception as e:
-        print(f"Error with Gemini API: {e}")
+        logger.error("Error with Gemini API: %s", e)
         return jsonify(
             {"response": "Sorry, something went wrong with the chatbot."}
         ), 500
-    
-
 
 
-@app.route("/predict_status", methods=["POST"])
-def predict_status():
-    label_mapping = {
-        0: "Disturbance (0-20 mph) - A weak, disorganized system with minimal wind, often the early stage of a developing storm.",
-        1: "Extratropical Cyclone (30-60 mph) - Storms formed outside the tropics, often bringing heavy rain and strong winds.",
-        2: "Hurricane (74+ mph) - A powerful tropical storm with sustained winds above 74 mph, causing significant damage and heavy rainfall.",
-        3: "Gale Winds (39-54 mph) - Strong winds that can cause minor damage, but are not part of a tropical storm or hurricane.",
-        4: "Subtropical Depression (0-38 mph) - A weaker subtropical system with lower wind speeds, a mix of tropical and extratropical characteristics.",
-        5: "Subtropical Storm (39-73 mph) - A storm with both tropical and extratropical characteristics, typically less organized than a hurricane.",
-        6: "Tropical Depression (0-38 mph) - A tropical system with winds below 39 mph, often a precursor to a tropical storm.",
-        7: "Tropical Storm (39-73 mph) - A well-developed tropical system with winds between 39 and 73 mph, less intense than a hurricane.",
-        8: "Clear Sky (0 mph) - Calm weather with no active storm or disturbance.",
-        9: "Tropical Wave (10-30 mph) - A tropical disturbance with low wind speeds, which could develop into a stronger system.",
-    }
+def stream_chatbot_response(question, stream_format):
+    # Forward Gemini's partial text as it arrives, as SSE events or NDJSON lines
     try:
-        # Create the encoded number to label mapping
-        # Get the JSON data from the request
-        data = request.get_json()
-        print("Received request data:", data)
-
-        # Extract the input values from the JSON payload
-        lat = data.get("latitude")
-        lng = data.get("longitude")
-        wind_speed = data.get("windSpeed")
-        pressure = data.get("pressure")
-        distance_to_land = data.get("distanceToLand")
-        day_night = data.get("day_night")
-
-        # Convert to floats and handle potential missing values
-        wind_speed = float(wind_speed)
-        pressure = float(pressure)
-        distance_to_land = float(distance_to_land)
-        lat = float(lat)
-        lng = float(lng)
-        wind_pressure_ratio = float(wind_speed / pressure)
-        day_night = float(day_night)
-
-        # Prepare the input data as a pandas DataFrame
-        input_data_df = pd.DataFrame(
-            {
-                "USA_WIND": [wind_speed],
-                "USA_PRES": [pressure],
-                "DIST2LAND": [distance_to_land],
-                "USA_LAT": [lat],
-                "USA_LON": [lng],
-                "wind_pressure_ratio": [wind_pressure_ratio],
-                "Day_Night_encoded": [day_night],
-            }
-        )
+        chunks = chatbot.stream(question)
+    except ChatbotBusy:
+        return jsonify(
+            {"response": "The chatbot is busy right now. Please try again shortly."}
+        ), 503
+
+    if stream_format == "sse":
+        def encode(event, payload):
+            return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        mimetype = "text/event-stream"
+    else:
+        def encode(event, payload):
+            return json.dumps(dict(payload, event=event)) + "\n"
+        mimetype = "application/x-ndjson"
+
+    def generate():
+        parts = []
+        try:
+            for text in chunks:
+                parts.append(text)
+                yield encode("chunk", {"text": text})
+            yield encode("done", {"response": "".join(parts)})
+        except ChatbotTimeout:
+            yield encode("error", {"response": "Sorry, the chatbot took too long to answer."})
+        except Exception as e:
+            logger.error("Error with Gemini API: %s", e)
+            yield encode("error", {"response": "Sorry, something went wrong with the chatbot."})
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Runs when the server closes the response, even if the client went
+    # away before generate() was first resumed
+    chunks_close = getattr(chunks, "close", None)
+    if chunks_close is not None:
+        response.call_on_close(chunks_close)
+    return response
+
 
-        print(f"Input DataFrame:\n{input_data_df}")
+@bp.route("/gemini_chatbot/stats", methods=["GET"])
+def gemini_chatbot_stats():
+    return jsonify(chatbot.stats())
 
-        # Preprocess the input data using the loaded preprocessor
-        processed_input_data = preprocessor.transform(input_data_df)
-        print(f"Processed input data:\n{processed_input_data}")
 
-        # Perform prediction using the loaded model
-        prediction = model.predict(processed_input_data)
+def cache_namespace(bundle):
+    return f"{bundle.version}-{bundle.fingerprint}"
 
-        predicted_label = label_mapping.get(prediction[0], "Clear Sky")
 
-        # print(f"Prediction: {prediction}")
-        print(f"Prediction: {prediction[0]} -> {predicted_label}")
+def predict_cached(bundle, features):
+    started = time.perf_counter()
+    if prediction_cache is None:
+        predictions, probabilities = predict_features(
+            bundle.model, bundle.preprocessor, features
+        )
+    else:
+        predictions, probabilities = prediction_cache.predict(
+            bundle.model, bundle.preprocessor, features, namespace=cache_namespace(bundle)
+        )
+    # Sampled rows are re-scored by the candidate model in the background
+    scorer = shadow_scorer
+    if scorer is not None:
+        scorer.submit(features, predictions, time.perf_counter() - started)
+    return predictions, probabilities
+
+
+@bp.route("/predict_status", methods=["POST"])
+def predict_status():
+    """
+    Classify one point from the browser's readings (pressure in mb,
+    distanceToLand in km). windSpeed is scored as sent, without unit
+    conversion, so results match earlier releases for the same payload;
+    /assess is the endpoint that feeds the model knots.
+    """
+    try:
+        with stage("parse"):
+            # Get the JSON data from the request
+            data = request.get_json()
+            logger.debug("Received request data: %s", data)
+
+            # Single points go through the same batch path as /predict_status/batch
+            features = parse_points([data])
+        predictions, _ = predict_cached(model_bundle, features)
+
+        predicted_label = describe_prediction(predictions[0])
+        logger.debug("Prediction: %s -> %s", predictions[0], predicted_label)
 
         # Return the prediction result as JSON
         return jsonify({"status": predicted_label})
 
     except Exception as e:
-        print(f"Error during prediction: {e}")
+        logger.exception("Error during prediction: %s", e)
         return jsonify({"error": "Prediction failed"}), 500
 
 
-def get_weather_data(lat, lon, api_key, landmass_coords):
-    url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units=metric"
-    response = requests.get(url)
-    weather_data = response.json()
+@bp.route("/predict_status/batch", methods=["POST"])
+def predict_status_batch():
+    """
+    Classify many points, each exactly as /predict_status would.
+    """
+    # Accept either a JSON array of points or NDJSON (one point per line)
+    try:
+        with stage("parse"):
+            if request.mimetype == "application/x-ndjson":
+                points = parse_ndjson(request.get_data(as_text=True))
+            else:
+                points = request.get_json()
+    except Exception as e:
+        logger.info("Error parsing batch request: %s", e)
+        return jsonify({"error": "Invalid batch payload"}), 400
 
-    # Extract relevant fields
-    dt = weather_data["dt"]
-    timezone_offset = weather_data["timezone"]
-    wind_speed_mps = weather_data["wind"][
-        "speed"
-    ]  # Get wind speed from the API response
-    sea_level_pressure = weather_data["main"]["pressure"]
+    if not isinstance(points, list) or not points:
+        return jsonify({"error": "Expected a non-empty list of points"}), 400
 
-    # Convert Unix timestamp to UTC datetime
-    utc_time = datetime.utcfromtimestamp(dt)
+    try:
+        features = parse_points(points)
+    except (TypeError, ValueError, AttributeError) as e:
+        logger.info("Error parsing batch points: %s", e)
+        return jsonify({"error": "Missing or invalid point fields"}), 400
 
-    # Apply the timezone offset
-    local_time = utc_time + timedelta(seconds=timezone_offset)
+    try:
+        bundle = model_bundle
+        predictions, probabilities = predict_cached(bundle, features)
+        results = format_predictions(bundle.model, predictions, probabilities)
+        return jsonify({"count": len(results), "results": results})
 
-    # Get the day of the week and time
-    day_of_week = local_time.strftime("%A")  # e.g., Monday
-    local_time_str = local_time.strftime("%Y-%m-%d %H:%M:%S")
-    wind_speed_kmh = wind_speed_mps * 3.6
+    except Exception as e:
+        logger.exception("Error during batch prediction: %s", e)
+        return jsonify({"error": "Prediction failed"}), 500
 
-    # Calculate the distance to land (find nearest landmass using geodesic distance)
-    distance_to_land = calculate_distance_to_land(lat, lon, landmass_coords)
+
+def get_weather_data(lat, lon, api_key=None, landmass_coords=None, timings=None):
+    # Distance to land doesn't depend on the weather, so look it up on the
+    # pipeline executor while the (cached) OpenWeather request is in flight
+    def timed(name, func, *args):
+        start = time.perf_counter()
+        try:
+            with stage(name):
+                return func(*args)
+        finally:
+            if timings is not None:
+                timings[name] = round((time.perf_counter() - start) * 1000, 3)
+
+    # Run in a copy of this context so the stage is attributed to the request
+    context = contextvars.copy_context()
+    if landmass_coords is None:
+        distance_future = pipeline_executor.submit(
+            context.run, timed, "distance_to_land", lookup_distance_to_land, lat, lon
+        )
+    else:
+        distance_future = pipeline_executor.submit(
+            context.run, timed, "distance_to_land", calculate_distance_to_land,
+            lat, lon, landmass_coords,
+        )
+
+    # Cached per geohash cell; concurrent lookups for a cell share one request
+    weather_data = timed("weather", weather_client.fetch, lat, lon, api_key)
+    fields = extract_weather_fields(weather_data)
+    distance_to_land = distance_future.result()
 
     return {
-        "local_time": local_time_str,
-        "day_of_week": day_of_week,
+        "local_time": fields["local_time"],
+        "day_of_week": fields["day_of_week"],
+        "is_day": fields["is_day"],
         "weather_data": weather_data,
-        "wind_speed": wind_speed_kmh,  # Include wind speed in the return data
-        "sea_level_pressure": sea_level_pressure,
+        "wind_speed": fields["wind_speed"],  # Include wind speed in the return data
+        "sea_level_pressure": fields["sea_level_pressure"],
         "distance_to_land": distance_to_land,
     }
 
 
-@app.route("/get_distance_to_land", methods=["GET"])
-def get_distance_to_land():
+@bp.route("/assess", methods=["GET"])
+def assess():
+    """
+    Weather, distance to land, day/night and classification in one call.
+    wind_speed in the response is km/h; the model is given OpenWeather's
+    wind in knots.
+    """
     lat = request.args.get("lat")
     lng = request.args.get("lng")
 
     if not lat or not lng:
         return jsonify({"error": "Missing latitude or longitude"}), 400
 
-    # Call the function to calculate distance to land (from previous logic)
-    landmass_coords = [
-        # Example coordinates; replace with your actual landmass data
-        (37.7749, -122.4194),
-        (34.0522, -118.2437),
-        # Add more landmass coordinates here
-    ]
-    distance_to_land = calculate_distance_to_land(
-        float(lat), float(lng), landmass_coords
-    )
+    try:
+        lat = float(lat)
+        lng = float(lng)
+    except ValueError:
+        return jsonify({"error": "Invalid latitude or longitude"}), 400
+
+    timings = {}
+    started = time.perf_counter()
+    # Monitored regions are served from the ingested time series while the
+    # latest snapshot is fresh: no upstream call and no model run
+    snapshot = monitored_regions.lookup(lat, lng) if monitored_regions is not None else None
+    if snapshot is not None:
+        # The status is the region centre's; distance_to_land is this point's
+        distance_to_land = float(lookup_distance_to_land(lat, lng))
+        timings["total"] = round((time.perf_counter() - started) * 1000, 3)
+        return jsonify(
+            dict(
+                snapshot,
+                lat=lat,
+                lng=lng,
+                distance_to_land=distance_to_land,
+                is_day="Day" if snapshot["is_day"] else "Night",
+                source="monitored",
+                timings_ms=timings,
+            )
+        )
 
-    # Return the distance as JSON
-    return jsonify({"distance_to_land": distance_to_land})
+    try:
+        weather = get_weather_data(lat, lng, timings=timings)
+    except Exception as e:
+        logger.warning("Error fetching weather data: %s", e)
+        return jsonify({"error": "Weather lookup failed"}), 502
 
+    try:
+        start = time.perf_counter()
+        wind_speed = weather["wind_speed"]
+        # The model was trained on knots; the response keeps km/h
+        wind_speed_kt = wind_speed / KMH_PER_KNOT
+        pressure = float(weather["sea_level_pressure"])
+        features = [
+            [
+                wind_speed_kt,
+                pressure,
+                weather["distance_to_land"],
+                lat,
+                lng,
+                wind_speed_kt / pressure,
+                1.0 if weather["is_day"] else 0.0,
+            ]
+        ]
+        bundle = model_bundle
+        predictions, probabilities = predict_cached(bundle, features)
+        result = format_predictions(bundle.model, predictions, probabilities)[0]
+        timings["predict"] = round((time.perf_counter() - start) * 1000, 3)
+    except Exception as e:
+        logger.exception("Error during prediction: %s", e)
+        return jsonify({"error": "Prediction failed"}), 500
 
-def calculate_distance_to_land(lat, lon, landmass_coords):
-    current_location = (lat, lon)
-    min_distance = float("inf")  # Initialize with a very large number
+    timings["total"] = round((time.perf_counter() - started) * 1000, 3)
+    weather_data = weather["weather_data"]
+    return jsonify(
+        {
+            "lat": lat,
+            "lng": lng,
+            "local_time": weather["local_time"],
+            "day_of_week": weather["day_of_week"],
+            "is_day": "Day" if weather["is_day"] else "Night",
+            "temperature": weather_data.get("main", {}).get("temp"),
+            "description": (weather_data.get("weather") or [{}])[0].get("description"),
+            "wind_speed": wind_speed,
+            "sea_level_pressure": pressure,
+            "distance_to_land": weather["distance_to_land"],
+            "status": result["status"],
+            "probabilities": result["probabilities"],
+            "source": "live",
+            "timings_ms": timings,
+        }
+    )
 
-    for land_lat, land_lon in landmass_coords:
-        land_location = (land_lat, land_lon)
-        # Calculate the distance using the geodesic function from geopy
-        distance = geodesic(current_location, land_location).kilometers
-        if distance < min_distance:
-            min_distance = distance
 
-    return min_distance
+@bp.route("/monitored_regions", methods=["GET"])
+def monitored_regions_status():
+    if monitored_regions is None:
+        return jsonify({"enabled": False})
+    return jsonify(
+        dict(monitored_regions.stats(), enabled=True, regions=monitored_regions.latest())
+    )
 
-def get_db_connection():
-    
-    db_config = {
-        'user': '{DB_USER}',
-        'password': '{DB_PASSWORD}',
-        'host': '134.134.183.11',  # Replace with Cloud SQL public IP or use localhost if using Cloud SQL Proxy
-        'port': 3306,
-        'database': 'prehurricane'
-    }
-    
+
+@bp.route("/monitored_regions/history", methods=["GET"])
+def monitored_region_history():
+    """
+    Stored observations of one monitored region, wind_speed in km/h as in
+    /assess.
+    """
+    # ?region=Miami FL&hours=24
+    if monitored_regions is None:
+        return jsonify({"error": "Monitored regions are disabled"}), 404
     try:
-        connection = mysql.connector.connect(**db_config)
-        if connection.is_connected():
-            print("Connected to the database successfully!")
-    except mysql.connector.Error as err:
-        print(f"Error: {err}")
-        
-    return connection
+        hours = float(request.args.get("hours", "24"))
+    except ValueError:
+        return jsonify({"error": "Invalid hours"}), 400
+    name = request.args.get("region", "")
+    history = monitored_regions.history(name, time.time() - hours * 3600)
+    if history is None:
+        return jsonify({"error": f"Unknown region {name!r}"}), 404
+    return jsonify({"region": name, "hours": hours, "history": history})
+
+
+@bp.route("/models", methods=["GET"])
+def models_status():
+    scorer = shadow_scorer
+    return jsonify(
+        {
+            "active": model_bundle.describe(),
+            "reloader": model_reloader.stats() if model_reloader is not None else None,
+            "shadow": scorer.stats() if scorer is not None else None,
+        }
+    )
+
+
+@bp.route("/prediction_cache/stats", methods=["GET"])
+def prediction_cache_stats():
+    if prediction_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(prediction_cache.stats(), enabled=True))
+
+
+@bp.route("/weather_cache/stats", methods=["GET"])
+def weather_cache_stats():
+    return jsonify(weather_client.stats())
+
+
+@bp.route("/get_distance_to_land", methods=["GET", "POST"])
+def get_distance_to_land():
+    # Bulk form: POST {"lats": [...], "lngs": [...]}
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        lats = data.get("lats")
+        lngs = data.get("lngs")
+        if not lats or not lngs or len(lats) != len(lngs):
+            return jsonify({"error": "Expected equal-length lats and lngs lists"}), 400
+        try:
+            distances = lookup_distance_to_land(
+                np.asarray(lats, dtype=float),
+                np.asarray(lngs, dtype=float),
+                refine=bool(data.get("refine")),
+            )
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid latitude or longitude"}), 400
+        return jsonify({"distance_to_land": distances.tolist()})
+
+    lat = request.args.get("lat")
+    lng = request.args.get("lng")
+
+    if not lat or not lng:
+        return jsonify({"error": "Missing latitude or longitude"}), 400
 
+    refine = request.args.get("refine", "").lower() in ("1", "true", "yes")
+    distance_to_land = lookup_distance_to_land(float(lat), float(lng), refine=refine)
 
-@app.route('/subscribe', methods=['POST'])
+    # Return the distance as JSON
+    return jsonify({"distance_to_land": distance_to_land})
+
+
+def lookup_distance_to_land(lat, lon, refine=False):
+    # Raster lookup first; the tree handles points outside the grid and
+    # requests that asked for refined (geodesic) precision.
+    if distance_raster is None or refine:
+        return calculate_distance_to_land(lat, lon, refine=refine)
+
+    lat_arr, lon_arr = np.broadcast_arrays(
+        np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    )
+    distances = distance_raster.lookup(lat_arr, lon_arr)
+    missing = np.isnan(distances)
+    if missing.any():
+        distances[missing] = calculate_distance_to_land(lat_arr[missing], lon_arr[missing])
+
+    if distances.ndim == 0:
+        return float(distances)
+    return distances
+
+
+def calculate_distance_to_land(lat, lon, landmass_coords=None, refine=False):
+    # Uses the coastline index loaded at startup unless explicit
+    # landmass coordinates are given. Accepts scalars or arrays.
+    if landmass_coords is None:
+        index = coastline_index
+    else:
+        index = CoastlineIndex(landmass_coords)
+    return index.query(lat, lon, refine=refine)
+
+
+# Largest batch /track scores at once; bigger chunk_size values are clamped
+TRACK_MAX_CHUNK_SIZE = 8192
+
+
+@bp.route("/track", methods=["POST"])
+def score_track():
+    """
+    Score a storm track (CSV or NDJSON body) resampled to a fixed step,
+    plus optional extrapolated future positions, streamed back as NDJSON.
+    Wind is in knots and pressure in mb, as in IBTrACS and the training
+    data, both in the body and in the response. Observations with no wind
+    or pressure are skipped (interpolated across) and counted in a final
+    summary line.
+    """
+    try:
+        interval = float(request.args.get("interval_minutes", "60")) * 60
+        horizon = float(request.args.get("horizon_hours", "0")) * 3600
+        chunk_size = int(request.args.get("chunk_size", "2048"))
+    except ValueError:
+        return jsonify({"error": "Invalid interval, horizon or chunk size"}), 400
+    if interval <= 0 or horizon < 0 or chunk_size <= 0:
+        return jsonify({"error": "Invalid interval, horizon or chunk size"}), 400
+    chunk_size = min(chunk_size, TRACK_MAX_CHUNK_SIZE)
+
+    is_csv = request.mimetype in ("text/csv", "application/csv")
+    fmt = "csv" if is_csv or request.args.get("format") == "csv" else "ndjson"
+    # Read the body lazily, one line at a time, as the response is written
+    lines = (raw.decode("utf-8") for raw in request.stream)
+
+    bundle = model_bundle
+
+    def generate():
+        counts = {"points": 0, "skipped": 0, "samples": 0}
+        samples = with_forecast(
+            resample(iter_track_points(lines, fmt, counts), interval), interval, horizon
+        )
+        try:
+            for chunk in chunked(samples, chunk_size):
+                counts["samples"] += len(chunk)
+                points = np.array([sample for sample, _ in chunk], dtype=np.float64)
+                features, distances, day_night = track_features(points, lookup_distance_to_land)
+                predictions, probabilities = predict_features(
+                    bundle.model, bundle.preprocessor, features
+                )
+                confidence = probabilities.max(axis=1)
+
+                rows = []
+                for i, (sample, is_forecast) in enumerate(chunk):
+                    rows.append(
+                        json.dumps(
+                            {
+                                "time": datetime.fromtimestamp(sample[0], timezone.utc).isoformat(),
+                                "lat": round(sample[1], 4),
+                                "lon": round(sample[2], 4),
+                                "wind": round(sample[3], 2),
+                                "pressure": round(sample[4], 2),
+                                "distance_to_land": round(float(distances[i]), 2),
+                                "day_night": int(day_night[i]),
+                                "forecast": is_forecast,
+                                "prediction": int(predictions[i]),
+                                "status": describe_prediction(predictions[i]),
+                                "probability": round(float(confidence[i]), 4),
+                            }
+                        )
+                    )
+                yield "\n".join(rows) + "\n"
+            yield json.dumps({"summary": counts}) + "\n"
+        except (ValueError, KeyError) as e:
+            yield json.dumps({"error": f"Invalid track: {e}"}) + "\n"
+        except Exception as e:
+            logger.exception("Error scoring track: %s", e)
+            yield json.dumps({"error": "Track scoring failed"}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+# Largest slice /risk_grid returns; bigger boxes need a coarser stride
+RISK_GRID_MAX_CELLS = 250000
+
+
+def cached_json(grid, payload, max_age):
+    # Grids only change when rebuilt (or the active model changes), so
+    # clients and proxies may reuse a response until max_age and then
+    # revalidate it with If-None-Match
+    bundle = model_bundle
+    payload = dict(
+        payload,
+        active_model_version=bundle.version,
+        model_current=grid.model_version == bundle.version,
+    )
+    response = jsonify(payload)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.set_etag(f"{grid.version}-{bundle.version}-{request.query_string.decode()}")
+    return response.make_conditional(request)
+
+
+@bp.route("/risk_grid/meta", methods=["GET"])
+def risk_grid_meta():
+    """
+    Grid bounds, scenarios (wind in knots) and the model version it was
+    built with. model_current is false when that isn't the active model,
+    i.e. the grid needs rebuilding after a model swap.
+    """
+    grid = load_risk_grid()
+    if grid is None:
+        return jsonify({"error": "Risk grid has not been built"}), 404
+    return cached_json(grid, grid.describe(), int(os.getenv("RISK_GRID_MAX_AGE", "3600")))
+
+
+@bp.route("/risk_grid", methods=["GET"])
+def get_risk_grid():
+    """
+    Precomputed predictions for one scenario over a bounding box, so the map
+    can shade a whole region without calling the model per point. Scenario
+    winds (see /risk_grid/meta) are in knots. Like /risk_grid/meta, the
+    response says whether the grid was built with the active model.
+    """
+    grid = load_risk_grid()
+    if grid is None:
+        return jsonify({"error": "Risk grid has not been built"}), 404
+    try:
+        scenario = int(request.args.get("scenario", "0"))
+        lat_min = float(request.args.get("lat_min", grid.lat_min))
+        lat_max = float(request.args.get("lat_max", grid.lat_max))
+        lon_min = float(request.args.get("lon_min", grid.lon_min))
+        lon_max = float(request.args.get("lon_max", grid.lon_max))
+        stride = int(request.args.get("stride", "1"))
+        grid_slice = grid.slice(scenario, lat_min, lat_max, lon_min, lon_max, stride)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows, cols = grid_slice["shape"]
+    if rows * cols > RISK_GRID_MAX_CELLS:
+        return jsonify({"error": "Slice too large; use a smaller box or a larger stride"}), 400
+    grid_slice["labels"] = grid.class_labels
+    grid_slice["model_version"] = grid.model_version
+    return cached_json(grid, grid_slice, int(os.getenv("RISK_GRID_MAX_AGE", "3600")))
+
+
+@bp.route('/subscribe', methods=['POST'])
 def subscribe():
     try:
         # Extract form data
         name = request.form['name']
         email = request.form['email']
         phone = request.form['phone']
-        print(f"Received form data: Name={name}, Email={email}, Phone={phone}")
-
-        # Save data to the database
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        query = "INSERT INTO subscribers (name, email, phone) VALUES (%s, %s, %s)"
-        cursor.execute(query, (name, email, phone))
-        connection.commit()
-        cursor.close()
-        connection.close()
-
-        # Generate and send the thank-you email
-        msg = Message(
-            subject="Hurricane Prediction Alert Subscription",
-            sender=os.getenv("MAIL_USERNAME"),
-            recipients=[email]
-        )
-        msg.body = subscription_thank_you_message(name)
-        mail.send(msg)
-        print("Thank you email sent successfully!")
+        # Optional: the map location the subscriber was looking at
+        lat = request.form.get('lat')
+        lng = request.form.get('lng')
+        logger.debug("Received form data: Name=%s, Email=%s, Phone=%s", name, email, phone)
+
+        # Save the subscriber and queue the thank-you email in one transaction;
+        # the outbox worker sends it after we return
+        db_pool = get_pool()
+        with stage("db"), db_pool.connection() as connection:
+            cursor = connection.cursor()
+            # Emails are unique; subscribing again updates the existing row
+            try:
+                upsert_subscriber(cursor, db_pool, name, email, phone, lat, lng)
+            except ValueError as e:
+                cursor.close()
+                return f"Invalid subscription: {e}", 400
+            enqueue_email(
+                cursor,
+                db_pool,
+                email,
+                "Hurricane Prediction Alert Subscription",
+                subscription_thank_you_message(name),
+            )
+            connection.commit()
+            cursor.close()
+
+        if outbox_worker is not None:
+            outbox_worker.notify()
 
         return redirect('/')
 
     except Exception as e:
-        print(f"Error: {e}")
+        logger.exception("Error subscribing: %s", e)
         return "An error occurred while subscribing.", 500
 
 
+@bp.route("/email_outbox/stats", methods=["GET"])
+def email_outbox_stats():
+    if outbox_worker is None:
+        return jsonify({"enabled": False})
+    return jsonify(outbox_worker.stats())
+
+
+app = create_app()
 
 
-        
-        
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,141 @@
+# bench_forest.py
+#
+# Compare the joblib RandomForestClassifier with utils.forest.CompactForest:
+# single-row and batch predict_proba latency, plus per-worker memory when
+# several processes load the model side by side (as gunicorn workers do).
+#
+#   python scripts/compile_forest.py --output Models/forest4
+#   python benchmarks/bench_forest.py --model Models/best_random_forest_model4.pkl \
+#       --forest Models/forest4 --workers 4
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def memory_kb():
+    """
+    Rss/Pss/private/shared totals for this process from /proc (Linux only).
+    Pss splits shared pages between the processes mapping them, so it is
+    the fair per-worker cost.
+    """
+    totals = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == "kB":
+                    totals[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return {}
+    return {
+        "rss_kb": totals.get("Rss", 0),
+        "pss_kb": totals.get("Pss", 0),
+        "private_kb": totals.get("Private_Clean", 0) + totals.get("Private_Dirty", 0),
+        "shared_kb": totals.get("Shared_Clean", 0) + totals.get("Shared_Dirty", 0),
+    }
+
+
+def load(variant, model_path, forest_path):
+    if variant == "joblib":
+        import joblib
+        return joblib.load(model_path)
+    from utils.forest import CompactForest
+    return CompactForest.load(forest_path)
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(samples, p)), 4) for p in (50, 95, 99)}
+
+
+def run_worker(variant, model_path, forest_path, repeats, batch_size, barrier, results):
+    baseline = memory_kb()
+    start = time.perf_counter()
+    model = load(variant, model_path, forest_path)
+    load_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    single = rng.normal(size=(1, model.n_features_in_))
+    batch = rng.normal(size=(batch_size, model.n_features_in_))
+    model.predict_proba(single)  # warm up
+
+    single_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(single)
+        single_times.append(time.perf_counter() - start)
+
+    batch_times = []
+    for _ in range(max(repeats // 20, 5)):
+        start = time.perf_counter()
+        model.predict_proba(batch)
+        batch_times.append(time.perf_counter() - start)
+
+    # Measure while every worker still has its model mapped
+    barrier.wait()
+    memory = memory_kb()
+    barrier.wait()
+    results.put(
+        {
+            "load_ms": round(load_seconds * 1000, 2),
+            "single": percentiles(single_times),
+            f"batch_{batch_size}": percentiles(batch_times),
+            "memory_kb": memory,
+            "memory_delta_kb": {k: memory[k] - baseline.get(k, 0) for k in memory},
+        }
+    )
+
+
+def bench(variant, args):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(args.workers)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(
+            target=run_worker,
+            args=(variant, args.model, args.forest, args.repeats, args.batch_size, barrier, results),
+        )
+        for _ in range(args.workers)
+    ]
+    for proc in procs:
+        proc.start()
+    reports = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    first = reports[0]
+    return {
+        "load_ms": first["load_ms"],
+        "single": first["single"],
+        f"batch_{args.batch_size}": first[f"batch_{args.batch_size}"],
+        "per_worker_rss_kb": int(np.mean([r["memory_kb"].get("rss_kb", 0) for r in reports])),
+        "per_worker_pss_kb": int(np.mean([r["memory_kb"].get("pss_kb", 0) for r in reports])),
+        "per_worker_private_delta_kb": int(
+            np.mean([r["memory_delta_kb"].get("private_kb", 0) for r in reports])
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark joblib vs compact forest inference.")
+    parser.add_argument("--model", default="Models/best_random_forest_model4.pkl")
+    parser.add_argument("--forest", default="Models/forest4")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    report = {variant: bench(variant, args) for variant in ("joblib", "compact")}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
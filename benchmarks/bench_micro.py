@@ -0,0 +1,96 @@
+# bench_micro.py
+#
+# pytest-benchmark micro-benchmarks for the request hot path: distance to
+# land, preprocessing and model prediction, single row and batch. Runs
+# offline (GEMINI_BACKEND=stub, no database or network).
+#
+#   python -m pytest benchmarks/bench_micro.py --benchmark-autosave
+#   python -m pytest benchmarks/bench_micro.py --benchmark-compare
+#
+# Saved runs go to .benchmarks/ keyed by commit; --benchmark-compare diffs
+# against the latest one.
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+os.environ.setdefault("GEMINI_BACKEND", "stub")
+
+import app  # noqa: E402
+from utils.feature_pipeline import CompiledPreprocessor  # noqa: E402
+from utils.prediction import build_feature_frame, predict_features  # noqa: E402
+
+BATCH_SIZE = 1000
+
+# The app serves with the compiled preprocessor when it verifies; keep the
+# fitted ColumnTransformer around to benchmark the DataFrame path as well
+sklearn_preprocessor = getattr(app.preprocessor, "source", None) or app.preprocessor
+compiled_preprocessor = CompiledPreprocessor.from_column_transformer(sklearn_preprocessor)
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(0)
+    return rng.uniform(10, 45, BATCH_SIZE), rng.uniform(-95, -15, BATCH_SIZE)
+
+
+@pytest.fixture(scope="module")
+def features(points):
+    rng = np.random.default_rng(1)
+    lats, lons = points
+    wind = rng.uniform(10, 160, BATCH_SIZE)
+    pressure = rng.uniform(900, 1015, BATCH_SIZE)
+    return np.column_stack([
+        wind, pressure, rng.uniform(0, 1500, BATCH_SIZE), lats, lons,
+        wind / pressure, rng.integers(0, 2, BATCH_SIZE).astype(float),
+    ])
+
+
+def test_distance_to_land_single(benchmark):
+    benchmark(app.calculate_distance_to_land, 25.76, -80.19)
+
+
+def test_distance_to_land_refined(benchmark):
+    benchmark(app.calculate_distance_to_land, 25.76, -80.19, refine=True)
+
+
+def test_distance_to_land_batch(benchmark, points):
+    benchmark(app.lookup_distance_to_land, *points)
+
+
+def test_preprocess_single(benchmark, features):
+    row = features[:1]
+    benchmark(lambda: sklearn_preprocessor.transform(build_feature_frame(row)))
+
+
+def test_preprocess_batch(benchmark, features):
+    benchmark(lambda: sklearn_preprocessor.transform(build_feature_frame(features)))
+
+
+def test_compiled_preprocess_single(benchmark, features):
+    benchmark(compiled_preprocessor.transform_row, features[0])
+
+
+def test_compiled_preprocess_batch(benchmark, features):
+    benchmark(compiled_preprocessor.transform, features)
+
+
+def test_model_predict_single(benchmark, features):
+    processed = compiled_preprocessor.transform(features[:1])
+    benchmark(app.model.predict_proba, processed)
+
+
+def test_model_predict_batch(benchmark, features):
+    processed = compiled_preprocessor.transform(features)
+    benchmark(app.model.predict_proba, processed)
+
+
+def test_predict_features_single(benchmark, features):
+    benchmark(predict_features, app.model, app.preprocessor, features[:1])
+
+
+def test_predict_features_batch(benchmark, features):
+    benchmark(predict_features, app.model, app.preprocessor, features)
@@ -0,0 +1,112 @@
+# bench_preprocess.py
+#
+# Verify utils.feature_pipeline.CompiledPreprocessor against the fitted
+# ColumnTransformer and compare per-request preprocessing time: the
+# DataFrame + ColumnTransformer path versus the compiled NumPy path, alone
+# and together with the model as /predict_status runs them.
+#
+#   python benchmarks/bench_preprocess.py --preprocessor Models/preprocessor4.pkl
+#
+# Exits non-zero if the outputs differ by more than --tolerance.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.feature_pipeline import (  # noqa: E402
+    TOLERANCE,
+    CompiledPreprocessor,
+    verification_sample,
+)
+from utils.prediction import build_feature_frame, predict_features  # noqa: E402
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1e6
+    report = {f"p{p}_us": round(float(np.percentile(samples, p)), 2) for p in (50, 95, 99)}
+    report["mean_us"] = round(float(samples.mean()), 2)
+    return report
+
+
+def time_calls(func, rows, repeats):
+    func(rows[0])  # warm up
+    samples = []
+    for i in range(repeats):
+        row = rows[i % len(rows)]
+        start = time.perf_counter()
+        func(row)
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Verify and time compiled preprocessing against the ColumnTransformer."
+    )
+    parser.add_argument("--preprocessor", default="Models/preprocessor4.pkl")
+    parser.add_argument("--model", default="Models/best_random_forest_model4.pkl")
+    parser.add_argument("--samples", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=2000)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    preprocessor = joblib.load(args.preprocessor)
+    compiled = CompiledPreprocessor.from_column_transformer(preprocessor)
+
+    sample = verification_sample(args.samples)
+    expected = preprocessor.transform(build_feature_frame(sample))
+    batch = compiled.transform(sample)
+    rows = np.vstack([compiled.transform_row(row) for row in sample])
+    verification = {
+        "rows": len(sample),
+        "max_abs_diff_batch": float(np.max(np.abs(batch - expected))),
+        "max_abs_diff_single": float(np.max(np.abs(rows - expected))),
+        "bit_identical": bool(np.array_equal(batch, expected) and np.array_equal(rows, expected)),
+    }
+
+    single_rows = [row[np.newaxis, :] for row in sample[:1000]]
+    report = {
+        "verification": verification,
+        "preprocess_single": {
+            "dataframe_column_transformer": time_calls(
+                lambda row: preprocessor.transform(build_feature_frame(row)),
+                single_rows, args.repeats,
+            ),
+            "compiled_transform_row": time_calls(
+                lambda row: compiled.transform_row(row[0]), single_rows, args.repeats
+            ),
+        },
+    }
+
+    if os.path.exists(args.model):
+        model = joblib.load(args.model)
+        report["predict_single"] = {
+            "dataframe_column_transformer": time_calls(
+                lambda row: predict_features(model, preprocessor, row), single_rows, args.repeats
+            ),
+            "compiled": time_calls(
+                lambda row: predict_features(model, compiled, row), single_rows, args.repeats
+            ),
+        }
+
+    for section in ("preprocess_single", "predict_single"):
+        if section in report:
+            before, after = (v["p50_us"] for v in report[section].values())
+            report[section]["p50_speedup"] = round(before / after, 1) if after else None
+
+    print(json.dumps(report, indent=2))
+    worst = max(verification["max_abs_diff_batch"], verification["max_abs_diff_single"])
+    if worst > args.tolerance:
+        print(f"Compiled preprocessing differs by {worst:.3g} (> {args.tolerance})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# bench_startup.py
+#
+# Startup cost of the app: per-module import time (python -X importtime)
+# and gunicorn worker memory/time-to-ready with and without preload_app.
+#
+#   python benchmarks/bench_startup.py --workers 4
+#
+# Runs with GEMINI_BACKEND=stub so no API keys are needed.
+
+import argparse
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def bench_env(**extra):
+    env = dict(os.environ)
+    env.setdefault("GEMINI_BACKEND", "stub")
+    env.update(extra)
+    return env
+
+
+def import_times(top=15):
+    """
+    Cumulative import time of `import app` and of each module it imports
+    directly (utils.*, flask, sklearn via joblib pickles, ...).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT,
+        env=bench_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Lines are printed children-first; nesting adds two spaces of indent,
+    # so app's direct imports are the 3-space lines just before `app`.
+    total = 0
+    direct = []
+    pending = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        if len(indent) == 1:
+            if name == "app":
+                total = int(cumulative)
+                direct = pending
+            pending = []
+        elif len(indent) == 3:
+            pending.append((name, int(cumulative)))
+
+    ranked = sorted(direct, key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "import_app_ms": round(total / 1000, 1),
+        "slowest_direct_imports_ms": {name: round(us / 1000, 1) for name, us in ranked},
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def memory_kb(pid):
+    totals = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                totals[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss_kb": totals.get("Rss", 0), "pss_kb": totals.get("Pss", 0)}
+
+
+def gunicorn_startup(preload, workers, timeout=120):
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+         "-b", f"127.0.0.1:{port}", "--workers", str(workers), "app:app"],
+        cwd=ROOT,
+        env=bench_env(GUNICORN_PRELOAD="1" if preload else "0"),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        # Ready once every worker has answered a request
+        url = f"http://127.0.0.1:{port}/gemini_chatbot/stats"
+        answered = set()
+        while len(answered) < workers:
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("gunicorn did not become ready in time")
+            try:
+                with urllib.request.urlopen(url, timeout=1):
+                    pass
+                answered = set(children(proc.pid))
+            except OSError:
+                time.sleep(0.1)
+        ready = time.perf_counter() - started
+
+        worker_memory = [memory_kb(pid) for pid in children(proc.pid)]
+        return {
+            "time_to_ready_s": round(ready, 2),
+            "master": memory_kb(proc.pid),
+            "workers": len(worker_memory),
+            "per_worker_rss_kb": int(sum(m["rss_kb"] for m in worker_memory) / len(worker_memory)),
+            "per_worker_pss_kb": int(sum(m["pss_kb"] for m in worker_memory) / len(worker_memory)),
+        }
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark app import time and worker memory.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    report = {
+        "imports": import_times(args.top),
+        "gunicorn_preload": gunicorn_startup(True, args.workers),
+        "gunicorn_no_preload": gunicorn_startup(False, args.workers),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# bench_subscribers.py
+#
+# Subscriber bulk paths on a throwaway SQLite database: row-at-a-time
+# INSERTs (what /subscribe did per POST) against utils.subscribers'
+# batched multi-row import, streaming export, and a radius query through
+# the geohash index against a full scan.
+#
+#   python benchmarks/bench_subscribers.py --rows 200000 --radius-km 150
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db import DatabasePool, SQLitePool  # noqa: E402
+from utils.subscribers import (  # noqa: E402
+    area_filter,
+    export_csv,
+    haversine_km,
+    import_csv,
+    subscriber_row,
+    subscribers_near,
+)
+
+
+def synthetic_csv(rows, duplicate_fraction=0.05, seed=0):
+    """
+    CSV text of `rows` subscribers spread over the Gulf and Atlantic coasts,
+    with a fraction of repeated emails (in different case) to exercise the
+    unique index.
+    """
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(18, 45, rows)
+    lons = rng.uniform(-98, -64, rows)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["name", "email", "phone", "lat", "lon"])
+    for i in range(rows):
+        if i and rng.random() < duplicate_fraction:
+            email = f"User{rng.integers(0, i)}@Example.com"
+        else:
+            email = f"user{i}@example.com"
+        writer.writerow([f"User {i}", email, f"555-{i:07d}", f"{lats[i]:.5f}", f"{lons[i]:.5f}"])
+    return out.getvalue()
+
+
+def sqlite_pool(path):
+    pool = DatabasePool("sqlite", SQLitePool(path))
+    pool.ensure_schema()
+    return pool
+
+
+def single_row_inserts(pool, text, rows):
+    # One INSERT and one commit per subscriber, as a /subscribe POST does
+    reader = csv.DictReader(io.StringIO(text))
+    started = time.perf_counter()
+    count = 0
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        for record in reader:
+            if count == rows:
+                break
+            row = subscriber_row(record["name"], record["email"], record["phone"],
+                                 record["lat"], record["lon"])
+            cursor.execute(
+                pool.sql(
+                    "INSERT INTO subscribers (name, email, phone, lat, lon, geohash) "
+                    "VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT(email) DO NOTHING"
+                ),
+                row,
+            )
+            connection.commit()
+            count += 1
+    return count / (time.perf_counter() - started)
+
+
+def full_scan_near(pool, lat, lon, radius_km):
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT id, lat, lon FROM subscribers WHERE lat IS NOT NULL")
+        rows = np.array(cursor.fetchall())
+        cursor.close()
+    distances = haversine_km(lat, lon, rows[:, 1], rows[:, 2])
+    return int((distances <= radius_km).sum())
+
+
+def timed(func, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return result, round(1000 * float(np.median(samples)), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark subscriber bulk import/export and queries.")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--single-rows", type=int, default=2000,
+                        help="Rows for the row-at-a-time baseline")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--lat", type=float, default=25.76)
+    parser.add_argument("--lon", type=float, default=-80.19)
+    parser.add_argument("--radius-km", type=float, default=150.0)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    text = synthetic_csv(args.rows)
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = single_row_inserts(
+            sqlite_pool(os.path.join(directory, "single.db")), text, args.single_rows
+        )
+
+        pool = sqlite_pool(os.path.join(directory, "bulk.db"))
+        imported = import_csv(pool, io.StringIO(text), batch_size=args.batch_size)
+        # Importing the same file again only hits existing emails
+        reimported = import_csv(pool, io.StringIO(text), batch_size=args.batch_size)
+
+        started = time.perf_counter()
+        exported = export_csv(pool, io.StringIO())
+        export_seconds = time.perf_counter() - started
+
+        near, indexed_ms = timed(
+            lambda: subscribers_near(pool, args.lat, args.lon, args.radius_km), args.repeats
+        )
+        scan_count, scan_ms = timed(
+            lambda: full_scan_near(pool, args.lat, args.lon, args.radius_km), args.repeats
+        )
+        condition, params = area_filter(args.lat, args.lon, args.radius_km)
+        with pool.connection() as connection:
+            plan = [
+                row[-1] for row in connection.execute(
+                    pool.sql(f"EXPLAIN QUERY PLAN SELECT id FROM subscribers WHERE {condition}"),
+                    params,
+                )
+            ]
+
+    report = {
+        "import": {
+            "single_row_rows_per_sec": round(baseline, 1),
+            "batched": imported,
+            "batched_speedup": round(imported["rows_per_sec"] / baseline, 1),
+            "reimport": {key: reimported[key] for key in ("rows", "inserted", "rows_per_sec")},
+        },
+        "export": {
+            "rows": exported,
+            "rows_per_sec": round(exported / export_seconds, 1),
+        },
+        "near": {
+            "matches": len(near),
+            "matches_agree_with_full_scan": len(near) == scan_count,
+            "geohash_index_ms": indexed_ms,
+            "full_scan_ms": scan_ms,
+            "query_plan": plan,
+        },
+    }
+    report["import"]["batched"].pop("rejected_lines")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
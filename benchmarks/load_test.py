@@ -0,0 +1,272 @@
+# load_test.py
+#
+# Offline load test: starts the service stubs (benchmarks/stubs.py), runs
+# the app under gunicorn against them and drives each scenario with a fixed
+# number of concurrent keep-alive clients. Reports p50/p95/p99 latency and
+# throughput per scenario as JSON, tagged with the git commit, so runs can
+# be compared across commits:
+#
+#   python benchmarks/load_test.py --concurrency 16 --duration 20 \
+#       --output benchmarks/results/$(git rev-parse --short HEAD).json
+#   python benchmarks/load_test.py --compare benchmarks/results/abc1234.json
+#
+# --url skips gunicorn and the stubs and targets a server that is already up.
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from urllib.parse import urlencode, urlparse
+
+import numpy as np
+
+from bench_startup import ROOT, free_port
+from stubs import OpenWeatherStub, SMTPSink, stub_env
+
+# Sampled inside the North Atlantic basin the app is built for
+LAT_RANGE = (10.0, 45.0)
+LON_RANGE = (-95.0, -15.0)
+
+
+def random_point(rng):
+    return round(rng.uniform(*LAT_RANGE), 4), round(rng.uniform(*LON_RANGE), 4)
+
+
+def predict_point(rng):
+    lat, lon = random_point(rng)
+    return {
+        "windSpeed": round(rng.uniform(10, 160), 1),
+        "pressure": round(rng.uniform(900, 1015), 1),
+        "distanceToLand": round(rng.uniform(0, 1500), 1),
+        "latitude": lat,
+        "longitude": lon,
+        "day_night": rng.randint(0, 1),
+    }
+
+
+def json_request(method, path, payload):
+    return method, path, json.dumps(payload), {"Content-Type": "application/json"}
+
+
+# Each scenario builds (method, path, body, headers) for request number i
+SCENARIOS = {
+    "predict_status": lambda rng, i: json_request(
+        "POST", "/predict_status", predict_point(rng)
+    ),
+    "predict_batch_100": lambda rng, i: json_request(
+        "POST", "/predict_status/batch", [predict_point(rng) for _ in range(100)]
+    ),
+    "distance_to_land": lambda rng, i: (
+        "GET",
+        "/get_distance_to_land?" + urlencode(dict(zip(("lat", "lng"), random_point(rng)))),
+        None,
+        {},
+    ),
+    "assess": lambda rng, i: (
+        "GET",
+        "/assess?" + urlencode(dict(zip(("lat", "lng"), random_point(rng)))),
+        None,
+        {},
+    ),
+    # Distinct questions so the chatbot's answer cache doesn't hide the model
+    "gemini_chatbot": lambda rng, i: json_request(
+        "POST", "/gemini_chatbot", {"question": f"How do hurricanes form? ({i})"}
+    ),
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+            text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def start_gunicorn(env, workers, threads, timeout=120):
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+         "-b", f"127.0.0.1:{port}", "--workers", str(workers), "--threads", str(threads),
+         "app:app"],
+        cwd=ROOT,
+        env=dict(os.environ, **env),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    while True:
+        if proc.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        if time.perf_counter() - started > timeout:
+            proc.kill()
+            raise RuntimeError("gunicorn did not become ready in time")
+        try:
+            with urllib.request.urlopen(url + "/metrics", timeout=1):
+                return proc, url
+        except OSError:
+            time.sleep(0.1)
+
+
+def run_scenario(url, name, concurrency, duration, warmup, seed=0):
+    """
+    Drive one scenario with `concurrency` keep-alive clients for `duration`
+    seconds after `warmup` seconds whose requests aren't counted.
+    """
+    build = SCENARIOS[name]
+    target = urlparse(url)
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    counter = iter(range(10 ** 9))
+
+    def client(slot):
+        rng = random.Random(seed * 1000 + slot)
+        connection = http.client.HTTPConnection(target.hostname, target.port, timeout=60)
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            method, path, body, headers = build(rng, next(counter))
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(target.hostname, target.port, timeout=60)
+                ok = False
+            end = time.perf_counter()
+            if start >= measure_from:
+                if ok:
+                    latencies[slot].append(end - start)
+                else:
+                    errors[slot] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(slot,)) for slot in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    samples = np.concatenate([np.asarray(slot) for slot in latencies]) * 1000
+    completed = len(samples)
+    report = {
+        "requests": completed,
+        "errors": sum(errors),
+        "throughput_rps": round(completed / duration, 1),
+    }
+    if completed:
+        report.update(
+            {f"p{p}_ms": round(float(np.percentile(samples, p)), 3) for p in (50, 95, 99)}
+        )
+        report["max_ms"] = round(float(samples.max()), 3)
+    return report
+
+
+def compare(baseline, current):
+    """
+    Print per-scenario changes from a baseline report; negative latency
+    deltas and positive throughput deltas are improvements.
+    """
+    print(f"Comparing {current['meta']['revision']} against {baseline['meta']['revision']}")
+    print(f"{'scenario':<20}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, result in current["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if not old:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            if metric not in old or metric not in result:
+                continue
+            change = (result[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            print(f"{name:<20}{metric:<16}{old[metric]:>12}{result[metric]:>12}{change:>9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the app under gunicorn.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run; repeatable (default: all)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--weather-latency", type=float, default=0.05)
+    parser.add_argument("--gemini-latency", type=float, default=0.05)
+    parser.add_argument("--url", help="Benchmark an already-running server instead")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    args = parser.parse_args()
+
+    scenarios = args.scenario or list(SCENARIOS)
+    proc = weather = smtp = None
+    try:
+        if args.url:
+            url = args.url.rstrip("/")
+        else:
+            weather = OpenWeatherStub(latency=args.weather_latency).start()
+            smtp = SMTPSink().start()
+            database = os.path.join(tempfile.mkdtemp(prefix="prehurricane-bench-"), "bench.db")
+            env = stub_env(weather, smtp, database, args.gemini_latency)
+            proc, url = start_gunicorn(env, args.workers, args.threads)
+
+        results = {}
+        for name in scenarios:
+            results[name] = run_scenario(url, name, args.concurrency, args.duration, args.warmup)
+            print(f"{name}: {json.dumps(results[name])}", flush=True)
+    finally:
+        if proc is not None:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=30)
+        for stub in (weather, smtp):
+            if stub is not None:
+                stub.stop()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "url": args.url,
+            "workers": None if args.url else args.workers,
+            "threads": None if args.url else args.threads,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "weather_latency_s": None if args.url else args.weather_latency,
+            "gemini_latency_s": None if args.url else args.gemini_latency,
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# stubs.py
+#
+# Local stand-ins for the app's external services so benchmarks run fully
+# offline:
+#
+#   OpenWeather -> OpenWeatherStub, a threaded HTTP server on 127.0.0.1
+#   Gemini      -> GEMINI_BACKEND=stub (utils.chatbot.StubGeminiModel)
+#   MySQL       -> DATABASE_URL=sqlite:///... (utils.db.SQLitePool)
+#   SMTP        -> SMTPSink, a minimal SMTP server that counts and drops mail
+#
+# Run them in the foreground for manual testing; the environment to export
+# for the app is printed on startup:
+#
+#   python benchmarks/stubs.py --weather-latency 0.05
+
+import argparse
+import hashlib
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def weather_payload(lat, lon):
+    """
+    Deterministic OpenWeather-shaped response for a location, varied by
+    position so cached and uncached lookups see realistic values.
+    """
+    seed = int(hashlib.sha1(f"{lat:.2f},{lon:.2f}".encode()).hexdigest()[:8], 16)
+    now = int(time.time())
+    return {
+        "coord": {"lat": lat, "lon": lon},
+        "dt": now,
+        "timezone": int(round(lon / 15)) * 3600,
+        "wind": {"speed": 2.0 + seed % 400 / 10.0, "deg": seed % 360},
+        "main": {
+            "temp": 20.0 + seed % 150 / 10.0,
+            "pressure": 960 + seed % 55,
+            "sea_level": 960 + seed % 55,
+            "humidity": 50 + seed % 50,
+        },
+        "weather": [{"description": "scattered clouds"}],
+        "sys": {"sunrise": now - 6 * 3600, "sunset": now + 6 * 3600},
+    }
+
+
+class OpenWeatherStub:
+    """
+    Serves /data/2.5/weather on a local port after `latency` seconds. With
+    `rate_limit`, requests beyond that many per second get HTTP 429 and
+    Retry-After, like the real API past its quota.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, rate_limit=None):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                try:
+                    lat = float(query["lat"][0])
+                    lon = float(query["lon"][0])
+                except (KeyError, ValueError):
+                    self.send_error(400, "lat and lon are required")
+                    return
+                if not stub._admit():
+                    body = b'{"cod": 429, "message": "rate limited"}'
+                    self.send_response(429)
+                    self.send_header("Retry-After", "1")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                time.sleep(stub.latency)
+                body = json.dumps(weather_payload(lat, lon)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with stub._lock:
+                    stub.requests += 1
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.requests = 0
+        self.throttled = 0
+        self._window = (0, 0)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    def _admit(self):
+        # Fixed one-second windows
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            second, count = self._window
+            now = int(time.time())
+            if now != second:
+                second, count = now, 0
+            self._window = (second, count + 1)
+            if count < self.rate_limit:
+                return True
+            self.throttled += 1
+            return False
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/data/2.5/weather"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SMTPSink:
+    """
+    Accepts SMTP sessions and discards messages, counting them. Enough of
+    RFC 5321 for smtplib and Flask-Mail: HELO/EHLO, MAIL, RCPT, DATA,
+    RSET, NOOP and QUIT.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def handle(self):
+                self.reply("220 stub ESMTP")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode(errors="replace").strip().upper()
+                    if command.startswith("EHLO"):
+                        self.wfile.write(b"250-stub\r\n250 8BITMIME\r\n")
+                    elif command.startswith("DATA"):
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                            pass
+                        with sink._lock:
+                            sink.messages += 1
+                        self.reply("250 OK")
+                    elif command.startswith("QUIT"):
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("250 OK")
+
+        self.messages = 0
+        self._lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def stub_env(weather, smtp, database_path, gemini_latency=0.05):
+    """
+    Environment variables that point the app at the stubs.
+    """
+    smtp_host, smtp_port = smtp.address
+    return {
+        "GEMINI_BACKEND": "stub",
+        "GEMINI_STUB_LATENCY": str(gemini_latency),
+        "openweather_api_key": "stub",
+        "GOOGLE_MAPS_API_KEY": "stub",
+        "OPENWEATHER_URL": weather.url,
+        "DATABASE_URL": f"sqlite:///{database_path}",
+        "MAIL_SERVER": smtp_host,
+        "MAIL_PORT": str(smtp_port),
+        "MAIL_USE_TLS": "False",
+        "MAIL_USERNAME": "alerts@example.com",
+        "MAIL_PASSWORD": "",
+        "LOG_LEVEL": "WARNING",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline service stubs.")
+    parser.add_argument("--weather-port", type=int, default=8765)
+    parser.add_argument("--weather-latency", type=float, default=0.05)
+    parser.add_argument("--weather-rate-limit", type=int,
+                        help="Answer HTTP 429 beyond this many weather requests per second")
+    parser.add_argument("--smtp-port", type=int, default=8025)
+    parser.add_argument("--gemini-latency", type=float, default=0.05)
+    parser.add_argument("--database", default=os.path.join(tempfile.gettempdir(), "bench.db"))
+    args = parser.parse_args()
+
+    weather = OpenWeatherStub(
+        port=args.weather_port, latency=args.weather_latency, rate_limit=args.weather_rate_limit
+    ).start()
+    smtp = SMTPSink(port=args.smtp_port).start()
+    for key, value in stub_env(weather, smtp, args.database, args.gemini_latency).items():
+        print(f"export {key}={value}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"weather requests: {weather.requests}, messages: {smtp.messages}", flush=True)
+    except KeyboardInterrupt:
+        weather.stop()
+        smtp.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+# gunicorn.conf.py
+#
+# Import the app (and load the model artifacts) once in the master, then
+# fork workers that share those pages copy-on-write instead of each one
+# unpickling its own copy. Set GUNICORN_PRELOAD=0 to load per worker.
+
+import gc
+import os
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far out of the collector's view, so GC
+    # passes in the workers don't write to (and un-share) the master's pages.
+    gc.freeze()
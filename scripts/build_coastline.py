@@ -0,0 +1,128 @@
+# build_coastline.py
+#
+# Offline step: sample a coastline GeoJSON (e.g. Natural Earth
+# ne_10m_coastline.geojson) into evenly spaced lat/lon points for
+# utils.coastline.CoastlineIndex. The app, the distance raster and the
+# risk grid refuse to run on the bundled seed CSV without it.
+#
+#   python scripts/build_coastline.py --download
+#   python scripts/build_coastline.py ne_10m_coastline.geojson \
+#       --spacing-km 5 --output data/coastline_points.npy
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.coastline import EARTH_RADIUS_KM  # noqa: E402
+
+# Natural Earth 1:10m coastline (public domain), as GeoJSON.
+NATURAL_EARTH_URL = (
+    "https://raw.githubusercontent.com/nvkelso/natural-earth-vector/master/"
+    "geojson/ne_10m_coastline.geojson"
+)
+
+
+def iter_lines(geometry):
+    """
+    Yield each coordinate list (lon, lat pairs) of a LineString/Polygon geometry.
+    """
+    kind = geometry["type"]
+    coords = geometry["coordinates"]
+    if kind == "LineString":
+        yield coords
+    elif kind in ("MultiLineString", "Polygon"):
+        yield from coords
+    elif kind == "MultiPolygon":
+        for polygon in coords:
+            yield from polygon
+    elif kind == "GeometryCollection":
+        for child in geometry["geometries"]:
+            yield from iter_lines(child)
+
+
+def densify(line, spacing_km):
+    """
+    Resample a polyline so consecutive points are at most spacing_km apart.
+    """
+    coords = np.asarray(line, dtype=np.float64)[:, :2]
+    lon, lat = coords[:, 0], coords[:, 1]
+    points = [np.column_stack([lat[:1], lon[:1]])]
+
+    for i in range(1, len(coords)):
+        # Equirectangular length is accurate enough to choose a step count.
+        dlat = np.radians(lat[i] - lat[i - 1])
+        dlon = np.radians(lon[i] - lon[i - 1]) * np.cos(np.radians((lat[i] + lat[i - 1]) / 2))
+        length_km = EARTH_RADIUS_KM * np.hypot(dlat, dlon)
+        steps = max(int(np.ceil(length_km / spacing_km)), 1)
+        t = np.arange(1, steps + 1) / steps
+        points.append(
+            np.column_stack(
+                [lat[i - 1] + t * (lat[i] - lat[i - 1]), lon[i - 1] + t * (lon[i] - lon[i - 1])]
+            )
+        )
+
+    return np.concatenate(points)
+
+
+def download(url, path, timeout=60):
+    import requests
+
+    with requests.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        with open(path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+
+
+def build(geojson_path, spacing_km):
+    with open(geojson_path) as f:
+        collection = json.load(f)
+
+    features = collection.get("features", [collection])
+    chunks = []
+    for feature in features:
+        geometry = feature.get("geometry", feature)
+        if geometry is None:
+            continue
+        for line in iter_lines(geometry):
+            if len(line) > 0:
+                chunks.append(densify(line, spacing_km))
+
+    points = np.concatenate(chunks)
+    # Drop duplicates introduced by shared segment endpoints.
+    return np.unique(np.round(points, 5), axis=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sample a coastline GeoJSON into lat/lon points."
+    )
+    parser.add_argument("geojson", nargs="?", help="Coastline GeoJSON file")
+    parser.add_argument("--download", action="store_true",
+                        help=f"Fetch Natural Earth ne_10m_coastline ({NATURAL_EARTH_URL})")
+    parser.add_argument("--spacing-km", type=float, default=5.0)
+    parser.add_argument("--output", default="data/coastline_points.npy")
+    args = parser.parse_args()
+    if (args.geojson is None) == (not args.download):
+        parser.error("Give a GeoJSON file or --download")
+
+    if args.download:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ne_10m_coastline.geojson")
+            print(f"Downloading {NATURAL_EARTH_URL}")
+            download(NATURAL_EARTH_URL, path)
+            points = build(path, args.spacing_km)
+    else:
+        points = build(args.geojson, args.spacing_km)
+    np.save(args.output, points)
+    print(f"Wrote {len(points)} coastline points to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
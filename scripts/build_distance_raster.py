@@ -0,0 +1,59 @@
+# build_distance_raster.py
+#
+# Offline step: rasterize distance-to-coast onto a regular lat/lon grid for
+# utils.distance_raster.DistanceRaster.
+#
+#   python scripts/build_distance_raster.py --step 0.05 \
+#       --lat-min 0 --lat-max 65 --lon-min -100 --lon-max -5 \
+#       --output data/distance_to_land.npy
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.coastline import DEFAULT_COASTLINE_PATH, CoastlineIndex  # noqa: E402
+from utils.distance_raster import DEFAULT_RASTER_PATH, save_raster  # noqa: E402
+
+# Rows queried per BallTree call; keeps peak memory flat for fine grids.
+ROWS_PER_CHUNK = 64
+
+
+def build(index, lat_min, lat_max, lon_min, lon_max, step):
+    lats = lat_min + step * np.arange(int(round((lat_max - lat_min) / step)) + 1)
+    lons = lon_min + step * np.arange(int(round((lon_max - lon_min) / step)) + 1)
+    grid = np.empty((len(lats), len(lons)), dtype=np.float32)
+
+    for start in range(0, len(lats), ROWS_PER_CHUNK):
+        chunk = lats[start:start + ROWS_PER_CHUNK]
+        lat_grid, lon_grid = np.meshgrid(chunk, lons, indexing="ij")
+        grid[start:start + len(chunk)] = index.query(lat_grid, lon_grid)
+        print(f"Rasterized rows {start + len(chunk)}/{len(lats)}")
+
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rasterize distance-to-coast onto a lat/lon grid."
+    )
+    parser.add_argument("--coastline", default=DEFAULT_COASTLINE_PATH)
+    parser.add_argument("--step", type=float, default=0.05, help="Grid spacing in degrees")
+    parser.add_argument("--lat-min", type=float, default=0.0)
+    parser.add_argument("--lat-max", type=float, default=65.0)
+    parser.add_argument("--lon-min", type=float, default=-100.0)
+    parser.add_argument("--lon-max", type=float, default=-5.0)
+    parser.add_argument("--output", default=DEFAULT_RASTER_PATH)
+    args = parser.parse_args()
+
+    index = CoastlineIndex.from_file(args.coastline)
+    grid = build(index, args.lat_min, args.lat_max, args.lon_min, args.lon_max, args.step)
+    save_raster(args.output, grid, args.lat_min, args.lon_min, args.step)
+    print(f"Wrote {grid.shape[0]}x{grid.shape[1]} raster to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# build_risk_grid.py
+#
+# Offline step: sweep a lat/lon grid over the North Atlantic for a set of
+# wind/pressure scenarios, run the preprocessor and model on every cell in
+# large chunks across a process pool, and write the predicted class and
+# confidence grids for utils.risk_grid.RiskGrid (served at /risk_grid).
+#
+#   python scripts/build_risk_grid.py --step 0.25 --workers 4 \
+#       --scenario 65,987,1 --scenario 115,950,1 --output data/risk_grid
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.coastline import DEFAULT_COASTLINE_PATH, CoastlineIndex  # noqa: E402
+from utils.distance_raster import DEFAULT_RASTER_PATH, DistanceRaster  # noqa: E402
+from utils.model_registry import DEFAULT_REGISTRY_PATH, load_active_bundle  # noqa: E402
+from utils.prediction import predict_features  # noqa: E402
+from utils.risk_grid import (  # noqa: E402
+    CONFIDENCE_SCALE,
+    DEFAULT_RISK_GRID_PATH,
+    DEFAULT_SCENARIOS,
+    grid_axes,
+    save_risk_grid,
+    scenario_features,
+)
+
+# Grid rows per task; with the default grid this is ~30k cells per
+# predict_proba call.
+ROWS_PER_TASK = 80
+
+# Set in each pool worker by _init_worker
+_worker = {}
+
+
+def _init_worker(bundle_args, lats, lons, distance):
+    # Each process loads its own model once instead of receiving it per task.
+    # bundle_args pins the version the parent resolved, so a CURRENT switch
+    # mid-build can't mix two models in one grid
+    bundle = load_active_bundle(**bundle_args)
+    _worker["model"] = bundle.model
+    _worker["preprocessor"] = bundle.preprocessor
+    _worker["lats"] = lats
+    _worker["lons"] = lons
+    _worker["distance"] = distance
+
+
+def _score_rows(task):
+    scenario_index, scenario, start, stop = task
+    model = _worker["model"]
+    features = scenario_features(
+        _worker["lats"][start:stop], _worker["lons"], _worker["distance"][start:stop], scenario
+    )
+    predictions, probabilities = predict_features(model, _worker["preprocessor"], features)
+    class_index = np.searchsorted(model.classes_, predictions).astype(np.uint8)
+    confidence = np.rint(probabilities.max(axis=1) * CONFIDENCE_SCALE).astype(np.uint8)
+    shape = (stop - start, len(_worker["lons"]))
+    return scenario_index, start, class_index.reshape(shape), confidence.reshape(shape)
+
+
+def distance_grid(lats, lons, raster_path, coastline_path):
+    """
+    Distance to land for every cell: the precomputed raster where it covers
+    the grid, the coastline index everywhere else.
+    """
+    lat_grid, lon_grid = np.meshgrid(lats, lons, indexing="ij")
+    distance = np.full(lat_grid.shape, np.nan)
+    if raster_path and os.path.exists(raster_path):
+        distance = DistanceRaster.load(raster_path).lookup(lat_grid, lon_grid)
+    missing = np.isnan(distance)
+    if missing.any():
+        index = CoastlineIndex.from_file(coastline_path)
+        distance[missing] = index.query(lat_grid[missing], lon_grid[missing])
+    return distance
+
+
+def parse_scenario(value):
+    parts = [float(part) for part in value.split(",")]
+    if len(parts) == 2:
+        parts.append(1.0)
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError("Scenario must be wind,pressure[,day_night]")
+    return parts[0], parts[1], int(parts[2])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute predicted risk over a lat/lon grid for wind/pressure scenarios."
+    )
+    parser.add_argument("--registry", default=os.getenv("MODEL_REGISTRY_PATH", DEFAULT_REGISTRY_PATH),
+                        help="Model registry; its CURRENT version is used when it exists")
+    parser.add_argument("--model", default="Models/best_random_forest_model4.pkl")
+    parser.add_argument("--forest", default=os.getenv("COMPACT_FOREST_PATH", "Models/forest4"),
+                        help="Compiled forest directory, used instead of --model if present")
+    parser.add_argument("--preprocessor", default="Models/preprocessor4.pkl")
+    parser.add_argument("--raster", default=DEFAULT_RASTER_PATH)
+    parser.add_argument("--coastline", default=DEFAULT_COASTLINE_PATH)
+    parser.add_argument("--scenario", type=parse_scenario, action="append",
+                        help="wind,pressure[,day_night]; repeatable")
+    parser.add_argument("--step", type=float, default=0.25, help="Grid spacing in degrees")
+    parser.add_argument("--lat-min", type=float, default=0.0)
+    parser.add_argument("--lat-max", type=float, default=65.0)
+    parser.add_argument("--lon-min", type=float, default=-100.0)
+    parser.add_argument("--lon-max", type=float, default=-5.0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default=DEFAULT_RISK_GRID_PATH)
+    args = parser.parse_args()
+
+    scenarios = args.scenario or list(DEFAULT_SCENARIOS)
+    started = time.perf_counter()
+    # Same resolution as the app: registry CURRENT, else the files under Models/
+    bundle_args = {
+        "registry_root": args.registry,
+        "compact_forest_path": args.forest,
+        "model_path": args.model,
+        "preprocessor_path": args.preprocessor,
+    }
+    bundle = load_active_bundle(**bundle_args)
+    bundle_args["version"] = bundle.version
+    print(f"Scoring with model {bundle.version}")
+    lats, lons = grid_axes(args.lat_min, args.lat_max, args.lon_min, args.lon_max, args.step)
+    distance = distance_grid(lats, lons, args.raster, args.coastline)
+    print(f"Distance grid {distance.shape[0]}x{distance.shape[1]} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    shape = (len(scenarios), len(lats), len(lons))
+    classes = np.empty(shape, dtype=np.uint8)
+    confidence = np.empty(shape, dtype=np.uint8)
+    tasks = [
+        (i, scenario, start, min(start + ROWS_PER_TASK, len(lats)))
+        for i, scenario in enumerate(scenarios)
+        for start in range(0, len(lats), ROWS_PER_TASK)
+    ]
+
+    initargs = (bundle_args, lats, lons, distance)
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=initargs) as executor:
+        for done, (i, start, class_index, conf) in enumerate(
+            executor.map(_score_rows, tasks), start=1
+        ):
+            classes[i, start:start + len(class_index)] = class_index
+            confidence[i, start:start + len(conf)] = conf
+            if done % 10 == 0 or done == len(tasks):
+                print(f"Scored {done}/{len(tasks)} blocks")
+
+    save_risk_grid(
+        args.output, classes, confidence, bundle.model.classes_, scenarios,
+        args.lat_min, args.lon_min, args.step,
+        model_version=bundle.version, source={"paths": bundle.paths},
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {shape[0]} scenarios x {shape[1]}x{shape[2]} cells to {args.output} "
+          f"in {elapsed:.1f}s ({classes.size / elapsed:,.0f} cells/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# compile_forest.py
+#
+# Offline step: flatten the joblib random forest into memory-mappable node
+# arrays for utils.forest.CompactForest, then check the compiled forest
+# reproduces sklearn's predict_proba exactly.
+#
+#   python scripts/compile_forest.py --model Models/best_random_forest_model4.pkl \
+#       --output Models/forest4
+
+import argparse
+import os
+import sys
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.forest import CompactForest, compile_forest, save_forest  # noqa: E402
+
+
+def verify(model, forest, n_samples=20000, seed=0):
+    """
+    Compare predict_proba/predict on standardized random inputs (the
+    preprocessor outputs z-scores) plus the model's own split thresholds,
+    which exercise the `<=` boundary. Raises AssertionError on any mismatch.
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.normal(scale=2.0, size=(n_samples, model.n_features_in_))
+
+    internal = np.asarray(forest.left) != np.arange(len(forest.left))
+    thresholds = np.asarray(forest.threshold)[internal]
+    features = np.asarray(forest.feature)[internal]
+    boundary = rng.normal(scale=2.0, size=(len(thresholds), model.n_features_in_))
+    boundary[np.arange(len(thresholds)), features] = thresholds
+    X = np.vstack([X, boundary])
+
+    expected = model.predict_proba(X)
+    actual = forest.predict_proba(X)
+    assert np.array_equal(expected, actual), "predict_proba mismatch"
+    assert np.array_equal(model.predict(X), forest.predict(X)), "predict mismatch"
+    return len(X)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the random forest to node arrays.")
+    parser.add_argument("--model", default="Models/best_random_forest_model4.pkl")
+    parser.add_argument("--output", default="Models/forest4")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    save_forest(compile_forest(model), args.output)
+    forest = CompactForest.load(args.output)
+    checked = verify(model, forest)
+    print(f"Wrote {args.output}: {forest.n_estimators} trees, "
+          f"{len(forest.feature)} nodes; verified on {checked} rows")
+
+
+if __name__ == "__main__":
+    main()
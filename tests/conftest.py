@@ -0,0 +1,97 @@
+# conftest.py
+#
+# Shared fixtures: a throwaway SQLite database with the app's schema, the
+# local SMTP and OpenWeather stubs from benchmarks/stubs.py, a small model
+# bundle trained on the committed preprocessor so tests don't need the
+# production forest pickle, and the app itself serving that model.
+
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+from benchmarks.stubs import OpenWeatherStub, SMTPSink
+from utils.db import DatabasePool, SQLitePool
+from utils.feature_pipeline import verification_sample
+from utils.model_registry import ModelBundle, ModelRegistry
+from utils.prediction import build_feature_frame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREPROCESSOR_PATH = os.path.join(ROOT, "Models", "preprocessor4.pkl")
+
+
+@pytest.fixture
+def sqlite_pool(tmp_path):
+    pool = DatabasePool("sqlite", SQLitePool(str(tmp_path / "test.db")))
+    pool.ensure_schema()
+    return pool
+
+
+@pytest.fixture
+def smtp_sink():
+    sink = SMTPSink().start()
+    yield sink
+    sink.stop()
+
+
+@pytest.fixture(scope="session")
+def preprocessor():
+    return joblib.load(PREPROCESSOR_PATH)
+
+
+@pytest.fixture(scope="session")
+def forest_model(preprocessor):
+    from sklearn.ensemble import RandomForestClassifier
+
+    # Classes bucketed by wind speed, like the real labels
+    features = verification_sample(n=3000, seed=1)
+    labels = np.digitize(features[:, 0], [34, 64, 83, 96, 113, 137]) - 1
+    model = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0)
+    model.fit(preprocessor.transform(build_feature_frame(features)), labels)
+    return model
+
+
+@pytest.fixture(scope="session")
+def model_bundle(forest_model, preprocessor):
+    return ModelBundle("test", forest_model, preprocessor, [PREPROCESSOR_PATH])
+
+
+@pytest.fixture(scope="session")
+def weather_stub():
+    stub = OpenWeatherStub(latency=0.0).start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory, forest_model, weather_stub):
+    # The app is configured at import, so it is imported once per session,
+    # serving forest_model from a throwaway registry
+    root = tmp_path_factory.mktemp("app")
+    model_path = str(root / "model.pkl")
+    joblib.dump(forest_model, model_path)
+    registry = ModelRegistry(str(root / "registry"))
+    registry.publish("v1", PREPROCESSOR_PATH, model_path=model_path)
+    registry.promote("v1")
+
+    environment = pytest.MonkeyPatch()
+    for name in ("DATABASE_URL", "DB_HOST", "DB_USER"):
+        environment.delenv(name, raising=False)
+    for name, value in {
+        "MODEL_REGISTRY_PATH": registry.root,
+        "COASTLINE_PATH": os.path.join(ROOT, "data", "coastline_points.csv"),
+        "COASTLINE_ALLOW_SEED": "1",
+        "DISTANCE_RASTER_PATH": str(root / "no-raster"),
+        "RISK_GRID_PATH": str(root / "no-risk-grid"),
+        "GEMINI_BACKEND": "stub",
+        "GEMINI_STUB_LATENCY": "0.05",
+        "MONITORED_REGIONS_ENABLED": "0",
+        "OPENWEATHER_URL": weather_stub.url,
+        "openweather_api_key": "test",
+    }.items():
+        environment.setenv(name, value)
+    import app
+
+    yield app
+    environment.undo()
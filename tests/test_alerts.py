@@ -0,0 +1,124 @@
+# test_alerts.py
+#
+# AlertDispatcher against the local SMTP sink: every subscriber gets the
+# alert once, checkpoints resume a run (also after a crash part-way through
+# a page), area alerts are paged from the database, and a failing message
+# neither stalls the run nor gets lost.
+
+import io
+import json
+
+import pytest
+
+from utils.alerts import AlertDispatcher, SMTPSettings, iter_area_subscriber_pages
+from utils.subscribers import import_csv, subscribers_near
+
+SUBSCRIBERS = 45
+
+
+@pytest.fixture
+def pool(sqlite_pool):
+    lines = ["name,email,phone,lat,lon"] + [
+        f"User {i},user{i}@example.com,555-{i:04d},{25 + i * 0.01:.2f},-80.2"
+        for i in range(SUBSCRIBERS)
+    ]
+    import_csv(sqlite_pool, io.StringIO("\n".join(lines) + "\n"))
+    return sqlite_pool
+
+
+def dispatcher(pool, sink, tmp_path, **kwargs):
+    host, port = sink.address
+    kwargs.setdefault("connections", 3)
+    kwargs.setdefault("rate", 10000)
+    kwargs.setdefault("page_size", 10)
+    return AlertDispatcher(
+        pool,
+        SMTPSettings(host, port, sender="alerts@example.com"),
+        alert_id="test-alert",
+        storm_name="Milton",
+        status="Hurricane (74+ mph)",
+        checkpoint_path=str(tmp_path / "alert.checkpoint.json"),
+        failed_path=str(tmp_path / "alert.failed.jsonl"),
+        **kwargs,
+    )
+
+
+def test_every_subscriber_is_alerted_once(pool, smtp_sink, tmp_path):
+    report = dispatcher(pool, smtp_sink, tmp_path).run()
+
+    assert report["sent"] == SUBSCRIBERS
+    assert report["failed"] == 0
+    assert smtp_sink.messages == SUBSCRIBERS
+    with open(tmp_path / "alert.checkpoint.json") as f:
+        assert json.load(f)["last_id"] == SUBSCRIBERS
+
+    # Rerunning the same alert resumes after the checkpoint: nothing to send
+    again = dispatcher(pool, smtp_sink, tmp_path).run()
+    assert again["resumed_after_id"] == SUBSCRIBERS
+    assert again["sent"] == 0
+    assert smtp_sink.messages == SUBSCRIBERS
+
+
+def test_area_alert_only_reaches_nearby_subscribers(pool, smtp_sink, tmp_path):
+    # Subscribers are 0.01 degrees (~1.1 km) apart going north from 25.00
+    report = dispatcher(pool, smtp_sink, tmp_path, area=(25.0, -80.2, 5.0)).run()
+
+    assert 0 < report["sent"] < SUBSCRIBERS
+    assert smtp_sink.messages == report["sent"]
+
+
+def test_area_pages_are_read_from_the_database_in_id_order(pool):
+    area = (25.0, -80.2, 12.0)
+    pages = list(iter_area_subscriber_pages(pool, area, page_size=4))
+
+    ids = [row[0] for page in pages for row in page]
+    assert all(len(page) <= 4 for page in pages)
+    assert ids == sorted(row[0] for row in subscribers_near(pool, *area))
+    assert [row[0] for page in iter_area_subscriber_pages(pool, area, 4, after_id=5)
+            for row in page] == [i for i in ids if i > 5]
+
+
+def test_crash_mid_page_resumes_after_the_last_batch(pool, smtp_sink, tmp_path):
+    alerts = dispatcher(pool, smtp_sink, tmp_path, page_size=20, batch_size=5)
+    render = alerts.render
+
+    def render_then_crash(rows):
+        if any(subscriber_id == 13 for subscriber_id, _, _ in rows):
+            raise RuntimeError("worker killed")
+        return render(rows)
+
+    alerts.render = render_then_crash
+    with pytest.raises(RuntimeError):
+        alerts.run()
+    with open(tmp_path / "alert.checkpoint.json") as f:
+        assert json.load(f)["last_id"] == 10
+    assert smtp_sink.messages == 10
+
+    report = dispatcher(pool, smtp_sink, tmp_path, page_size=20, batch_size=5).run()
+    assert report["resumed_after_id"] == 10
+    assert report["sent"] == SUBSCRIBERS - 10
+    assert smtp_sink.messages == SUBSCRIBERS
+
+
+def test_unexpected_error_fails_one_message_and_can_be_retried(pool, smtp_sink, tmp_path):
+    alerts = dispatcher(pool, smtp_sink, tmp_path)
+    render = alerts.render
+
+    def render_with_broken_message(rows):
+        # A message smtplib chokes on with something other than an SMTP error
+        return [(i, None) if i == 7 else (i, message) for i, message in render(rows)]
+
+    alerts.render = render_with_broken_message
+    report = alerts.run()
+
+    assert report["sent"] == SUBSCRIBERS - 1
+    assert report["failed"] == 1
+    with open(tmp_path / "alert.failed.jsonl") as f:
+        assert [json.loads(line)["id"] for line in f] == [7]
+
+    retry = dispatcher(pool, smtp_sink, tmp_path).retry_failed()
+    assert retry["retried"] == 1
+    assert retry["sent"] == 1
+    assert retry["failed"] == 0
+    assert smtp_sink.messages == SUBSCRIBERS
+    assert not (tmp_path / "alert.failed.jsonl").exists()
@@ -0,0 +1,47 @@
+# test_assess.py
+#
+# /assess builds the features itself from the OpenWeather stub: wind goes
+# to the model in knots (its training unit) and comes back in km/h.
+
+import numpy as np
+
+from benchmarks.stubs import weather_payload
+from utils.prediction import KMH_PER_KNOT, describe_prediction, predict_features
+
+
+def test_assess_feeds_the_model_knots(app_module):
+    client = app_module.app.test_client()
+    lat, lng = 25.76, -80.19
+
+    response = client.get(f"/assess?lat={lat}&lng={lng}")
+
+    assert response.status_code == 200
+    body = response.get_json()
+    payload = weather_payload(lat, lng)
+    wind_kmh = payload["wind"]["speed"] * 3.6
+    assert np.isclose(body["wind_speed"], wind_kmh)
+
+    pressure = float(payload["main"]["pressure"])
+    knots = wind_kmh / KMH_PER_KNOT
+    features = np.array([[
+        knots, pressure, body["distance_to_land"], lat, lng, knots / pressure,
+        1.0 if body["is_day"] == "Day" else 0.0,
+    ]])
+    bundle = app_module.model_bundle
+    predictions, probabilities = predict_features(bundle.model, bundle.preprocessor, features)
+    # A point where the unit matters: km/h would score differently
+    as_kmh = features.copy()
+    as_kmh[0, [0, 5]] *= KMH_PER_KNOT
+    assert not np.allclose(
+        predict_features(bundle.model, bundle.preprocessor, as_kmh)[1], probabilities
+    )
+    assert body["status"] == describe_prediction(predictions[0])
+    assert body["probabilities"] == {
+        str(int(c)): round(float(p), 6) for c, p in zip(bundle.model.classes_, probabilities[0])
+    }
+
+
+def test_assess_rejects_bad_coordinates(app_module):
+    client = app_module.app.test_client()
+    assert client.get("/assess?lat=25.76").status_code == 400
+    assert client.get("/assess?lat=north&lng=-80.19").status_code == 400
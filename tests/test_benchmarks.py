@@ -0,0 +1,83 @@
+# test_benchmarks.py
+#
+# The offline service stubs behave like the services they replace, and the
+# load driver measures a live server.
+
+import json
+import os
+import smtplib
+import sys
+import threading
+import urllib.error
+import urllib.request
+from email.message import EmailMessage
+
+import pytest
+from werkzeug.serving import make_server
+
+from benchmarks.stubs import OpenWeatherStub, stub_env
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+from load_test import SCENARIOS, run_scenario  # noqa: E402
+
+
+def test_weather_stub_serves_openweather_shaped_responses(weather_stub):
+    with urllib.request.urlopen(f"{weather_stub.url}?lat=25.76&lon=-80.19&appid=x") as response:
+        body = json.load(response)
+    assert body["coord"] == {"lat": 25.76, "lon": -80.19}
+    assert {"dt", "timezone", "wind", "main", "sys"} <= set(body)
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"{weather_stub.url}?lat=25.76")
+    assert error.value.code == 400
+
+
+def test_weather_stub_rate_limits_like_the_real_api():
+    stub = OpenWeatherStub(latency=0.0, rate_limit=2).start()
+    try:
+        codes = []
+        for _ in range(5):
+            try:
+                with urllib.request.urlopen(f"{stub.url}?lat=1&lon=2") as response:
+                    codes.append(response.status)
+            except urllib.error.HTTPError as e:
+                codes.append(e.code)
+                assert e.headers["Retry-After"] == "1"
+        # Five requests span at most two one-second windows
+        assert codes.count(429) >= 1
+        assert stub.throttled == codes.count(429)
+    finally:
+        stub.stop()
+
+
+def test_smtp_sink_counts_delivered_messages(smtp_sink, weather_stub, tmp_path):
+    host, port = smtp_sink.address
+    with smtplib.SMTP(host, port) as smtp:
+        for i in range(3):
+            message = EmailMessage()
+            message["From"], message["To"] = "alerts@example.com", f"user{i}@example.com"
+            message["Subject"] = "Test"
+            message.set_content("Body")
+            smtp.send_message(message)
+    assert smtp_sink.messages == 3
+
+    env = stub_env(weather_stub, smtp_sink, str(tmp_path / "bench.db"))
+    assert env["OPENWEATHER_URL"] == weather_stub.url
+    assert env["MAIL_PORT"] == str(port)
+    assert env["GEMINI_BACKEND"] == "stub"
+
+
+def test_load_driver_measures_a_live_server(app_module):
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}"
+        report = run_scenario(url, "predict_status", concurrency=2, duration=0.5, warmup=0.1)
+    finally:
+        server.shutdown()
+
+    assert report["requests"] > 0
+    assert report["errors"] == 0
+    assert report["p50_ms"] <= report["p99_ms"] <= report["max_ms"]
+    assert set(SCENARIOS) >= {"predict_status", "predict_batch_100", "assess", "gemini_chatbot"}
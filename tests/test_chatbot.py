@@ -0,0 +1,106 @@
+# test_chatbot.py
+#
+# Buffered chatbot answers: cached by normalized question, calls bounded by
+# the executor and its queue, and slow calls turned into timeouts.
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils.chatbot import (
+    GENERATION_SETTINGS,
+    NO_ANSWER,
+    ChatbotBusy,
+    ChatbotService,
+    ChatbotTimeout,
+    StubGeminiModel,
+    normalize_question,
+)
+
+
+class CountingModel(StubGeminiModel):
+    def __init__(self, latency=0.0):
+        super().__init__(latency=latency)
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        self.calls += 1
+        return super().generate_content(prompt, generation_config, stream, **kwargs)
+
+
+class EmptyModel(CountingModel):
+    # Responds with no candidates, e.g. when Gemini blocks the prompt
+    def _response(self, text):
+        return SimpleNamespace(candidates=[])
+
+
+def service(model, **kwargs):
+    kwargs.setdefault("max_concurrency", 2)
+    kwargs.setdefault("max_queue", 2)
+    kwargs.setdefault("timeout", 2.0)
+    return ChatbotService(model_factory=lambda: (model, GENERATION_SETTINGS), **kwargs)
+
+
+def test_answers_are_cached_by_normalized_question():
+    model = CountingModel()
+    chatbot = service(model)
+
+    answer = chatbot.ask("What is a hurricane?")
+    assert chatbot.ask("  what IS a   hurricane ") == answer
+    assert model.calls == 1
+    assert normalize_question("What is a  Hurricane?!") == "what is a hurricane"
+    stats = chatbot.stats()
+    assert (stats["hits"], stats["misses"], stats["cache_entries"]) == (1, 1, 1)
+
+
+def test_missing_answers_are_not_cached():
+    model = EmptyModel()
+    chatbot = service(model)
+    assert chatbot.ask("Anything?") == NO_ANSWER
+    assert chatbot.ask("Anything?") == NO_ANSWER
+    assert model.calls == 2
+
+
+def test_calls_beyond_concurrency_and_queue_are_rejected():
+    chatbot = service(CountingModel(latency=0.3), max_concurrency=1, max_queue=1)
+    outcomes = []
+
+    def ask(i):
+        try:
+            outcomes.append(chatbot.ask(f"Question {i}"))
+        except ChatbotBusy:
+            outcomes.append("busy")
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    assert outcomes.count("busy") == 1
+    assert chatbot.stats()["rejected"] == 1
+    assert chatbot.stats()["pending"] == 0
+
+
+def test_slow_calls_time_out_and_release_their_slot():
+    chatbot = service(CountingModel(latency=0.3), max_concurrency=1, timeout=0.05)
+    with pytest.raises(ChatbotTimeout):
+        chatbot.ask("Slow question")
+    assert chatbot.stats()["timeouts"] == 1
+
+    # The overrunning call finishes in the background and frees the slot
+    time.sleep(0.4)
+    assert chatbot.stats()["pending"] == 0
+    chatbot.timeout = 2.0
+    assert chatbot.ask("Next question") == "Stub answer about Next question."
+
+
+def test_chatbot_route(app_module):
+    client = app_module.app.test_client()
+    response = client.post("/gemini_chatbot", json={"question": "Where do hurricanes form?"})
+    assert response.status_code == 200
+    assert response.get_json()["response"] == "Stub answer about Where do hurricanes form."
+    assert client.post("/gemini_chatbot", json={"question": "  "}).status_code == 400
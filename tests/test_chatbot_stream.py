@@ -0,0 +1,99 @@
+# test_chatbot_stream.py
+#
+# Streamed chatbot answers give their concurrency slot back however the
+# stream ends, and every chunk read is bounded by the timeout.
+#
+#   python -m pytest tests/test_chatbot_stream.py
+
+import time
+
+import pytest
+
+from utils.chatbot import (
+    GENERATION_SETTINGS,
+    ChatbotService,
+    ChatbotTimeout,
+    StubGeminiModel,
+)
+
+
+class StallingModel(StubGeminiModel):
+    # Streams one chunk, then stalls for `stall` seconds before the rest
+    def __init__(self, stall):
+        super().__init__(latency=0.0)
+        self.stall = stall
+
+    def _stream(self, prompt):
+        yield self._response("First")
+        time.sleep(self.stall)
+        yield self._response(" second.")
+
+
+def service(model, max_concurrency=1, timeout=2.0):
+    return ChatbotService(
+        model_factory=lambda: (model, GENERATION_SETTINGS),
+        max_concurrency=max_concurrency,
+        max_queue=0,
+        timeout=timeout,
+        cache_ttl=0,
+    )
+
+
+def wait_until_idle(chatbot, timeout=2.0):
+    # An abandoned Gemini call finishes on its reader thread before its
+    # slot comes back
+    deadline = time.monotonic() + timeout
+    while chatbot.stats()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return chatbot.stats()["pending"]
+
+
+def test_stream_closed_before_first_chunk_frees_its_place():
+    chatbot = service(StubGeminiModel(latency=0.01))
+    chatbot.stream("What is a hurricane?").close()
+
+    assert chatbot.stats()["pending"] == 0
+    # With max_concurrency=1 and no queue, a leaked place would make this busy
+    assert "".join(chatbot.stream("What is a typhoon?")).startswith("Stub answer")
+
+
+def test_stream_closed_mid_answer_frees_its_slot():
+    chatbot = service(StubGeminiModel(latency=0.05))
+    chunks = chatbot.stream("What is a hurricane?")
+    next(chunks)
+    chunks.close()
+
+    assert wait_until_idle(chatbot) == 0
+    assert "".join(chatbot.stream("What is a typhoon?")).startswith("Stub answer")
+
+
+def test_stalled_chunk_times_out():
+    chatbot = service(StallingModel(stall=5.0), max_concurrency=2, timeout=0.3)
+    chunks = chatbot.stream("What is a hurricane?")
+
+    started = time.monotonic()
+    assert next(chunks) == "First"
+    with pytest.raises(ChatbotTimeout):
+        next(chunks)
+    assert time.monotonic() - started < 1.5
+    assert chatbot.stats()["timeouts"] == 1
+
+
+def test_client_disconnect_before_first_chunk_releases_slot(app_module):
+    chatbot = app_module.chatbot
+    client = app_module.app.test_client()
+    for _ in range(chatbot.max_concurrency + chatbot.max_queue + 1):
+        response = client.post(
+            "/gemini_chatbot?stream=ndjson",
+            json={"question": f"Disconnect test {time.monotonic()}"},
+            buffered=False,
+        )
+        assert response.status_code == 200
+        # Closing without reading the body is what the server does when
+        # the client goes away before the first chunk
+        response.close()
+
+    assert wait_until_idle(chatbot) == 0
+    response = client.post("/gemini_chatbot?stream=ndjson", json={"question": "Still answering?"})
+    assert response.status_code == 200
+    assert b'"event": "done"' in response.data
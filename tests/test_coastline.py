@@ -0,0 +1,73 @@
+# test_coastline.py
+#
+# Distance to land from the coastline index against direct haversine
+# distances, and the refusal to use the bundled seed CSV unless it is
+# explicitly allowed.
+
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from utils.coastline import DEFAULT_COASTLINE_PATH, CoastlineIndex, load_coastline_points
+from utils.subscribers import haversine_km
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from build_coastline import build  # noqa: E402
+
+SEED_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "coastline_points.csv"
+)
+
+
+def test_seed_coastline_is_refused_unless_allowed(monkeypatch):
+    monkeypatch.delenv("COASTLINE_ALLOW_SEED", raising=False)
+    with pytest.raises(ValueError, match="build_coastline.py --download"):
+        CoastlineIndex.from_file(SEED_PATH)
+
+    assert len(load_coastline_points(SEED_PATH, allow_seed=True)) > 100
+    monkeypatch.setenv("COASTLINE_ALLOW_SEED", "1")
+    assert len(CoastlineIndex.from_file(SEED_PATH)) > 100
+
+
+def test_built_coastline_loads_without_opt_in(tmp_path, monkeypatch):
+    monkeypatch.delenv("COASTLINE_ALLOW_SEED", raising=False)
+    geojson = tmp_path / "coast.geojson"
+    geojson.write_text(json.dumps({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "geometry": {
+            "type": "LineString", "coordinates": [[-81.0, 25.0], [-80.0, 26.0]],
+        }},
+    ]}))
+    points = build(str(geojson), spacing_km=5.0)
+    np.save(tmp_path / "coast.npy", points)
+
+    index = CoastlineIndex.from_file(str(tmp_path / "coast.npy"))
+    # ~150 km line sampled every 5 km or less
+    assert len(index) >= 30
+    # Unique points come back sorted by latitude, i.e. along this line
+    steps = [
+        haversine_km(a[0], a[1], np.array([b[0]]), np.array([b[1]]))[0]
+        for a, b in zip(points[:-1], points[1:])
+    ]
+    # (step counts come from an equirectangular length)
+    assert max(steps) <= 5.0 * 1.01
+
+
+def test_index_matches_brute_force_haversine():
+    rng = np.random.default_rng(0)
+    coast = np.column_stack([rng.uniform(10, 50, 2000), rng.uniform(-100, -60, 2000)])
+    index = CoastlineIndex(coast)
+    lats, lons = rng.uniform(5, 55, 200), rng.uniform(-110, -50, 200)
+
+    expected = np.array([
+        haversine_km(lat, lon, coast[:, 0], coast[:, 1]).min() for lat, lon in zip(lats, lons)
+    ])
+    np.testing.assert_allclose(index.query(lats, lons), expected, rtol=1e-9, atol=1e-6)
+    assert isinstance(index.query(25.0, -80.0), float)
+
+
+def test_default_path_is_the_built_coastline_when_present():
+    built = os.path.join(os.path.dirname(SEED_PATH), "coastline_points.npy")
+    assert DEFAULT_COASTLINE_PATH == (built if os.path.exists(built) else SEED_PATH)
@@ -0,0 +1,64 @@
+# test_distance_raster.py
+#
+# The precomputed distance raster against the coastline index it is built
+# from, and the app's raster-first lookup falling back to the index
+# outside the grid.
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from utils.coastline import CoastlineIndex
+from utils.distance_raster import DistanceRaster, save_raster
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from build_distance_raster import build  # noqa: E402
+
+SEED_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "coastline_points.csv"
+)
+
+
+@pytest.fixture(scope="module")
+def index():
+    return CoastlineIndex.from_file(SEED_PATH, allow_seed=True)
+
+
+@pytest.fixture
+def raster(tmp_path, index):
+    # Florida and the Bahamas at 0.1 degrees
+    path = str(tmp_path / "distance.npy")
+    save_raster(path, build(index, 22.0, 28.0, -84.0, -76.0, 0.1), 22.0, -84.0, 0.1)
+    return DistanceRaster.load(path)
+
+
+def test_grid_nodes_match_the_index(raster, index):
+    lats = np.array([22.0, 25.3, 27.9, 28.0])
+    lons = np.array([-84.0, -80.2, -76.1, -76.0])
+    assert raster.lookup(lats, lons) == pytest.approx(index.query(lats, lons), rel=1e-5)
+
+
+def test_lookup_between_nodes_is_close_to_the_index(raster, index):
+    rng = np.random.default_rng(3)
+    lats = rng.uniform(22.0, 28.0, 500)
+    lons = rng.uniform(-84.0, -76.0, 500)
+    # Within a cell's diagonal (~15 km at 0.1 degrees)
+    assert np.abs(raster.lookup(lats, lons) - index.query(lats, lons)).max() < 15.0
+
+
+def test_points_outside_the_grid_are_nan(raster):
+    result = raster.lookup([21.9, 25.0, 25.0], [-80.0, -84.5, -80.0])
+    assert np.isnan(result[:2]).all()
+    assert not np.isnan(result[2])
+    assert np.isnan(raster.lookup(40.0, -70.0))
+
+
+def test_app_falls_back_to_the_index_outside_the_raster(app_module, raster, monkeypatch):
+    monkeypatch.setattr(app_module, "distance_raster", raster)
+    inside, outside = app_module.lookup_distance_to_land([25.0, 40.0], [-80.0, -70.0])
+
+    assert inside == pytest.approx(float(raster.lookup(25.0, -80.0)))
+    assert outside == pytest.approx(app_module.calculate_distance_to_land(40.0, -70.0))
+    assert isinstance(app_module.lookup_distance_to_land(25.0, -80.0), float)
@@ -0,0 +1,63 @@
+# test_feature_pipeline.py
+#
+# CompiledPreprocessor against the committed ColumnTransformer: the same
+# output for batches and single rows, fresh arrays on every call, and the
+# sklearn fallback for transformers it can't compile.
+
+import numpy as np
+
+from utils.feature_pipeline import (
+    TOLERANCE,
+    CompiledPreprocessor,
+    compile_preprocessor,
+    verification_sample,
+)
+from utils.prediction import build_feature_frame, predict_features
+
+
+def test_batch_and_single_row_match_sklearn(preprocessor):
+    compiled = CompiledPreprocessor.from_column_transformer(preprocessor)
+    features = verification_sample()
+    expected = preprocessor.transform(build_feature_frame(features))
+
+    np.testing.assert_allclose(compiled.transform(features), expected, rtol=0, atol=TOLERANCE)
+    for row in features[::97]:
+        np.testing.assert_allclose(
+            compiled.transform(row[np.newaxis]),
+            preprocessor.transform(build_feature_frame(row)),
+            rtol=0, atol=TOLERANCE,
+        )
+    assert compiled.verify(features) <= TOLERANCE
+
+
+def test_every_call_returns_a_new_array(preprocessor):
+    compiled = CompiledPreprocessor.from_column_transformer(preprocessor)
+    rows = verification_sample(n=2)
+
+    first = compiled.transform_row(rows[0])
+    second = compiled.transform_row(rows[1])
+    assert first is not second
+    np.testing.assert_allclose(
+        first, preprocessor.transform(build_feature_frame(rows[0])), rtol=0, atol=TOLERANCE
+    )
+
+
+def test_predictions_are_unchanged(preprocessor, forest_model):
+    compiled = compile_preprocessor(preprocessor)
+    features = verification_sample(seed=2)
+
+    assert isinstance(compiled, CompiledPreprocessor)
+    expected = predict_features(forest_model, preprocessor, features)
+    actual = predict_features(forest_model, compiled, features)
+    assert np.array_equal(actual[0], expected[0])
+    assert np.array_equal(actual[1], expected[1])
+
+
+def test_uncompilable_transformer_falls_back_to_sklearn():
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import PolynomialFeatures
+
+    transformer = ColumnTransformer([("poly", PolynomialFeatures(), ["USA_WIND", "USA_PRES"])])
+    transformer.fit(build_feature_frame(verification_sample(n=50)))
+
+    assert compile_preprocessor(transformer) is transformer
@@ -0,0 +1,48 @@
+# test_forest.py
+#
+# CompactForest against the sklearn forest it was compiled from: identical
+# probabilities and predictions, including inputs exactly on split
+# thresholds, in memory and memory-mapped from disk.
+
+import numpy as np
+import pytest
+
+from utils.forest import CHUNK_ROWS, CompactForest, compile_forest, save_forest
+
+
+def inputs(model, forest, n=CHUNK_ROWS + 500, seed=0):
+    # Standardized rows (the preprocessor outputs z-scores), spanning more
+    # than one chunk, plus one row on every split threshold
+    rng = np.random.default_rng(seed)
+    X = rng.normal(scale=2.0, size=(n, model.n_features_in_))
+    internal = np.asarray(forest.left) != np.arange(len(forest.left))
+    thresholds = np.asarray(forest.threshold)[internal]
+    boundary = rng.normal(scale=2.0, size=(len(thresholds), model.n_features_in_))
+    boundary[np.arange(len(thresholds)), np.asarray(forest.feature)[internal]] = thresholds
+    return np.vstack([X, boundary])
+
+
+def test_compiled_forest_matches_sklearn(forest_model):
+    forest = CompactForest.from_model(forest_model)
+    X = inputs(forest_model, forest)
+
+    assert np.array_equal(forest.classes_, forest_model.classes_)
+    assert np.array_equal(forest.predict_proba(X), forest_model.predict_proba(X))
+    assert np.array_equal(forest.predict(X), forest_model.predict(X))
+    assert np.array_equal(forest.predict_proba(X[:1]), forest_model.predict_proba(X[:1]))
+
+
+def test_saved_forest_loads_memory_mapped(forest_model, tmp_path):
+    save_forest(compile_forest(forest_model), str(tmp_path / "forest"))
+    forest = CompactForest.load(str(tmp_path / "forest"))
+    X = inputs(forest_model, forest, seed=1)
+
+    assert isinstance(forest.threshold, np.memmap)
+    assert forest.n_estimators == len(forest_model.estimators_)
+    assert np.array_equal(forest.predict_proba(X), forest_model.predict_proba(X))
+
+
+def test_wrong_feature_count_is_rejected(forest_model):
+    forest = CompactForest.from_model(forest_model)
+    with pytest.raises(ValueError):
+        forest.predict_proba(np.zeros((2, forest_model.n_features_in_ + 1)))
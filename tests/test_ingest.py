@@ -0,0 +1,93 @@
+# test_ingest.py
+#
+# One ingest cycle against the local OpenWeather stub with a per-second
+# quota: throttled requests are retried after Retry-After, every region
+# ends up stored, and MonitoredRegions serves the snapshots back.
+
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from benchmarks.stubs import OpenWeatherStub
+from utils.ingest import MonitoredRegions, WeatherIngestor, snapshot_columns
+from utils.prediction import KMH_PER_KNOT, build_feature_frame
+from utils.timeseries import ColumnStore
+
+REGIONS = [
+    {"name": "Miami", "lat": 25.76, "lon": -80.19},
+    {"name": "Key West", "lat": 24.56, "lon": -81.78},
+    {"name": "Tampa", "lat": 27.95, "lon": -82.46},
+    {"name": "New Orleans", "lat": 29.95, "lon": -90.07},
+    {"name": "Houston", "lat": 29.76, "lon": -95.37},
+    {"name": "Charleston", "lat": 32.78, "lon": -79.93},
+]
+
+
+@pytest.fixture
+def weather():
+    stub = OpenWeatherStub(latency=0.0, rate_limit=3).start()
+    yield stub
+    stub.stop()
+
+
+def ingestor(store_path, weather, bundle, **kwargs):
+    store = ColumnStore.create(
+        str(store_path), snapshot_columns(len(bundle.model.classes_)),
+        attrs={"classes": [int(c) for c in bundle.model.classes_]},
+    )
+    kwargs.setdefault("rate", 100.0)
+    kwargs.setdefault("burst", len(REGIONS))
+    kwargs.setdefault("backoff", 0.05)
+    kwargs.setdefault("max_retries", 5)
+    return WeatherIngestor(
+        REGIONS, store, lambda: bundle, np.linspace(5.0, 30.0, len(REGIONS)),
+        api_key="test", base_url=weather.url, timeout=5.0, **kwargs,
+    )
+
+
+def test_cycle_retries_throttled_requests_and_stores_every_region(tmp_path, weather, model_bundle):
+    ingest = ingestor(tmp_path / "monitored", weather, model_bundle)
+
+    cycle = asyncio.run(ingest.run_cycle())
+
+    # The whole burst goes out at once; the stub admits three a second
+    assert weather.throttled > 0
+    assert ingest.throttled == weather.throttled
+    assert ingest.retries >= ingest.throttled
+    assert cycle["fetched"] == cycle["stored"] == len(REGIONS)
+    assert ingest.failed == 0
+    assert ingest.store.rows == len(REGIONS)
+    assert ingest.store.attrs["ingest"]["throttled"] == ingest.throttled
+
+
+def test_monitored_regions_serve_the_stored_snapshots(tmp_path, weather, model_bundle):
+    ingest = ingestor(tmp_path / "monitored", weather, model_bundle, rate=2.0, burst=2)
+    started = time.time()
+    asyncio.run(ingest.run(interval=0.0, cycles=2))
+
+    monitored = MonitoredRegions(str(tmp_path / "monitored"), max_age=60.0)
+    snapshot = monitored.lookup(25.77, -80.19)
+    assert snapshot["region"] == "Miami"
+    assert snapshot["model_version"] == "test"
+    assert snapshot["region_distance_to_land"] == 5.0
+    assert monitored.lookup(40.7, -74.0) is None
+
+    # Stored in km/h; the model was fed the same reading in knots
+    fetched_at = np.asarray(ingest.store.read("fetched_at"))
+    miami = np.flatnonzero(np.asarray(ingest.store.read("region")) == 0)[-1]
+    knots = snapshot["wind_speed"] / KMH_PER_KNOT
+    features = build_feature_frame([[
+        knots, snapshot["sea_level_pressure"], 5.0, 25.76, -80.19,
+        knots / snapshot["sea_level_pressure"], 1.0 if snapshot["is_day"] else 0.0,
+    ]])
+    expected = model_bundle.model.predict(model_bundle.preprocessor.transform(features))
+    assert snapshot["prediction"] == int(expected[0])
+    assert snapshot["fetched_at"] == fetched_at[miami]
+
+    history = monitored.history("Miami", started)
+    assert len(history["fetched_at"]) == 2
+    assert history["fetched_at"] == sorted(history["fetched_at"])
+    assert monitored.history("Miami", fetched_at[-1] + 1)["fetched_at"] == []
+    assert monitored.history("Atlantis", started) is None
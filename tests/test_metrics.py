@@ -0,0 +1,79 @@
+# test_metrics.py
+#
+# Latency histograms (bucket accuracy, quantiles, cumulative export
+# buckets), stage sampling, and the per-route series served at /metrics.
+
+import numpy as np
+import pytest
+
+from utils.metrics import (
+    EXPORT_BUCKETS,
+    LatencyHistogram,
+    MetricsRegistry,
+    bucket_index,
+    bucket_upper,
+)
+
+
+def test_buckets_bound_their_values_within_three_percent():
+    values = np.unique(np.geomspace(1, 3.6e9, 5000).astype(np.int64))
+    for value in values.tolist():
+        upper = bucket_upper(bucket_index(value))
+        assert value <= upper <= max(value * 1.032, value + 1)
+    assert [bucket_index(v) for v in range(100)] == sorted(bucket_index(v) for v in range(100))
+
+
+def test_quantiles_track_numpy_percentiles():
+    rng = np.random.default_rng(7)
+    seconds = rng.lognormal(mean=np.log(0.02), sigma=1.0, size=20000)
+    histogram = LatencyHistogram()
+    for value in seconds:
+        histogram.record(float(value))
+
+    counts, count, total, max_seconds = histogram.snapshot()
+    assert count == len(seconds)
+    assert total == pytest.approx(seconds.sum())
+    assert max_seconds == seconds.max()
+    for q, value in LatencyHistogram.quantiles(counts, count).items():
+        assert value == pytest.approx(np.quantile(seconds, q), rel=0.04)
+
+    # Each export bound counts the whole bucket it falls in
+    cumulative = LatencyHistogram.cumulative(counts)
+    for bound, seen in zip(EXPORT_BUCKETS, cumulative):
+        assert (seconds <= bound).sum() <= seen <= (seconds <= bound * 1.032 + 1e-6).sum()
+
+
+def test_stages_are_only_timed_for_sampled_requests():
+    registry = MetricsRegistry(sample_rate=0.0)
+    registry.begin_request("/predict_status")
+    with registry.stage("predict"):
+        pass
+    registry.end_request("/predict_status", "POST", 200, 0.01)
+    assert ("/predict_status", "predict") not in registry.histograms
+    assert registry.histograms[("/predict_status", "request")].count == 1
+
+    registry.sample_rate = 1.0
+    registry.begin_request("/predict_status")
+    with registry.stage("predict"):
+        pass
+    assert registry.histograms[("/predict_status", "predict")].count == 1
+    # Outside a request, a stage needs an explicit route
+    with registry.stage("db_claim", route="outbox"):
+        pass
+    assert registry.histograms[("outbox", "db_claim")].count == 1
+
+
+def test_metrics_endpoint_reports_routes_and_stages(app_module):
+    client = app_module.app.test_client()
+    client.post("/predict_status", json={
+        "windSpeed": 100, "pressure": 950, "distanceToLand": 10,
+        "latitude": 25, "longitude": -80, "day_night": 1,
+    })
+    client.get("/no-such-page")
+    body = client.get("/metrics").get_data(as_text=True)
+
+    assert 'prehurricane_requests_total{route="/predict_status",method="POST",status="200"}' in body
+    assert 'route="unmatched",method="GET",status="404"' in body
+    assert 'prehurricane_stage_duration_seconds_count{route="/predict_status",stage="request"}' in body
+    assert 'stage="parse"' in body
+    assert 'le="+Inf"' in body
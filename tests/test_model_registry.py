@@ -0,0 +1,135 @@
+# test_model_registry.py
+#
+# Versioned model artifacts: publishing and verified loading, the reloader
+# picking up a registry created after startup, broken versions not being
+# reloaded every poll, legacy artifacts versioned by their fingerprint,
+# and a hot swap through the running app.
+
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pytest
+
+from tests.conftest import PREPROCESSOR_PATH
+from utils.model_registry import ModelRegistry, ModelReloader, file_sha256, load_active_bundle
+
+
+@pytest.fixture
+def model_path(tmp_path, forest_model):
+    path = str(tmp_path / "model.pkl")
+    joblib.dump(forest_model, path)
+    return path
+
+
+def reloader(registry):
+    swaps = {"current": [], "shadow": []}
+    return swaps, ModelReloader(
+        registry,
+        on_activate=swaps["current"].append,
+        on_shadow=swaps["shadow"].append,
+        active_version="legacy-0",
+    )
+
+
+def test_load_verifies_the_manifest(tmp_path, model_path, forest_model):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    registry.publish("v1", PREPROCESSOR_PATH, model_path=model_path)
+
+    bundle = registry.load("v1")
+    features = np.array([[80.0, 960.0, 20.0, 25.0, -80.0, 80.0 / 960.0, 1.0]])
+    assert bundle.model.predict(bundle.preprocessor.transform(features)) == \
+        forest_model.predict(bundle.preprocessor.transform(features))
+    with pytest.raises(ValueError):
+        registry.publish("v1", PREPROCESSOR_PATH, model_path=model_path)
+
+    with open(os.path.join(registry.root, "v1", "model.pkl"), "ab") as f:
+        f.write(b"tampered")
+    with pytest.raises(ValueError, match="does not match manifest"):
+        registry.load("v1")
+
+
+def test_reloader_picks_up_a_registry_created_after_startup(tmp_path, model_path):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    swaps, watcher = reloader(registry)
+
+    watcher.check_once()
+    assert swaps == {"current": [], "shadow": []}
+
+    registry.publish("v1", PREPROCESSOR_PATH, model_path=model_path)
+    registry.publish("v2", PREPROCESSOR_PATH, model_path=model_path)
+    registry.promote("v1")
+    registry.set_shadow("v2")
+    watcher.check_once()
+
+    assert [bundle.version for bundle in swaps["current"]] == ["v1"]
+    assert [bundle.version for bundle in swaps["shadow"]] == ["v2"]
+    assert watcher.stats()["active_version"] == "v1"
+
+
+def test_broken_version_is_not_reloaded_until_it_changes(tmp_path, model_path):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    registry.publish("v1", PREPROCESSOR_PATH, model_path=model_path)
+    broken = os.path.join(registry.root, "v1", "model.pkl")
+    with open(broken, "ab") as f:
+        f.write(b"tampered")
+    registry.promote("v1")
+    swaps, watcher = reloader(registry)
+
+    watcher.check_once()
+    watcher.check_once()
+    assert watcher.stats()["failures"] == 1
+    assert swaps["current"] == []
+
+    # Republishing the artifact makes it worth another try
+    os.remove(broken)
+    joblib.dump(joblib.load(model_path), broken)
+    os.utime(broken, ns=(time.time_ns(), time.time_ns()))
+    manifest = registry.manifest("v1")
+    manifest["sha256"]["model.pkl"] = file_sha256(broken)
+    with open(os.path.join(registry.root, "v1", "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    watcher.check_once()
+    assert [bundle.version for bundle in swaps["current"]] == ["v1"]
+
+
+def test_legacy_artifacts_are_versioned_by_fingerprint(tmp_path, model_path):
+    def load():
+        return load_active_bundle(
+            str(tmp_path / "no-registry"), compact_forest_path=str(tmp_path / "no-forest"),
+            model_path=model_path, preprocessor_path=PREPROCESSOR_PATH,
+        )
+
+    first = load()
+    assert first.version == f"legacy-{first.fingerprint}"
+    assert load().version == first.version
+
+    # A replaced model file is a different version
+    stat = os.stat(model_path)
+    os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert load().version != first.version
+
+
+def test_app_hot_swaps_a_promoted_version(app_module, model_path):
+    registry = app_module.model_reloader.registry
+    client = app_module.app.test_client()
+    assert client.get("/models").get_json()["active"]["version"] == "v1"
+
+    registry.publish("v2", PREPROCESSOR_PATH, model_path=model_path)
+    registry.promote("v2")
+    try:
+        app_module.model_reloader.check_once()
+        body = client.get("/models").get_json()
+        assert body["active"]["version"] == "v2"
+        assert body["reloader"]["swaps"] >= 1
+        response = client.post("/predict_status", json={
+            "windSpeed": 100, "pressure": 950, "distanceToLand": 10,
+            "latitude": 25, "longitude": -80, "day_night": 1,
+        })
+        assert response.status_code == 200
+    finally:
+        registry.promote("v1")
+        app_module.model_reloader.check_once()
+    assert app_module.model_bundle.version == "v1"
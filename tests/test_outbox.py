@@ -0,0 +1,135 @@
+# test_outbox.py
+#
+# The email outbox sends queued rows, retries failed sends with backoff
+# and moves rows that keep failing to the dead-letter table. Without a
+# reachable database it backs off instead of logging every poll, and the
+# app doesn't start it at all when no database is configured.
+
+import logging
+import socket
+import time
+
+import pytest
+from flask import Flask
+
+from utils.outbox import OutboxWorker, enqueue_email
+
+
+def closed_port():
+    # A local port nothing listens on, so connecting fails straight away
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def mail_app(port):
+    app = Flask(__name__)
+    app.config.update(MAIL_SERVER="127.0.0.1", MAIL_PORT=port, MAIL_USE_TLS=False)
+    return app
+
+
+def worker(pool, port, **kwargs):
+    kwargs.setdefault("backoff", 0.0)
+    return OutboxWorker(lambda: pool, mail_app(port), sender="alerts@example.com", **kwargs)
+
+
+def queue_emails(pool, count):
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        for i in range(count):
+            enqueue_email(cursor, pool, f"user{i}@example.com", "Subject", f"Body {i}")
+        connection.commit()
+        cursor.close()
+
+
+def query(pool, sql):
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(sql)
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+@pytest.fixture
+def pool(sqlite_pool):
+    return sqlite_pool
+
+
+def test_drain_sends_and_deletes_queued_emails(pool, smtp_sink):
+    queue_emails(pool, 3)
+    outbox = worker(pool, smtp_sink.address[1])
+
+    assert outbox.drain_once() == 3
+    assert smtp_sink.messages == 3
+    assert outbox.stats()["sent"] == 3
+    assert query(pool, "SELECT COUNT(*) FROM email_outbox") == [(0,)]
+
+
+def test_failed_send_is_retried(pool, smtp_sink):
+    queue_emails(pool, 1)
+
+    failing = worker(pool, closed_port(), max_attempts=3)
+    assert failing.drain_once() == 1
+    assert failing.stats()["failed"] == 1
+    [(attempts, last_error)] = query(pool, "SELECT attempts, last_error FROM email_outbox")
+    assert attempts == 1 and last_error
+
+    # Due again at once with no backoff; the next drain delivers it
+    recovered = worker(pool, smtp_sink.address[1], max_attempts=3)
+    assert recovered.drain_once() == 1
+    assert smtp_sink.messages == 1
+    assert query(pool, "SELECT COUNT(*) FROM email_outbox") == [(0,)]
+    assert query(pool, "SELECT COUNT(*) FROM email_dead_letter") == [(0,)]
+
+
+def test_backoff_delays_the_retry(pool):
+    queue_emails(pool, 1)
+    outbox = worker(pool, closed_port(), backoff=60.0)
+
+    assert outbox.drain_once() == 1
+    # Not due again until the backoff has passed
+    assert outbox.drain_once() == 0
+
+
+def test_email_is_dead_lettered_after_max_attempts(pool):
+    queue_emails(pool, 2)
+    outbox = worker(pool, closed_port(), max_attempts=2)
+
+    assert outbox.drain_once() == 2
+    assert outbox.drain_once() == 2
+    assert outbox.drain_once() == 0
+
+    assert outbox.stats()["dead_lettered"] == 2
+    assert query(pool, "SELECT COUNT(*) FROM email_outbox") == [(0,)]
+    dead = query(pool, "SELECT recipient, attempts, last_error FROM email_dead_letter ORDER BY id")
+    assert [(recipient, attempts) for recipient, attempts, _ in dead] == [
+        ("user0@example.com", 2),
+        ("user1@example.com", 2),
+    ]
+    assert all(error for _, _, error in dead)
+
+
+def test_unreachable_database_backs_off_and_logs_one_traceback(caplog):
+    def no_database():
+        raise ConnectionRefusedError("database is down")
+
+    outbox = OutboxWorker(no_database, mail_app(closed_port()), poll_interval=0.02)
+    with caplog.at_level(logging.WARNING, logger="utils.outbox"):
+        outbox.ensure_started()
+        time.sleep(0.5)
+        outbox.stop(timeout=1.0)
+
+    # 20 ms doubling per failure: a handful of polls, not 25
+    assert 2 <= outbox.stats()["poll_errors"] <= 6
+    assert outbox.stats()["last_error"] == "database is down"
+    tracebacks = [record for record in caplog.records if record.exc_info]
+    assert len(tracebacks) == 1
+    assert len(caplog.records) == outbox.stats()["poll_errors"]
+
+
+def test_app_without_database_starts_no_outbox_worker(app_module):
+    client = app_module.app.test_client()
+    assert client.get("/metrics").status_code == 200
+    assert app_module.outbox_worker is None
+    assert client.get("/email_outbox/stats").get_json() == {"enabled": False}
@@ -0,0 +1,89 @@
+# test_predict.py
+#
+# /predict_status and /predict_status/batch against the baseline
+# single-point scoring they replaced: a DataFrame through the fitted
+# ColumnTransformer and model.predict, windSpeed used as sent.
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from utils.feature_pipeline import verification_sample
+from utils.prediction import DEFAULT_LABEL, LABEL_MAPPING
+
+
+def payloads(n=40, seed=3):
+    # Rounded to the prediction cache's precision so no two points share a key
+    features = verification_sample(n=n, seed=seed)[:n]
+    return [
+        {
+            "windSpeed": round(wind, 1),
+            "pressure": round(pressure, 1),
+            "distanceToLand": round(distance, 1),
+            "latitude": round(lat, 2),
+            "longitude": round(lon, 2),
+            "day_night": int(day),
+        }
+        for wind, pressure, distance, lat, lon, _, day in features
+    ]
+
+
+def baseline_status(bundle, data):
+    # The original /predict_status, line for line
+    wind_speed = float(data["windSpeed"])
+    pressure = float(data["pressure"])
+    frame = pd.DataFrame({
+        "USA_WIND": [wind_speed],
+        "USA_PRES": [pressure],
+        "DIST2LAND": [float(data["distanceToLand"])],
+        "USA_LAT": [float(data["latitude"])],
+        "USA_LON": [float(data["longitude"])],
+        "wind_pressure_ratio": [float(wind_speed / pressure)],
+        "Day_Night_encoded": [float(data["day_night"])],
+    })
+    preprocessor = getattr(bundle.preprocessor, "source", None) or bundle.preprocessor
+    prediction = bundle.model.predict(preprocessor.transform(frame))
+    return LABEL_MAPPING.get(prediction[0], DEFAULT_LABEL), int(prediction[0])
+
+
+def test_predict_status_matches_baseline(app_module):
+    client = app_module.app.test_client()
+    bundle = app_module.model_bundle
+    for data in payloads():
+        response = client.post("/predict_status", json=data)
+        assert response.status_code == 200
+        assert response.get_json() == {"status": baseline_status(bundle, data)[0]}
+
+
+def test_batch_matches_single_points(app_module):
+    client = app_module.app.test_client()
+    bundle = app_module.model_bundle
+    points = payloads(seed=4)
+
+    response = client.post("/predict_status/batch", json=points)
+    ndjson = client.post(
+        "/predict_status/batch",
+        data="\n".join(json.dumps(point) for point in points) + "\n",
+        content_type="application/x-ndjson",
+    )
+
+    body = response.get_json()
+    assert body["count"] == len(points)
+    assert ndjson.get_json() == body
+    for data, result in zip(points, body["results"]):
+        status, prediction = baseline_status(bundle, data)
+        assert (result["status"], result["prediction"]) == (status, prediction)
+        assert abs(sum(result["probabilities"].values()) - 1.0) < 1e-5
+        assert result["prediction"] == int(
+            max(result["probabilities"], key=result["probabilities"].get)
+        )
+
+
+def test_batch_rejects_bad_points(app_module):
+    client = app_module.app.test_client()
+    assert client.post("/predict_status/batch", json=[]).status_code == 400
+    assert client.post("/predict_status/batch", json=[{"windSpeed": 10}]).status_code == 400
+    assert client.post(
+        "/predict_status/batch", data="{not json", content_type="application/x-ndjson"
+    ).status_code == 400
@@ -0,0 +1,115 @@
+# test_prediction_cache.py
+#
+# Quantized prediction caching: nearby feature vectors share a result,
+# only misses reach the model, entries are namespaced per model bundle,
+# and a shared backend serves results computed by another worker.
+
+import numpy as np
+import pytest
+
+from utils.prediction import predict_features
+from utils.prediction_cache import DEFAULT_PRECISION, PredictionCache, parse_precision
+
+ROW = [100.0, 950.0, 10.0, 25.0, -80.0, 100.0 / 950.0, 1.0]
+
+
+class DictBackend:
+    # In-memory stand-in for the shared tier (same interface as RedisBackend)
+    def __init__(self):
+        self.data = {}
+
+    def get_many(self, namespace, keys):
+        return [self.data.get((namespace, key)) for key in keys]
+
+    def put_many(self, namespace, items):
+        for key, value in items:
+            self.data[(namespace, key)] = value
+
+
+def features(*rows):
+    return np.array(rows, dtype=np.float64)
+
+
+def test_results_match_the_model_and_only_misses_are_scored(model_bundle):
+    cache = PredictionCache()
+    rng = np.random.default_rng(0)
+    batch = features(*[ROW] * 4)
+    batch[:, 0] = rng.uniform(40, 150, 4).round(1)
+
+    predictions, probabilities = cache.predict(
+        model_bundle.model, model_bundle.preprocessor, batch, namespace="v1"
+    )
+    expected = predict_features(model_bundle.model, model_bundle.preprocessor, batch)
+    assert (predictions == expected[0]).all()
+    assert probabilities == pytest.approx(expected[1])
+
+    again, _ = cache.predict(model_bundle.model, model_bundle.preprocessor, batch, namespace="v1")
+    assert (again == predictions).all()
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits"]) == (4, 4)
+
+
+def test_rows_within_the_rounding_step_share_an_entry(model_bundle):
+    cache = PredictionCache()
+    nearby = list(ROW)
+    nearby[3] += 0.001  # ~100 m north, same 0.01 degree key
+    batch = features(ROW, nearby)
+
+    first, second = cache.keys(batch)
+    assert first == second
+    cache.predict(model_bundle.model, model_bundle.preprocessor, batch, namespace="v1")
+    assert cache.stats()["entries"] == 1
+    # -0.0 and 0.0 are the same key
+    assert cache.keys(features([0.0] * 7)) == cache.keys(features([-0.0] * 7))
+
+
+def test_entries_are_namespaced_per_model_bundle(model_bundle):
+    cache = PredictionCache()
+    batch = features(ROW)
+    cache.activate("v1")
+    cache.predict(model_bundle.model, model_bundle.preprocessor, batch, namespace="v1")
+    # A request still running on another bundle doesn't reuse v1's result
+    cache.predict(model_bundle.model, model_bundle.preprocessor, batch, namespace="v2")
+    assert cache.stats()["misses"] == 2
+
+    cache.activate("v2")
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["invalidations"] == 1
+    cache.activate("v2")
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_shared_backend_serves_other_workers(model_bundle):
+    backend = DictBackend()
+    first, second = PredictionCache(backend=backend), PredictionCache(backend=backend)
+    batch = features(ROW)
+
+    expected, _ = first.predict(model_bundle.model, model_bundle.preprocessor, batch, namespace="v1")
+    predictions, probabilities = second.predict(
+        model_bundle.model, model_bundle.preprocessor, batch, namespace="v1"
+    )
+    assert (predictions == expected).all()
+    assert predictions.dtype == model_bundle.model.classes_.dtype
+    assert second.stats()["shared_hits"] == 1
+    assert second.stats()["misses"] == 0
+    assert probabilities.shape == (1, len(model_bundle.model.classes_))
+
+
+def test_parse_precision():
+    assert parse_precision("") == DEFAULT_PRECISION
+    assert parse_precision("2") == (2,) * 7
+    assert parse_precision("1,1,1,2,2,4,0") == DEFAULT_PRECISION
+    with pytest.raises(ValueError):
+        parse_precision("1,2")
+
+
+def test_app_cache_is_namespaced_by_the_active_bundle(app_module):
+    client = app_module.app.test_client()
+    body = {"windSpeed": 101.3, "pressure": 951, "distanceToLand": 12,
+            "latitude": 24.5, "longitude": -79.5, "day_night": 1}
+    first = client.post("/predict_status", json=body).get_json()
+    assert client.post("/predict_status", json=body).get_json() == first
+
+    stats = app_module.prediction_cache.stats()
+    assert stats["namespace"] == app_module.cache_namespace(app_module.model_bundle)
+    assert stats["hits"] >= 1
@@ -0,0 +1,101 @@
+# test_risk_grid.py
+#
+# Precomputed risk grid: slicing, a version that follows the grid's
+# content and model rather than its mtime, and the cached /risk_grid
+# endpoints revalidating against it.
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from utils.risk_grid import RiskGrid, save_risk_grid
+
+SCENARIOS = [(65.0, 987.0, 1), (115.0, 950.0, 1)]
+
+
+def build(directory, model_version="v1", fill=0):
+    # 2 scenarios over 20-22N, 80-77W at 1 degree
+    classes = np.full((2, 3, 4), fill, dtype=np.uint8)
+    classes[1] = 1
+    confidence = np.full((2, 3, 4), 200, dtype=np.uint8)
+    save_risk_grid(str(directory), classes, confidence, [2, 7], SCENARIOS,
+                   lat_min=20.0, lon_min=-80.0, step=1.0, model_version=model_version)
+
+
+def same_mtime(directory, mtime=1_700_000_000):
+    for name in os.listdir(directory):
+        os.utime(os.path.join(directory, name), (mtime, mtime))
+
+
+def test_slice_returns_the_cells_inside_the_box(tmp_path):
+    build(tmp_path)
+    grid = RiskGrid.load(str(tmp_path))
+
+    cells = grid.slice(1, 20.5, 22.0, -79.0, -77.0)
+    assert cells["lat_min"] == 21.0 and cells["lon_min"] == -79.0
+    assert cells["shape"] == [2, 3]
+    assert cells["classes"] == [[1, 1, 1], [1, 1, 1]]
+    assert cells["confidence"][0][0] == pytest.approx(200 / 255, abs=1e-3)
+    assert grid.slice(0, 20.0, 22.0, -80.0, -77.0, stride=2)["shape"] == [2, 2]
+    with pytest.raises(ValueError):
+        grid.slice(0, 40.0, 41.0, -80.0, -77.0)
+
+
+def test_version_follows_content_and_model_not_mtime(tmp_path):
+    build(tmp_path)
+    same_mtime(tmp_path)
+    first = RiskGrid.load(str(tmp_path))
+    assert first.version.startswith("v1-")
+
+    # Rebuilt within the same second with different predictions
+    build(tmp_path, fill=1)
+    same_mtime(tmp_path)
+    assert RiskGrid.load(str(tmp_path)).version != first.version
+
+    build(tmp_path, model_version="v2")
+    assert RiskGrid.load(str(tmp_path)).version.startswith("v2-")
+    build(tmp_path)
+    assert RiskGrid.load(str(tmp_path)).version == first.version
+
+
+@pytest.fixture
+def grid_dir(app_module):
+    directory = os.environ["RISK_GRID_PATH"]
+    yield directory
+    shutil.rmtree(directory, ignore_errors=True)
+    app_module.load_risk_grid()
+
+
+def test_endpoints_revalidate_against_the_grid_version(app_module, grid_dir):
+    client = app_module.app.test_client()
+    assert client.get("/risk_grid/meta").status_code == 404
+
+    build(grid_dir)
+    same_mtime(grid_dir)
+    meta = client.get("/risk_grid/meta")
+    assert meta.status_code == 200
+    assert meta.get_json()["model_current"] is True
+    etag = meta.headers["ETag"]
+    assert client.get("/risk_grid/meta", headers={"If-None-Match": etag}).status_code == 304
+
+    response = client.get("/risk_grid?scenario=1&lat_min=21&lat_max=22&lon_min=-80&lon_max=-79")
+    assert response.get_json()["classes"] == [[1, 1], [1, 1]]
+    assert response.get_json()["labels"] == [2, 7]
+
+    # A rebuild in the same second is picked up and invalidates the ETag
+    build(grid_dir, fill=1)
+    same_mtime(grid_dir)
+    again = client.get("/risk_grid/meta", headers={"If-None-Match": etag})
+    assert again.status_code == 200
+    assert again.headers["ETag"] != etag
+    assert client.get("/risk_grid?scenario=0").get_json()["classes"][0] == [1, 1, 1, 1]
+
+
+def test_grid_from_another_model_is_flagged(app_module, grid_dir):
+    build(grid_dir, model_version="v0")
+    body = app_module.app.test_client().get("/risk_grid/meta").get_json()
+    assert body["model_version"] == "v0"
+    assert body["active_model_version"] == "v1"
+    assert body["model_current"] is False
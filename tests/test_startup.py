@@ -0,0 +1,48 @@
+# test_startup.py
+#
+# Importing the app loads the model artifacts but none of the heavy
+# clients that only some requests need, and the gunicorn config preloads
+# the app unless told not to.
+
+import json
+import os
+import runpy
+import subprocess
+import sys
+
+from tests.conftest import ROOT
+
+LAZY_MODULES = ("google.generativeai", "mysql.connector", "flask_mail", "geopy")
+
+
+def test_import_leaves_heavy_clients_unloaded(app_module):
+    # A fresh interpreter with the session's app environment
+    script = (
+        "import json, sys, app; "
+        f"print(json.dumps([name for name in {LAZY_MODULES!r} if name in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, env=dict(os.environ),
+        capture_output=True, text=True, check=True,
+    )
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+
+def test_create_app_registers_the_routes(app_module):
+    rules = {rule.rule for rule in app_module.app.url_map.iter_rules()}
+    assert {"/", "/predict_status", "/predict_status/batch", "/assess", "/track",
+            "/gemini_chatbot", "/metrics", "/models"} <= rules
+    assert app_module.model_bundle is not None
+    assert app_module.coastline_index is not None
+
+
+def test_gunicorn_preloads_unless_disabled(monkeypatch):
+    path = os.path.join(ROOT, "gunicorn.conf.py")
+    monkeypatch.delenv("GUNICORN_PRELOAD", raising=False)
+    config = runpy.run_path(path)
+    assert config["preload_app"] is True
+    assert config["worker_class"] == "gthread"
+    assert callable(config["pre_fork"])
+
+    monkeypatch.setenv("GUNICORN_PRELOAD", "0")
+    assert runpy.run_path(path)["preload_app"] is False
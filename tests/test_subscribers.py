@@ -0,0 +1,162 @@
+# test_subscribers.py
+#
+# Radius queries through the geohash index against a full scan, including
+# circles that cross the antimeridian or reach a pole, and the geohash
+# range bounds they are built from; and the explicit migration of tables
+# from older releases.
+
+import csv
+import io
+import sqlite3
+
+import numpy as np
+import pytest
+
+from utils import geohash
+from utils.db import DatabasePool, SchemaOutOfDate, SQLitePool, check_schema
+from utils.subscribers import (
+    haversine_km,
+    import_csv,
+    migrate_subscribers,
+    subscribers_near,
+)
+
+CENTRES = [
+    (25.76, -80.19, 150.0),     # Miami
+    (29.95, -90.07, 5.0),       # small circle, a handful of cells
+    (0.0, 0.0, 500.0),          # equator and prime meridian
+    (-17.7, 179.9, 400.0),      # Fiji, across the antimeridian
+    (52.0, -179.8, 300.0),      # Aleutians, across it the other way
+    (88.5, 45.0, 300.0),        # reaches the north pole
+    (-89.9, 0.0, 50.0),         # at the south pole
+    (40.0, -100.0, 3000.0),     # continent-sized
+]
+
+
+@pytest.fixture
+def pool(sqlite_pool):
+    rng = np.random.default_rng(0)
+    # Uniform over the sphere, plus extra points near every test centre
+    lats = list(np.degrees(np.arcsin(rng.uniform(-1, 1, 3000))))
+    lons = list(rng.uniform(-180, 180, 3000))
+    for lat, lon, radius_km in CENTRES:
+        spread = 1.5 * radius_km / 111.0
+        lats += list(np.clip(lat + rng.uniform(-spread, spread, 300), -90, 90))
+        lons += list((lon + rng.uniform(-spread, spread, 300) + 180) % 360 - 180)
+
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["name", "email", "phone", "lat", "lon"])
+    for i, (lat, lon) in enumerate(zip(lats, lons)):
+        writer.writerow([f"User {i}", f"user{i}@example.com", "", f"{lat:.6f}", f"{lon:.6f}"])
+    import_csv(sqlite_pool, io.StringIO(out.getvalue()))
+    return sqlite_pool
+
+
+def brute_force(pool, lat, lon, radius_km):
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT id, lat, lon FROM subscribers")
+        rows = np.array(cursor.fetchall())
+        cursor.close()
+    distances = haversine_km(lat, lon, rows[:, 1], rows[:, 2])
+    return set(rows[distances <= radius_km, 0].astype(int).tolist())
+
+
+@pytest.mark.parametrize("lat, lon, radius_km", CENTRES)
+def test_subscribers_near_matches_full_scan(pool, lat, lon, radius_km):
+    near = subscribers_near(pool, lat, lon, radius_km)
+    expected = brute_force(pool, lat, lon, radius_km)
+
+    assert expected
+    assert {row[0] for row in near} == expected
+    distances = [row[4] for row in near]
+    assert distances == sorted(distances)
+    assert max(distances) <= radius_km
+
+
+def test_subscribers_near_empty_area(pool):
+    assert subscribers_near(pool, 25.76, -80.19, 0.001) == []
+
+
+@pytest.mark.parametrize("prefix, expected", [
+    ("dhw", "dhx"),
+    ("dhz", "dj"),
+    ("9zz", "b"),
+    ("zz", None),
+    ("0", "1"),
+])
+def test_successor(prefix, expected):
+    assert geohash.successor(prefix) == expected
+
+
+def test_prefix_ranges_bound_every_hash_in_the_prefix():
+    hashes = [geohash.encode(lat, lon, 9) for lat, lon in [(25.76, -80.19), (-17.7, 179.9)]]
+    for value in hashes:
+        for length in range(1, 9):
+            [(low, high)] = geohash.prefix_ranges([value[:length]])
+            assert low <= value and (high is None or value < high)
+
+
+@pytest.fixture
+def old_database(tmp_path, monkeypatch):
+    # A subscribers table as releases before locations created it
+    path = str(tmp_path / "old.db")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE subscribers (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "name TEXT, email TEXT, phone TEXT)"
+    )
+    connection.executemany(
+        "INSERT INTO subscribers (name, email, phone) VALUES (?, ?, ?)",
+        [("Ann", "Ann@Example.com", "1"), ("Ann B", " ann@example.com", "2"),
+         ("Bob", "bob@example.com", "3")],
+    )
+    connection.commit()
+    connection.close()
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{path}")
+    return path
+
+
+def rows(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT id, email FROM subscribers ORDER BY id").fetchall()
+    finally:
+        connection.close()
+
+
+def test_out_of_date_table_is_refused_not_migrated(old_database):
+    with pytest.raises(SchemaOutOfDate, match="utils.subscribers migrate"):
+        check_schema()
+    pool = DatabasePool("sqlite", SQLitePool(old_database))
+    with pytest.raises(SchemaOutOfDate):
+        pool.ensure_schema()
+    assert len(rows(old_database)) == 3
+
+
+def test_migrate_reports_duplicates_without_deleting(old_database):
+    pool = DatabasePool("sqlite", SQLitePool(old_database))
+
+    report = migrate_subscribers(pool)
+
+    assert report["added_columns"] == ["lat", "lon", "geohash"]
+    assert [row["id"] for row in report["duplicates"]] == [1, 2]
+    assert report["deleted"] == 0
+    assert report["pending"]
+    assert rows(old_database) == [(1, "Ann@Example.com"), (2, " ann@example.com"),
+                                  (3, "bob@example.com")]
+    with pytest.raises(SchemaOutOfDate):
+        check_schema()
+
+
+def test_migrate_deletes_duplicates_only_when_asked(old_database):
+    pool = DatabasePool("sqlite", SQLitePool(old_database))
+
+    report = migrate_subscribers(pool, delete_duplicates=True)
+
+    assert report["deleted"] == 1
+    assert report["pending"] == []
+    assert rows(old_database) == [(1, "ann@example.com"), (3, "bob@example.com")]
+    check_schema()
+    pool.ensure_schema()
@@ -0,0 +1,81 @@
+# test_track.py
+#
+# Track resampling and extrapolation, including tracks that cross the
+# antimeridian, and the streamed /track endpoint.
+
+import json
+
+import pytest
+
+from utils.track import extrapolate, iter_track_points, resample
+
+HOUR = 3600.0
+
+
+def test_resample_interpolates_every_field():
+    points = [(0.0, 20.0, -80.0, 50.0, 1000.0), (2 * HOUR, 22.0, -82.0, 70.0, 980.0)]
+    samples = list(resample(points, HOUR))
+    assert samples == [
+        (0.0, 20.0, -80.0, 50.0, 1000.0),
+        (HOUR, 21.0, -81.0, 60.0, 990.0),
+        (2 * HOUR, 22.0, -82.0, 70.0, 980.0),
+    ]
+
+
+def test_resample_rejects_out_of_order_times():
+    points = [(HOUR, 20.0, -80.0, 50.0, 1000.0), (0.0, 21.0, -80.0, 50.0, 1000.0)]
+    with pytest.raises(ValueError):
+        list(resample(points, HOUR))
+
+
+@pytest.mark.parametrize("start, end, middle", [(179.0, -179.0, -180.0), (-179.0, 179.0, -180.0),
+                                                (178.0, -178.0, -180.0), (179.5, -178.5, -179.5)])
+def test_resample_takes_the_short_way_across_the_antimeridian(start, end, middle):
+    points = [(0.0, 15.0, start, 80.0, 970.0), (2 * HOUR, 15.0, end, 80.0, 970.0)]
+    lons = [sample[2] for sample in resample(points, HOUR)]
+    assert lons[1] == pytest.approx(middle)
+    assert all(-180.0 <= lon < 180.0 for lon in lons)
+
+
+def test_extrapolate_continues_across_the_antimeridian():
+    before = (0.0, 15.0, 178.0, 80.0, 970.0)
+    last = (HOUR, 15.0, 179.0, 80.0, 970.0)
+    lons = [sample[2] for sample in extrapolate(before, last, HOUR, 3 * HOUR)]
+    assert lons == pytest.approx([-180.0, -179.0, -178.0])
+
+    # Already past the line: the motion is still 1 degree east per hour
+    before, last = (0.0, 15.0, 179.5, 80.0, 970.0), (HOUR, 15.0, -179.5, 80.0, 970.0)
+    lons = [sample[2] for sample in extrapolate(before, last, HOUR, HOUR)]
+    assert lons == pytest.approx([-178.5])
+
+
+def test_iter_track_points_skips_fixes_without_wind_or_pressure():
+    lines = [
+        "ISO_TIME,LAT,LON,USA_WIND,USA_PRES\n",
+        " ,degrees_north,degrees_east,kts,mb\n",
+        "2024-10-09 00:00:00,25.0,-84.0,120,920\n",
+        "2024-10-09 03:00:00,25.5,-83.5,,\n",
+        "2024-10-09 06:00:00,26.0,-83.0,110,930\n",
+    ]
+    counts = {}
+    points = list(iter_track_points(lines, "csv", counts))
+    assert [point[1:] for point in points] == [(25.0, -84.0, 120.0, 920.0), (26.0, -83.0, 110.0, 930.0)]
+    assert counts == {"points": 3, "skipped": 1}
+
+
+def test_track_endpoint_streams_samples_across_the_antimeridian(app_module):
+    body = "\n".join(json.dumps(point) for point in [
+        {"time": "2024-09-01T00:00:00Z", "lat": 20.0, "lon": 179.0, "wind": 90, "pressure": 960},
+        {"time": "2024-09-01T02:00:00Z", "lat": 20.0, "lon": -179.0, "wind": 90, "pressure": 960},
+    ])
+    response = app_module.app.test_client().post(
+        "/track?interval_minutes=60&horizon_hours=1", data=body,
+        content_type="application/x-ndjson",
+    )
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    samples, summary = lines[:-1], lines[-1]["summary"]
+
+    assert [sample["lon"] for sample in samples] == [179.0, -180.0, -179.0, -178.0]
+    assert [sample["forecast"] for sample in samples] == [False, False, False, True]
+    assert summary == {"points": 2, "skipped": 0, "samples": 4}
+    assert all("status" in sample for sample in samples)
@@ -0,0 +1,107 @@
+# test_weather.py
+#
+# OpenWeather lookups through WeatherClient against the local stub: one
+# upstream request per geohash cell while fresh, concurrent lookups of a
+# cell sharing a single request, and the TTL/byte-budget cache beneath.
+
+import threading
+
+import pytest
+import requests
+
+from benchmarks.stubs import OpenWeatherStub
+from utils.cache import TTLCache
+from utils.weather import WeatherCache, WeatherClient, extract_weather_fields
+
+
+@pytest.fixture
+def slow_stub():
+    stub = OpenWeatherStub(latency=0.2).start()
+    yield stub
+    stub.stop()
+
+
+def client(stub, **cache_args):
+    return WeatherClient("test", cache=WeatherCache(**cache_args), base_url=stub.url)
+
+
+def test_points_in_one_cell_share_a_cached_response(weather_stub):
+    weather = client(weather_stub, precision=5)
+    before = weather_stub.requests
+
+    first = weather.fetch(25.7617, -80.1918)
+    # ~100 m away, same precision-5 geohash cell
+    assert weather.fetch(25.7625, -80.1910) == first
+    weather.fetch(26.5, -81.0)
+
+    assert weather_stub.requests - before == 2
+    stats = weather.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_expired_entries_are_fetched_again(weather_stub):
+    weather = client(weather_stub, ttl=0.0)
+    before = weather_stub.requests
+    weather.fetch(25.76, -80.19)
+    weather.fetch(25.76, -80.19)
+    assert weather_stub.requests - before == 2
+
+
+def test_concurrent_lookups_of_a_cell_make_one_upstream_request(slow_stub):
+    weather = client(slow_stub)
+    start = threading.Barrier(8)
+    results = []
+
+    def lookup():
+        start.wait()
+        results.append(weather.fetch(25.76, -80.19))
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert slow_stub.requests == 1
+    assert len(results) == 8 and all(result == results[0] for result in results)
+    stats = weather.stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] + stats["hits"] == 7
+
+
+def test_upstream_errors_are_counted_and_not_cached(weather_stub):
+    weather = client(weather_stub)
+    weather.fetch(25.76, -80.19)
+    # Nothing listens on the discard port
+    weather.base_url = "http://127.0.0.1:9/data/2.5/weather"
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            weather.fetch(40.0, -70.0)
+
+    assert weather.stats()["upstream_errors"] == 2
+    assert len(weather.cache) == 1
+
+
+def test_cache_evicts_least_recently_used_past_its_byte_budget():
+    cache = TTLCache(ttl=60, max_entries=10, max_bytes=100)
+    cache.put("a", 1, size=40)
+    cache.put("b", 2, size=40)
+    cache.get("a")
+    cache.put("c", 3, size=40)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.size_bytes == 80
+    assert cache.evictions == 1
+
+
+def test_extract_weather_fields_reports_wind_in_kmh():
+    fields = extract_weather_fields({
+        "dt": 1_700_000_000, "timezone": -18000,
+        "wind": {"speed": 10.0}, "main": {"pressure": 1002},
+        "sys": {"sunrise": 1_699_990_000, "sunset": 1_700_030_000},
+    })
+    assert fields["wind_speed"] == pytest.approx(36.0)
+    assert fields["sea_level_pressure"] == 1002
+    assert fields["is_day"] is True
+    assert fields["local_time"] == "2023-11-14 17:13:20"
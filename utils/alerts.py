@@ -0,0 +1,462 @@
+# alerts.py
+#
+# Bulk storm-alert fan-out to the `subscribers` table.
+#
+#   python -m utils.alerts --alert-id milton-adv-12 --storm "Milton" \
+#       --status "Hurricane (74+ mph)" --connections 4 --rate 50
+#
+# Add --lat/--lon/--radius-km to alert only subscribers near the storm.
+# Recipients that could not be sent to are kept in alert-<id>.failed.jsonl;
+# rerun with --retry-failed to send to just those.
+#
+# To try it locally, point MAIL_SERVER/MAIL_PORT at a debugging SMTP server
+# (`python -m aiosmtpd -n -l localhost:8025`) and DATABASE_URL at SQLite.
+
+import argparse
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+import numpy as np
+
+from utils.db import get_pool
+from utils.email_templates import hurricane_alert_message
+from utils.subscribers import SQLITE_MAX_VARIABLES, area_filter, haversine_km
+
+ALERT_SUBJECT = "Hurricane Prediction Alert: {storm_name}"
+
+
+def iter_subscriber_pages(pool, page_size=1000, after_id=0):
+    """
+    Yield lists of (id, name, email) rows in id order using keyset
+    pagination, so each page is an index range scan no matter how deep
+    into the table it is.
+    """
+    while True:
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                pool.sql(
+                    "SELECT id, name, email FROM subscribers "
+                    "WHERE id > %s ORDER BY id LIMIT %s"
+                ),
+                (after_id, page_size),
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+
+def iter_area_subscriber_pages(pool, area, page_size=1000, after_id=0):
+    """
+    iter_subscriber_pages restricted to subscribers within `area`, a
+    (lat, lon, radius_km) tuple. Each page is read with the same keyset
+    query narrowed by the geohash condition, then filtered by exact
+    distance, so only one page of candidates is in memory at a time. Pages
+    whose candidates are all out of range are skipped.
+    """
+    lat, lon, radius_km = area
+    condition, params = area_filter(lat, lon, radius_km)
+    while True:
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                pool.sql(
+                    "SELECT id, name, email, lat, lon FROM subscribers "
+                    f"WHERE {condition} AND id > %s ORDER BY id LIMIT %s"
+                ),
+                params + [after_id, page_size],
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+        if not rows:
+            return
+        distances = haversine_km(
+            lat, lon, np.array([row[3] for row in rows]), np.array([row[4] for row in rows])
+        )
+        nearby = [row[:3] for row, distance in zip(rows, distances) if distance <= radius_km]
+        if nearby:
+            yield nearby
+        after_id = rows[-1][0]
+
+
+def iter_subscribers_by_id(pool, ids, page_size=1000):
+    """
+    Yield lists of (id, name, email) rows for the given subscriber ids, in
+    id order. Ids no longer in the table are skipped.
+    """
+    ids = sorted(set(ids))
+    if pool.dialect == "sqlite":
+        page_size = min(page_size, SQLITE_MAX_VARIABLES)
+    for start in range(0, len(ids), page_size):
+        page = ids[start:start + page_size]
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                pool.sql(
+                    "SELECT id, name, email FROM subscribers WHERE id IN ({}) ORDER BY id".format(
+                        ", ".join(["%s"] * len(page))
+                    )
+                ),
+                page,
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+        if rows:
+            yield rows
+
+
+def failed_lines(failed):
+    # JSON lines for (subscriber_id, email, error) failures
+    return [
+        json.dumps({"id": subscriber_id, "email": email, "error": error}) + "\n"
+        for subscriber_id, email, error in failed
+    ]
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursts up to `burst`.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SMTPSettings:
+    def __init__(self, host, port, username=None, password=None, use_tls=False, sender=None):
+        self.host = host
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.sender = sender or username
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            host=os.getenv("MAIL_SERVER", "localhost"),
+            port=os.getenv("MAIL_PORT", "25"),
+            username=os.getenv("MAIL_USERNAME"),
+            password=os.getenv("MAIL_PASSWORD"),
+            use_tls=os.getenv("MAIL_USE_TLS") == "True",
+        )
+
+    def connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        return smtp
+
+
+class AlertDispatcher:
+    """
+    Sends one alert to every subscriber through a pool of persistent SMTP
+    connections.
+
+    Subscribers are read a page at a time and each sender thread keeps its
+    own SMTP connection open for the whole run (reconnecting on failure).
+    A shared token bucket caps the overall send rate. Messages go out in
+    batches of `batch_size`; once every message of a batch has been handled
+    the last subscriber id is written to the checkpoint file, so a rerun
+    with the same alert id resumes after it and a crash resends at most one
+    batch. With `area` ((lat, lon, radius_km)) only subscribers located
+    within it are sent to.
+
+    Recipients that still fail after `retries` are appended to the failed
+    file (JSON lines, before the checkpoint moves past their batch), and
+    `retry_failed` resends to just those.
+    """
+
+    def __init__(self, pool, smtp_settings, alert_id, storm_name, status, advisory="",
+                 connections=4, rate=50.0, page_size=1000, checkpoint_path=None,
+                 retries=2, area=None, failed_path=None, batch_size=100):
+        self.pool = pool
+        self.smtp_settings = smtp_settings
+        self.alert_id = alert_id
+        self.storm_name = storm_name
+        self.status = status
+        self.advisory = advisory
+        self.connections = connections
+        self.rate_limiter = TokenBucket(rate)
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path or f"alert-{alert_id}.checkpoint.json"
+        self.failed_path = failed_path or f"alert-{alert_id}.failed.jsonl"
+        self.retries = retries
+        self.area = area
+
+        self._queue = queue.Queue(maxsize=connections * 4)
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = []
+        self._failed_saved = 0
+
+    def load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("alert_id") != self.alert_id:
+            raise ValueError(
+                f"Checkpoint {self.checkpoint_path} belongs to alert {checkpoint.get('alert_id')}"
+            )
+        return checkpoint["last_id"]
+
+    def save_checkpoint(self, last_id):
+        # Write-then-rename so a crash never leaves a half-written checkpoint
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"alert_id": self.alert_id, "last_id": last_id, "sent": self.sent,
+                 "failed": len(self.failed), "failed_path": self.failed_path},
+                f,
+            )
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def save_failed(self):
+        # Append the failures since the last call, one JSON object per line
+        with self._lock:
+            failed = self.failed[self._failed_saved:]
+            self._failed_saved = len(self.failed)
+        if not failed:
+            return
+        with open(self.failed_path, "a") as f:
+            f.writelines(failed_lines(failed))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load_failed(self):
+        """
+        Subscriber ids recorded in the failed file.
+        """
+        if not os.path.exists(self.failed_path):
+            return []
+        with open(self.failed_path) as f:
+            return sorted({json.loads(line)["id"] for line in f if line.strip()})
+
+    def render(self, rows):
+        """
+        Build the messages for one page of (id, name, email) rows.
+        """
+        subject = ALERT_SUBJECT.format(storm_name=self.storm_name)
+        messages = []
+        for subscriber_id, name, email in rows:
+            message = EmailMessage()
+            message["Subject"] = subject
+            message["From"] = self.smtp_settings.sender
+            message["To"] = email
+            message.set_content(
+                hurricane_alert_message(name, self.storm_name, self.status, self.advisory)
+            )
+            messages.append((subscriber_id, message))
+        return messages
+
+    def _sender(self):
+        smtp = None
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            # task_done always runs, so an unexpected error fails one message
+            # instead of killing the thread and leaving run() stuck in join()
+            try:
+                subscriber_id, message = item
+                error = None
+                for _ in range(self.retries + 1):
+                    try:
+                        if smtp is None:
+                            smtp = self.smtp_settings.connect()
+                        self.rate_limiter.acquire()
+                        smtp.send_message(message)
+                        error = None
+                        break
+                    except Exception as e:
+                        error = e
+                        if isinstance(e, smtplib.SMTPRecipientsRefused):
+                            break
+                        # Drop the connection and reconnect on the next attempt
+                        try:
+                            if smtp is not None:
+                                smtp.close()
+                        except Exception:
+                            pass
+                        finally:
+                            smtp = None
+                with self._lock:
+                    if error is None:
+                        self.sent += 1
+                    else:
+                        self.failed.append((subscriber_id, message["To"], str(error)))
+            except Exception as e:
+                with self._lock:
+                    self.failed.append((item[0], None, str(e)))
+            finally:
+                self._queue.task_done()
+
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+    def _send_pages(self, pages, on_batch):
+        # Fan each page out to the sender threads a batch at a time;
+        # on_batch(rows) runs once every message of the batch has been handled
+        threads = [
+            threading.Thread(target=self._sender, name=f"alert-smtp-{i}", daemon=True)
+            for i in range(self.connections)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for page in pages:
+                for start in range(0, len(page), self.batch_size):
+                    rows = page[start:start + self.batch_size]
+                    for item in self.render(rows):
+                        self._queue.put(item)
+                    self._queue.join()
+                    on_batch(rows)
+        finally:
+            for _ in threads:
+                self._queue.put(None)
+            for thread in threads:
+                thread.join()
+
+    def _report(self, started, **extra):
+        elapsed = time.perf_counter() - started
+        return dict(
+            alert_id=self.alert_id,
+            **extra,
+            sent=self.sent,
+            failed=len(self.failed),
+            failed_path=self.failed_path if self.failed else None,
+            elapsed_seconds=round(elapsed, 3),
+            messages_per_sec=round(self.sent / elapsed, 2) if elapsed else 0.0,
+        )
+
+    def run(self):
+        """
+        Send the alert to all subscribers after the checkpoint.
+
+        Returns:
+            dict: sent, failed, failed_path, elapsed_seconds and
+            messages_per_sec.
+        """
+        after_id = self.load_checkpoint()
+        started = time.perf_counter()
+        if self.area is not None:
+            pages = iter_area_subscriber_pages(self.pool, self.area, self.page_size, after_id)
+        else:
+            pages = iter_subscriber_pages(self.pool, self.page_size, after_id)
+
+        def on_batch(rows):
+            self.save_failed()
+            self.save_checkpoint(rows[-1][0])
+
+        try:
+            self._send_pages(pages, on_batch)
+        finally:
+            self.save_failed()
+        return self._report(started, resumed_after_id=after_id)
+
+    def retry_failed(self):
+        """
+        Resend the alert to the subscribers in the failed file, then rewrite
+        it with the ones that failed again (removing it if none did).
+
+        Returns:
+            dict: As `run`, plus the number of subscribers retried.
+        """
+        ids = self.load_failed()
+        started = time.perf_counter()
+        self.sent = 0
+        self.failed = []
+        self._failed_saved = 0
+        self._send_pages(iter_subscribers_by_id(self.pool, ids, self.page_size), lambda rows: None)
+
+        tmp_path = self.failed_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(failed_lines(self.failed))
+        os.replace(tmp_path, self.failed_path)
+        self._failed_saved = len(self.failed)
+        if not self.failed:
+            os.remove(self.failed_path)
+        return self._report(started, retried=len(ids))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a storm alert to all subscribers.")
+    parser.add_argument("--alert-id", required=True, help="Stable id used for resuming")
+    parser.add_argument("--storm", required=True, help="Storm name")
+    parser.add_argument("--status", required=True, help="Forecast status text")
+    parser.add_argument("--advisory", default="")
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=50.0, help="Messages per second")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=100,
+                        help="Messages sent between checkpoints")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--failed-file", default=None,
+                        help="Where failed recipients are kept (default alert-<id>.failed.jsonl)")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Only resend to the recipients in the failed file")
+    parser.add_argument("--lat", type=float, help="Storm latitude, with --lon and --radius-km")
+    parser.add_argument("--lon", type=float)
+    parser.add_argument("--radius-km", type=float)
+    args = parser.parse_args()
+
+    area_args = (args.lat, args.lon, args.radius_km)
+    if any(value is not None for value in area_args) and None in area_args:
+        parser.error("--lat, --lon and --radius-km go together")
+
+    dispatcher = AlertDispatcher(
+        get_pool(),
+        SMTPSettings.from_env(),
+        alert_id=args.alert_id,
+        storm_name=args.storm,
+        status=args.status,
+        advisory=args.advisory,
+        connections=args.connections,
+        rate=args.rate,
+        page_size=args.page_size,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint,
+        area=area_args if args.lat is not None else None,
+        failed_path=args.failed_file,
+    )
+    report = dispatcher.retry_failed() if args.retry_failed else dispatcher.run()
+    print(json.dumps(report, indent=2))
+    for subscriber_id, email, error in dispatcher.failed:
+        print(f"Failed to alert subscriber {subscriber_id} <{email}>: {error}")
+
+
+if __name__ == "__main__":
+    main()
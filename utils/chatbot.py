@@ -0,0 +1,356 @@
+# chatbot.py
+
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from types import SimpleNamespace
+
+from utils.cache import TTLCache
+
+GEMINI_MODEL_NAME = "gemini-1.5-flash"
+
+# Generation settings the chatbot has always used.
+GENERATION_SETTINGS = {
+    "candidate_count": 1,
+    "stop_sequences": ["."],
+    "max_output_tokens": 100,
+    "temperature": 1.0,
+}
+
+NO_ANSWER = "Sorry, I couldn't find an answer."
+
+
+class ChatbotBusy(Exception):
+    """Raised when the chatbot queue is full."""
+
+
+class ChatbotTimeout(Exception):
+    """Raised when a Gemini call exceeds the per-call timeout."""
+
+
+class StubGeminiModel:
+    """
+    Offline stand-in for `genai.GenerativeModel` used for load tests.
+
+    Answers are deterministic and returned after `latency` seconds, in the
+    same candidates/content/parts shape the real client produces. With
+    `stream=True` the answer arrives word by word, like Gemini's streamed
+    chunks.
+    """
+
+    def __init__(self, latency=0.5):
+        self.latency = latency
+
+    def answer(self, prompt):
+        return f"Stub answer about {prompt.strip().rstrip('?.!')}."
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        if stream:
+            return self._stream(prompt)
+        time.sleep(self.latency)
+        return self._response(self.answer(prompt))
+
+    def _response(self, text):
+        part = SimpleNamespace(text=text)
+        candidate = SimpleNamespace(content=SimpleNamespace(parts=[part]))
+        return SimpleNamespace(candidates=[candidate], text=text)
+
+    def _stream(self, prompt):
+        # Word-sized chunks spread over the same total latency
+        words = self.answer(prompt).split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.latency / len(words))
+            yield self._response(word if i == 0 else " " + word)
+
+
+def create_gemini_model(backend=None):
+    """
+    Build the model client for the configured backend.
+
+    Parameters:
+        backend (str): "gemini" (default) or "stub"; read from
+            GEMINI_BACKEND when not given.
+
+    Returns:
+        tuple: (model, generation_config) ready for generate_content.
+    """
+    backend = backend or os.getenv("GEMINI_BACKEND", "gemini")
+    if backend == "stub":
+        latency = float(os.getenv("GEMINI_STUB_LATENCY", "0.5"))
+        return StubGeminiModel(latency=latency), GENERATION_SETTINGS
+
+    import google.generativeai as genai
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY environment variable not set.")
+    genai.configure(api_key=api_key)
+    return (
+        genai.GenerativeModel(GEMINI_MODEL_NAME),
+        genai.types.GenerationConfig(**GENERATION_SETTINGS),
+    )
+
+
+def extract_text(response):
+    """
+    Text of the first candidate, or a fallback message when there is none.
+    """
+    candidates = response.candidates if hasattr(response, "candidates") else []
+    if candidates and len(candidates) > 0:
+        return candidates[0].content.parts[0].text
+    return NO_ANSWER
+
+
+def chunk_text(chunk):
+    """
+    Text carried by one streamed chunk ("" for chunks with no candidates).
+    """
+    candidates = getattr(chunk, "candidates", None) or []
+    if not candidates or not candidates[0].content.parts:
+        return ""
+    return "".join(part.text for part in candidates[0].content.parts)
+
+
+def normalize_question(question):
+    """
+    Cache key for a question: case, whitespace and trailing punctuation
+    don't change the answer.
+    """
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip("?.! ")
+
+
+class _ChatStream:
+    # Iterator over streamed text chunks. Once started, the chunk generator
+    # gives back its own slot and queue place; closing the stream before the
+    # first chunk (e.g. the client disconnected before the body started)
+    # gives back the queue place reserved for it.
+    def __init__(self, chunks, unreserve):
+        self._chunks = chunks
+        self._unreserve = unreserve
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self._unreserve = None
+        return next(self._chunks)
+
+    def close(self):
+        unreserve, self._unreserve = self._unreserve, None
+        self._chunks.close()
+        if unreserve is not None:
+            unreserve()
+
+
+_STREAM_END = object()
+
+
+class ChatbotService:
+    """
+    Runs Gemini calls on a bounded thread pool with one shared model client.
+
+    At most `max_concurrency` calls run at once and up to `max_queue` more
+    wait; beyond that `ask` raises ChatbotBusy immediately instead of
+    tying up another request thread. Buffered (`ask`) and streamed
+    (`stream`) calls share the same concurrency slots. Answers are cached
+    by normalized question for `cache_ttl` seconds.
+    """
+
+    def __init__(self, model_factory=create_gemini_model, max_concurrency=4, max_queue=16,
+                 timeout=20.0, cache_ttl=3600, cache_size=512):
+        self.model_factory = model_factory
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.cache = TTLCache(ttl=cache_ttl, max_entries=cache_size)
+
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="gemini"
+        )
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")),
+            max_queue=int(os.getenv("GEMINI_MAX_QUEUE", "16")),
+            timeout=float(os.getenv("GEMINI_TIMEOUT", "20")),
+            cache_ttl=float(os.getenv("GEMINI_CACHE_TTL", "3600")),
+            cache_size=int(os.getenv("GEMINI_CACHE_SIZE", "512")),
+        )
+
+    @property
+    def client(self):
+        # Created on first use and shared by every call afterwards
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self.model_factory()
+        return self._client
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def _generate(self, question):
+        try:
+            with self._slots:
+                model, generation_config = self.client
+                response = model.generate_content(question, generation_config=generation_config)
+                return extract_text(response)
+        finally:
+            self._count("pending", -1)
+
+    def _reserve(self):
+        with self._lock:
+            if self.pending >= self.max_concurrency + self.max_queue:
+                self.rejected += 1
+                raise ChatbotBusy()
+            self.pending += 1
+            self.misses += 1
+
+    def ask(self, question):
+        """
+        Answer a question, from cache when possible.
+
+        Raises:
+            ChatbotBusy: If the queue is full.
+            ChatbotTimeout: If Gemini doesn't answer within `timeout`.
+        """
+        key = normalize_question(question)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count("hits")
+            return cached
+
+        self._reserve()
+        future = self._executor.submit(self._generate, question)
+        try:
+            answer = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Drop it if it never started; a running call finishes in the
+            # background and still releases its slot.
+            if future.cancel():
+                self._count("pending", -1)
+            self._count("timeouts")
+            raise ChatbotTimeout()
+        except Exception:
+            self._count("errors")
+            raise
+
+        if answer != NO_ANSWER:
+            self.cache.put(key, answer)
+        return answer
+
+    def stream(self, question):
+        """
+        Answer a question as an iterator of text chunks.
+
+        Only the queue check happens before this returns, so ChatbotBusy can
+        still be turned into an error status. The concurrency slot is taken
+        when iteration starts, and every chunk (the first included) must
+        arrive before `timeout` runs out or iteration raises ChatbotTimeout.
+        Close the iterator if it may not be exhausted. A cached answer comes
+        back as a single chunk.
+        """
+        key = normalize_question(question)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count("hits")
+            return iter([cached])
+
+        self._reserve()
+        return _ChatStream(
+            self._stream_chunks(question, key), lambda: self._count("pending", -1)
+        )
+
+    def _stream_chunks(self, question, key):
+        deadline = time.monotonic() + self.timeout
+        if not self._slots.acquire(timeout=self.timeout):
+            self._count("pending", -1)
+            self._count("timeouts")
+            raise ChatbotTimeout()
+
+        # Gemini is read on its own thread and chunks are handed over a
+        # queue, so a stalled read can't block past the deadline. A call that
+        # overruns finishes in the background and releases its slot there,
+        # like a timed-out `ask`.
+        chunks = queue.Queue()
+        abandoned = threading.Event()
+        threading.Thread(
+            target=self._read_stream, args=(question, chunks, abandoned),
+            name="gemini-stream", daemon=True,
+        ).start()
+
+        parts = []
+        try:
+            while True:
+                try:
+                    item = chunks.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    self._count("timeouts")
+                    raise ChatbotTimeout()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    self._count("errors")
+                    raise item
+                if item:
+                    parts.append(item)
+                    yield item
+        finally:
+            abandoned.set()
+
+        if parts:
+            self.cache.put(key, "".join(parts))
+        else:
+            yield NO_ANSWER
+
+    def _read_stream(self, question, chunks, abandoned):
+        try:
+            model, generation_config = self.client
+            response = model.generate_content(
+                question, generation_config=generation_config, stream=True
+            )
+            for chunk in response:
+                if abandoned.is_set():
+                    close = getattr(response, "close", None)
+                    if close is not None:
+                        close()
+                    break
+                chunks.put(chunk_text(chunk))
+            chunks.put(_STREAM_END)
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            self._slots.release()
+            self._count("pending", -1)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "pending": self.pending,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "cache_entries": len(self.cache),
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+            }
@@ -0,0 +1,138 @@
+# coastline.py
+
+import csv
+import logging
+import os
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+logger = logging.getLogger(__name__)
+
+# Mean Earth radius used to turn haversine angles into kilometres.
+EARTH_RADIUS_KM = 6371.0088
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The densified Natural Earth coastline from scripts/build_coastline.py.
+# The bundled seed CSV is ~110 coastal towns, good enough for tests and
+# offline development only, and is refused unless COASTLINE_ALLOW_SEED=1.
+_COASTLINE_NPY = os.path.join(BASE_DIR, "data", "coastline_points.npy")
+_COASTLINE_CSV = os.path.join(BASE_DIR, "data", "coastline_points.csv")
+DEFAULT_COASTLINE_PATH = _COASTLINE_NPY if os.path.exists(_COASTLINE_NPY) else _COASTLINE_CSV
+
+# Number of nearest candidates re-measured with geodesic() when refining.
+DEFAULT_REFINE_CANDIDATES = 8
+
+
+def load_coastline_points(path=DEFAULT_COASTLINE_PATH, allow_seed=None):
+    """
+    Load coastline sample points from disk.
+
+    Parameters:
+        path (str): A `.npy` file holding an (n, 2) lat/lon array, or a CSV
+            file with `lat` and `lon` columns (extra columns are ignored).
+        allow_seed (bool): Accept the bundled seed CSV. Defaults to
+            COASTLINE_ALLOW_SEED=1 in the environment.
+
+    Returns:
+        numpy.ndarray: (n, 2) array of latitude/longitude in degrees.
+
+    Raises:
+        ValueError: For the seed CSV when it isn't allowed, or an empty file.
+    """
+    is_seed = os.path.abspath(path) == _COASTLINE_CSV
+    if allow_seed is None:
+        allow_seed = os.getenv("COASTLINE_ALLOW_SEED") == "1"
+    if is_seed and not allow_seed:
+        # Distances between the seed's towns can be off by hundreds of km
+        raise ValueError(
+            f"{path} is the seed coastline (coastal towns, not a coastline). Build "
+            "data/coastline_points.npy with `python scripts/build_coastline.py "
+            "--download`, or set COASTLINE_ALLOW_SEED=1 to use it anyway."
+        )
+
+    if path.endswith(".npy"):
+        points = np.load(path)
+    else:
+        with open(path, newline="") as f:
+            rows = [(float(row["lat"]), float(row["lon"])) for row in csv.DictReader(f)]
+        points = np.asarray(rows, dtype=np.float64)
+
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0:
+        raise ValueError(f"No coastline points found in {path}")
+    if is_seed:
+        logger.warning(
+            "Using the seed coastline %s (%d town points, not a real coastline); "
+            "distance_to_land will be inaccurate.",
+            path, len(points),
+        )
+    return points
+
+
+class CoastlineIndex:
+    """
+    Nearest-coast lookups backed by a haversine BallTree.
+
+    Building the tree is O(n log n) and done once; each query is O(log n).
+    Haversine distances assume a spherical Earth, so `refine=True`
+    re-measures the closest candidates with geopy's ellipsoidal geodesic.
+    """
+
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.tree = BallTree(np.radians(self.points), metric="haversine")
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_COASTLINE_PATH, allow_seed=None):
+        return cls(load_coastline_points(path, allow_seed))
+
+    def __len__(self):
+        return len(self.points)
+
+    def query(self, lat, lon, refine=False, k=DEFAULT_REFINE_CANDIDATES):
+        """
+        Distance in kilometres from each point to the nearest coastline sample.
+
+        Parameters:
+            lat (float or array-like): Latitude(s) in degrees.
+            lon (float or array-like): Longitude(s) in degrees.
+            refine (bool): Re-measure the k nearest candidates with geodesic().
+            k (int): Candidates considered when refining.
+
+        Returns:
+            float or numpy.ndarray: A float for scalar input, otherwise an
+            array shaped like the broadcast inputs.
+        """
+        lat_arr, lon_arr = np.broadcast_arrays(
+            np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+        )
+        shape = lat_arr.shape
+        query_points = np.radians(np.column_stack([lat_arr.ravel(), lon_arr.ravel()]))
+
+        if refine:
+            # geopy is only needed for the (rarely requested) exact refinement
+            from geopy.distance import geodesic
+
+            k = min(k, len(self.points))
+            _, indices = self.tree.query(query_points, k=k)
+            distances = np.array(
+                [
+                    min(
+                        geodesic((q_lat, q_lon), tuple(self.points[i])).kilometers
+                        for i in candidates
+                    )
+                    for (q_lat, q_lon), candidates in zip(
+                        zip(lat_arr.ravel(), lon_arr.ravel()), indices
+                    )
+                ],
+                dtype=np.float64,
+            )
+        else:
+            angles, _ = self.tree.query(query_points, k=1)
+            distances = angles[:, 0] * EARTH_RADIUS_KM
+
+        distances = distances.reshape(shape)
+        if distances.ndim == 0:
+            return float(distances)
+        return distances
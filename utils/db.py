@@ -0,0 +1,290 @@
+# db.py
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Cloud SQL instance the app has always used when DB_HOST isn't set.
+DEFAULT_DB_HOST = "134.134.183.11"
+
+SUBSCRIBERS_DDL = {
+    "mysql": """
+        CREATE TABLE IF NOT EXISTS subscribers (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255),
+            email VARCHAR(255),
+            phone VARCHAR(64),
+            lat DOUBLE,
+            lon DOUBLE,
+            geohash VARCHAR(12) CHARACTER SET ascii COLLATE ascii_bin,
+            UNIQUE KEY uq_subscribers_email (email),
+            KEY idx_subscribers_geohash (geohash)
+        )
+    """,
+    "sqlite": [
+        """
+        CREATE TABLE IF NOT EXISTS subscribers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            email TEXT,
+            phone TEXT,
+            lat REAL,
+            lon REAL,
+            geohash TEXT
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_subscribers_email ON subscribers (email)",
+        "CREATE INDEX IF NOT EXISTS idx_subscribers_geohash ON subscribers (geohash)",
+    ],
+}
+
+
+# DDL run once when the pool is created; modules owning tables add theirs
+# with register_schema().
+SCHEMAS = [SUBSCRIBERS_DDL]
+
+# Callables (dialect, cursor) returning what an existing table is missing
+# compared with the DDL above; changes CREATE ... IF NOT EXISTS can't make
+# are left to an explicit migration command, never run on pool creation.
+SCHEMA_CHECKS = []
+
+
+class SchemaOutOfDate(RuntimeError):
+    """The database predates the current schema; run the named migration."""
+
+    def __init__(self, problems):
+        self.problems = list(problems)
+        super().__init__("Database schema is out of date: " + "; ".join(self.problems))
+
+
+def register_schema(ddl):
+    """
+    Add a mapping of dialect -> DDL (string or list of strings) to run on
+    pool creation. Statements must be idempotent (IF NOT EXISTS).
+    """
+    if ddl not in SCHEMAS:
+        SCHEMAS.append(ddl)
+
+
+def register_schema_check(check):
+    if check not in SCHEMA_CHECKS:
+        SCHEMA_CHECKS.append(check)
+
+
+def schema_problems(dialect, cursor):
+    return [problem for check in SCHEMA_CHECKS for problem in check(dialect, cursor)]
+
+
+def table_columns(dialect, cursor, table):
+    if dialect == "sqlite":
+        cursor.execute(f"PRAGMA table_info({table})")
+        return {row[1] for row in cursor.fetchall()}
+    cursor.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,),
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def table_indexes(dialect, cursor, table):
+    if dialect == "sqlite":
+        cursor.execute(f"PRAGMA index_list({table})")
+        return {row[1] for row in cursor.fetchall()}
+    cursor.execute(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,),
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+class SQLitePool:
+    """
+    Minimal DB-API connection pool for SQLite, used as a local stand-in
+    for the MySQL pool. Connections are created on demand up to `size`.
+    """
+
+    def __init__(self, path, size=5, timeout=30.0):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def get_connection(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._connect()
+        return self._idle.get(timeout=self.timeout)
+
+    def put_connection(self, connection):
+        connection.rollback()
+        self._idle.put(connection)
+
+
+def default_pool_size():
+    """
+    One connection per gunicorn request thread plus one for the email
+    outbox worker, so a busy worker never waits on the pool. Capped at
+    mysql.connector's maximum of 32.
+    """
+    return min(int(os.getenv("GUNICORN_THREADS", "8")) + 1, 32)
+
+
+def database_configured():
+    """
+    Whether the environment points the app at a database: DATABASE_URL, or
+    DB_HOST or DB_USER for MySQL (DB_USER alone means DEFAULT_DB_HOST).
+    """
+    return any(os.getenv(name) for name in ("DATABASE_URL", "DB_HOST", "DB_USER"))
+
+
+def _mysql_settings():
+    return {
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "host": os.getenv("DB_HOST", DEFAULT_DB_HOST),
+        "port": int(os.getenv("DB_PORT", "3306")),
+        "database": os.getenv("DB_NAME", "prehurricane"),
+    }
+
+
+class DatabasePool:
+    """
+    Pooled connections for MySQL (mysql.connector.pooling) or SQLite.
+
+    Queries are written with `%s` placeholders; `sql()` rewrites them for
+    SQLite's `?` paramstyle.
+    """
+
+    def __init__(self, dialect, pool):
+        self.dialect = dialect
+        self._pool = pool
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a pool from DATABASE_URL (`sqlite:///path/to.db`) or, when it
+        isn't set, from the DB_HOST/DB_USER/DB_PASSWORD/DB_NAME variables.
+        """
+        url = os.getenv("DATABASE_URL", "")
+        size = int(os.getenv("DB_POOL_SIZE", str(default_pool_size())))
+        if url.startswith("sqlite:///"):
+            return cls("sqlite", SQLitePool(url[len("sqlite:///"):], size=size))
+
+        from mysql.connector import pooling
+
+        pool = pooling.MySQLConnectionPool(
+            pool_name="prehurricane",
+            pool_size=size,
+            pool_reset_session=True,
+            **_mysql_settings(),
+        )
+        return cls("mysql", pool)
+
+    def sql(self, query):
+        if self.dialect == "sqlite":
+            return query.replace("%s", "?")
+        return query
+
+    def get_connection(self):
+        return self._pool.get_connection()
+
+    def release(self, connection):
+        if self.dialect == "sqlite":
+            self._pool.put_connection(connection)
+        else:
+            # Pooled MySQL connections go back to the pool on close()
+            connection.close()
+
+    @contextmanager
+    def connection(self):
+        connection = self.get_connection()
+        try:
+            yield connection
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            self.release(connection)
+
+    def ensure_schema(self):
+        """
+        Run the registered CREATE ... IF NOT EXISTS statements for this
+        dialect.
+
+        Raises:
+            SchemaOutOfDate: If an existing table needs a migration first.
+        """
+        with self.connection() as connection:
+            cursor = connection.cursor()
+            problems = schema_problems(self.dialect, cursor)
+            if problems:
+                cursor.close()
+                raise SchemaOutOfDate(problems)
+            for ddl in SCHEMAS:
+                statements = ddl[self.dialect]
+                if isinstance(statements, str):
+                    statements = [statements]
+                for statement in statements:
+                    cursor.execute(statement)
+            connection.commit()
+            cursor.close()
+
+
+def check_schema():
+    """
+    Raise SchemaOutOfDate if the configured database needs a migration.
+
+    Uses one unpooled connection, closed before returning, so a gunicorn
+    master that preloads the app leaves no connections for its workers to
+    inherit.
+    """
+    url = os.getenv("DATABASE_URL", "")
+    if url.startswith("sqlite:///"):
+        dialect, connection = "sqlite", sqlite3.connect(url[len("sqlite:///"):])
+    else:
+        import mysql.connector
+
+        dialect, connection = "mysql", mysql.connector.connect(**_mysql_settings())
+    try:
+        cursor = connection.cursor()
+        problems = schema_problems(dialect, cursor)
+        cursor.close()
+    finally:
+        connection.close()
+    if problems:
+        raise SchemaOutOfDate(problems)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Process-wide pool, created (and its schema ensured) on first use so
+    importing the app doesn't need a reachable database.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = DatabasePool.from_env()
+                pool.ensure_schema()
+                _pool = pool
+    return _pool
@@ -0,0 +1,116 @@
+# distance_raster.py
+
+import json
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RASTER_PATH = os.path.join(BASE_DIR, "data", "distance_to_land.npy")
+
+
+def metadata_path(raster_path):
+    """
+    Path of the JSON sidecar describing a raster's grid.
+    """
+    return os.path.splitext(raster_path)[0] + ".json"
+
+
+def save_raster(raster_path, grid, lat_min, lon_min, step):
+    """
+    Write a distance grid as a flat `.npy` file plus its JSON sidecar.
+
+    Parameters:
+        raster_path (str): Destination `.npy` path.
+        grid (numpy.ndarray): (n_lat, n_lon) distances in km, row 0 at lat_min.
+        lat_min (float): Latitude of the first row in degrees.
+        lon_min (float): Longitude of the first column in degrees.
+        step (float): Grid spacing in degrees along both axes.
+    """
+    np.save(raster_path, np.ascontiguousarray(grid, dtype=np.float32))
+    with open(metadata_path(raster_path), "w") as f:
+        json.dump(
+            {
+                "lat_min": lat_min,
+                "lon_min": lon_min,
+                "step": step,
+                "shape": list(grid.shape),
+            },
+            f,
+            indent=2,
+        )
+
+
+class DistanceRaster:
+    """
+    Bilinear lookups into a precomputed distance-to-coast grid.
+
+    The grid is opened with `mmap_mode="r"`, so every gunicorn worker maps
+    the same file and shares its pages through the OS page cache instead
+    of holding a private copy.
+    """
+
+    def __init__(self, grid, lat_min, lon_min, step):
+        self.grid = grid
+        self.lat_min = float(lat_min)
+        self.lon_min = float(lon_min)
+        self.step = float(step)
+        self.n_lat, self.n_lon = grid.shape
+
+    @classmethod
+    def load(cls, raster_path=DEFAULT_RASTER_PATH):
+        with open(metadata_path(raster_path)) as f:
+            meta = json.load(f)
+        grid = np.load(raster_path, mmap_mode="r")
+        if list(grid.shape) != meta["shape"]:
+            raise ValueError(f"Raster {raster_path} does not match its metadata")
+        return cls(grid, meta["lat_min"], meta["lon_min"], meta["step"])
+
+    @property
+    def lat_max(self):
+        return self.lat_min + (self.n_lat - 1) * self.step
+
+    @property
+    def lon_max(self):
+        return self.lon_min + (self.n_lon - 1) * self.step
+
+    def lookup(self, lat, lon):
+        """
+        Interpolated distance in kilometres for each point.
+
+        Parameters:
+            lat (float or array-like): Latitude(s) in degrees.
+            lon (float or array-like): Longitude(s) in degrees.
+
+        Returns:
+            numpy.ndarray: float64 distances shaped like the broadcast inputs,
+            NaN where a point falls outside the grid.
+        """
+        lat, lon = np.broadcast_arrays(
+            np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+        )
+        row = (lat - self.lat_min) / self.step
+        col = (lon - self.lon_min) / self.step
+        inside = (row >= 0) & (row <= self.n_lat - 1) & (col >= 0) & (col <= self.n_lon - 1)
+
+        result = np.full(lat.shape, np.nan)
+        if not inside.any():
+            return result
+
+        row = row[inside]
+        col = col[inside]
+        # Clamp so points on the last row/column still have a cell to the right.
+        r0 = np.minimum(np.floor(row).astype(np.intp), self.n_lat - 2)
+        c0 = np.minimum(np.floor(col).astype(np.intp), self.n_lon - 2)
+        r0 = np.maximum(r0, 0)
+        c0 = np.maximum(c0, 0)
+        r1 = np.minimum(r0 + 1, self.n_lat - 1)
+        c1 = np.minimum(c0 + 1, self.n_lon - 1)
+        tr = row - r0
+        tc = col - c0
+
+        grid = self.grid
+        top = grid[r0, c0] * (1 - tc) + grid[r0, c1] * tc
+        bottom = grid[r1, c0] * (1 - tc) + grid[r1, c1] * tc
+        result[inside] = top * (1 - tr) + bottom * tr
+        return result
@@ -30,3 +30,37 @@ def subscription_thank_you_message(name):
     Hurricane Prediction Alert Team
     """
     return message
+
+
+def hurricane_alert_message(name, storm_name, status, advisory=""):
+    """
+    Generate a personalized storm alert for an existing subscriber.
+
+    Parameters:
+        name (str): The subscriber's name.
+        storm_name (str): Name of the storm the alert is about.
+        status (str): Predicted storm status, e.g. a `LABEL_MAPPING` entry.
+        advisory (str): Optional free-text guidance from the operators.
+
+    Returns:
+        str: A formatted alert message for the subscriber.
+    """
+    message = f"""
+    Hello {name},
+
+    This is a Hurricane Prediction Alert for {storm_name}.
+
+    Current forecast status:
+    {status}
+
+    {advisory}
+
+    Please follow instructions from your local authorities, keep your
+    emergency kit ready, and monitor official updates closely.
+
+    Stay informed and stay safe!
+
+    Best Regards,
+    Hurricane Prediction Alert Team
+    """
+    return message
@@ -0,0 +1,184 @@
+# feature_pipeline.py
+
+import logging
+
+import numpy as np
+
+from utils.prediction import FEATURE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Largest difference from ColumnTransformer.transform accepted by verify().
+TOLERANCE = 1e-9
+
+
+def _affine(transformer, n_columns):
+    """
+    (subtract, divide) vectors equivalent to a fitted per-column scaler, so
+    transform(x) == (x - subtract) / divide.
+    """
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import MaxAbsScaler, MinMaxScaler, RobustScaler, StandardScaler
+
+    if transformer == "passthrough":
+        return np.zeros(n_columns), np.ones(n_columns)
+    if isinstance(transformer, Pipeline):
+        subtract, divide = np.zeros(n_columns), np.ones(n_columns)
+        for _, step in transformer.steps:
+            if step is None or step == "passthrough":
+                continue
+            step_subtract, step_divide = _affine(step, n_columns)
+            # ((x - s1) / d1 - s2) / d2 == (x - (s1 + s2 * d1)) / (d1 * d2)
+            subtract = subtract + step_subtract * divide
+            divide = divide * step_divide
+        return subtract, divide
+    if isinstance(transformer, StandardScaler):
+        subtract = transformer.mean_ if transformer.with_mean else np.zeros(n_columns)
+        divide = transformer.scale_ if transformer.with_std else np.ones(n_columns)
+        return np.asarray(subtract, dtype=np.float64), np.asarray(divide, dtype=np.float64)
+    if isinstance(transformer, RobustScaler):
+        subtract = transformer.center_ if transformer.with_centering else np.zeros(n_columns)
+        divide = transformer.scale_ if transformer.with_scaling else np.ones(n_columns)
+        return np.asarray(subtract, dtype=np.float64), np.asarray(divide, dtype=np.float64)
+    if isinstance(transformer, MinMaxScaler):
+        if transformer.clip:
+            raise ValueError("MinMaxScaler(clip=True) is not supported")
+        # x * scale_ + min_ == (x + min_ / scale_) / (1 / scale_)
+        scale = np.asarray(transformer.scale_, dtype=np.float64)
+        return -np.asarray(transformer.min_, dtype=np.float64) / scale, 1.0 / scale
+    if isinstance(transformer, MaxAbsScaler):
+        return np.zeros(n_columns), np.asarray(transformer.scale_, dtype=np.float64)
+    raise ValueError(f"Unsupported transformer {type(transformer).__name__}")
+
+
+class CompiledPreprocessor:
+    """
+    NumPy replacement for the fitted ColumnTransformer on the app's seven
+    feature columns.
+
+    The fitted parameters (column selection and order, scaler means and
+    scales) are read out once; `transform` is then a gather, a subtraction
+    and a division on a float64 array, with no DataFrame and no per-call
+    validation. Every call returns a new array the caller owns.
+
+    Exposes `accepts_arrays` so utils.prediction.predict_features passes it
+    the feature matrix directly instead of building a DataFrame.
+    """
+
+    accepts_arrays = True
+
+    def __init__(self, index, subtract, divide, source=None):
+        self.index = np.asarray(index, dtype=np.intp)
+        self.subtract = np.asarray(subtract, dtype=np.float64)
+        self.divide = np.asarray(divide, dtype=np.float64)
+        self.n_features_out = len(self.index)
+        # The fitted ColumnTransformer, kept for verification
+        self.source = source
+
+    @classmethod
+    def from_column_transformer(cls, transformer, columns=FEATURE_COLUMNS):
+        """
+        Compile a fitted ColumnTransformer whose transformers are per-column
+        scalers (or pipelines of them) and passthrough over `columns`.
+
+        Raises:
+            ValueError: For transformers that can't be expressed this way.
+        """
+        if getattr(transformer, "sparse_output_", False):
+            raise ValueError("Sparse ColumnTransformer output is not supported")
+        names_in = list(getattr(transformer, "feature_names_in_", columns))
+        position = {name: columns.index(name) for name in columns}
+
+        index, subtract, divide = [], [], []
+        for name, step, selected in transformer.transformers_:
+            if step == "drop" or (name == "remainder" and step != "passthrough"):
+                continue
+            selected = [names_in[c] if isinstance(c, (int, np.integer)) else c for c in selected]
+            if isinstance(selected, str) or not selected:
+                continue
+            missing = [c for c in selected if c not in position]
+            if missing:
+                raise ValueError(f"Transformer {name!r} uses columns outside the features: {missing}")
+            step_subtract, step_divide = _affine(step, len(selected))
+            index += [position[c] for c in selected]
+            subtract.append(step_subtract)
+            divide.append(step_divide)
+
+        return cls(index, np.concatenate(subtract), np.concatenate(divide), source=transformer)
+
+    def transform(self, features):
+        """
+        Parameters:
+            features (array-like): (n, 7) matrix in FEATURE_COLUMNS order.
+
+        Returns:
+            numpy.ndarray: (n, n_features_out) float64, a new array.
+        """
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim != 2 or features.shape[1] != len(FEATURE_COLUMNS):
+            raise ValueError(f"Expected (n, {len(FEATURE_COLUMNS)}) features, got {features.shape}")
+        if features.shape[0] == 1:
+            return self.transform_row(features[0])
+        out = features[:, self.index]
+        out -= self.subtract
+        out /= self.divide
+        return out
+
+    def transform_row(self, row):
+        """
+        Transform one feature vector into a new (1, n_features_out) array,
+        skipping the 2-D checks and fancy indexing of the batch path.
+        """
+        out = np.take(np.asarray(row, dtype=np.float64), self.index)[np.newaxis]
+        out -= self.subtract
+        out /= self.divide
+        return out
+
+    def verify(self, features):
+        """
+        Largest absolute difference from the source ColumnTransformer over
+        `features` (an (n, 7) matrix).
+        """
+        from utils.prediction import build_feature_frame
+
+        expected = self.source.transform(build_feature_frame(features))
+        return float(np.max(np.abs(self.transform(features) - expected)))
+
+
+def verification_sample(n=2000, seed=0):
+    """
+    Feature rows spanning (and exceeding) realistic ranges, plus zeros and
+    extreme values, for comparing compiled and sklearn preprocessing.
+    """
+    rng = np.random.default_rng(seed)
+    wind = rng.uniform(0, 200, n)
+    pressure = rng.uniform(850, 1050, n)
+    rows = np.column_stack([
+        wind, pressure, rng.uniform(-100, 5000, n), rng.uniform(-90, 90, n),
+        rng.uniform(-180, 180, n), wind / pressure, rng.integers(0, 2, n).astype(float),
+    ])
+    edge = np.array([
+        np.zeros(len(FEATURE_COLUMNS)),
+        [300.0, 1100.0, 20000.0, 90.0, 180.0, 300.0 / 1100.0, 1.0],
+        [-1.0, 1.0, -1.0, -90.0, -180.0, -1.0, 0.0],
+    ])
+    return np.vstack([rows, edge])
+
+
+def compile_preprocessor(preprocessor, tolerance=TOLERANCE):
+    """
+    Compiled equivalent of a fitted preprocessor, verified against it, or
+    the preprocessor itself when it can't be compiled or doesn't match.
+    """
+    try:
+        compiled = CompiledPreprocessor.from_column_transformer(preprocessor)
+        difference = compiled.verify(verification_sample())
+    except Exception as e:
+        logger.warning("Using sklearn preprocessing; could not compile preprocessor: %s", e)
+        return preprocessor
+    if difference > tolerance:
+        logger.warning(
+            "Using sklearn preprocessing; compiled output differs by %.3g", difference
+        )
+        return preprocessor
+    return compiled
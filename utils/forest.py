@@ -0,0 +1,171 @@
+# forest.py
+
+import json
+import os
+
+import numpy as np
+
+NODE_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+METADATA_FILE = "forest.json"
+
+# Rows traversed per step; bounds the (rows x trees) working arrays.
+CHUNK_ROWS = 4096
+
+
+def compile_forest(model):
+    """
+    Flatten a fitted RandomForestClassifier into NumPy node arrays.
+
+    All trees are concatenated into one node table. Child indices are
+    global (a leaf's left and right point at the leaf itself), `roots`
+    holds each tree's first node, and `value` holds each node's class
+    probabilities exactly as the installed
+    DecisionTreeClassifier.predict_proba returns them.
+
+    Parameters:
+        model: Fitted single-output RandomForestClassifier.
+
+    Returns:
+        dict: Node arrays keyed by NODE_ARRAYS plus a "meta" dict.
+    """
+    import sklearn
+
+    # sklearn >= 1.4 stores class fractions in tree_.value and returns them
+    # as-is; older releases store weighted counts and normalize per call.
+    version = tuple(int(part) for part in sklearn.__version__.split(".")[:2])
+    stores_fractions = version >= (1, 4)
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        if tree.n_outputs != 1:
+            raise ValueError("Only single-output forests can be compiled")
+
+        # Leaves point back at themselves so traversal needs no leaf test
+        index = np.arange(offset, offset + tree.node_count, dtype=np.int64)
+        is_leaf = tree.children_left == -1
+        left = np.where(is_leaf, index, tree.children_left + offset)
+        right = np.where(is_leaf, index, tree.children_right + offset)
+
+        proba = tree.value[:, 0, : estimator.n_classes_].astype(np.float64)
+        if not stores_fractions:
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba = proba / normalizer
+
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(left)
+        rights.append(right)
+        values.append(proba)
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    return {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts),
+        "right": np.concatenate(rights),
+        "value": np.concatenate(values),
+        "roots": np.asarray(roots, dtype=np.int64),
+        "meta": {
+            "classes": [c.item() if hasattr(c, "item") else c for c in model.classes_],
+            "n_features": int(model.n_features_in_),
+            "n_estimators": len(model.estimators_),
+            "max_depth": int(max_depth),
+            "node_count": int(offset),
+        },
+    }
+
+
+def save_forest(compiled, directory):
+    """
+    Write compiled node arrays as individual `.npy` files plus metadata.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in NODE_ARRAYS:
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(compiled[name]))
+    with open(os.path.join(directory, METADATA_FILE), "w") as f:
+        json.dump(compiled["meta"], f, indent=2)
+
+
+class CompactForest:
+    """
+    Random forest inference over flat node arrays.
+
+    Exposes the `classes_`, `predict_proba` and `predict` interface the app
+    uses on the sklearn model and returns identical results: inputs are
+    cast to float32 like sklearn's trees do, per-tree probabilities are
+    summed in estimator order and divided by the tree count.
+
+    Loaded with `mmap_mode="r"`, the arrays are file-backed pages shared by
+    every gunicorn worker instead of a private unpickled copy per process.
+    """
+
+    def __init__(self, arrays, meta):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = np.asarray(arrays["roots"])
+        self.classes_ = np.asarray(meta["classes"])
+        self.n_features_in_ = meta["n_features"]
+        self.n_estimators = meta["n_estimators"]
+        self.max_depth = meta["max_depth"]
+
+    @classmethod
+    def from_model(cls, model):
+        compiled = compile_forest(model)
+        return cls(compiled, compiled["meta"])
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        with open(os.path.join(directory, METADATA_FILE)) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in NODE_ARRAYS
+        }
+        return cls(arrays, meta)
+
+    def apply(self, X):
+        """
+        Leaf node index reached in every tree, shape (n_samples, n_trees).
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+        n_trees = len(self.roots)
+
+        # Walk all (row, tree) pairs together over flat arrays; after
+        # max_depth steps every pair sits on its leaf, which loops to itself.
+        flat_X = X.ravel()
+        row_offsets = np.repeat(np.arange(n_samples, dtype=np.int64) * n_features, n_trees)
+        nodes = np.tile(self.roots, n_samples)
+        for _ in range(self.max_depth):
+            go_left = flat_X[row_offsets + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes.reshape(n_samples, n_trees)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"Expected input with {self.n_features_in_} features, got shape {X.shape}"
+            )
+
+        proba = np.empty((X.shape[0], len(self.classes_)), dtype=np.float64)
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            leaves = self.apply(X[start:start + CHUNK_ROWS])
+            total = np.zeros((leaves.shape[0], len(self.classes_)), dtype=np.float64)
+            for tree in range(leaves.shape[1]):
+                total += self.value[leaves[:, tree]]
+            proba[start:start + CHUNK_ROWS] = total / self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
@@ -2,18 +2,27 @@
 # It will handle generating responses based on weather data, hurricane data, simulations, and any other 
 # task Google Gemini is responsible for.
 
-import google.generativeai as genai
+import logging
 import random
-import os
+import threading
 
-# Configuration: Load the API key for Gemini from environment variables.
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+from utils.chatbot import create_gemini_model, extract_text
 
-# If the key isn't set, raise an error
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-else:
-    raise ValueError("GEMINI_API_KEY environment variable not set.")
+logger = logging.getLogger(__name__)
+
+# The Gemini client (and google.generativeai itself) is created on first use;
+# create_gemini_model() configures the API key and raises if it isn't set.
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = create_gemini_model()
+    return _model
 
 # Function to configure and ask Gemini questions related to hurricane simulation, weather analysis, and safety tips.
 def ask_gemini(question, weather_data, hurricane_data):
@@ -30,28 +39,14 @@ def ask_gemini(question, weather_data, hurricane_data):
     prompt = random.choice(prompts)
 
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                candidate_count=1,
-                stop_sequences=["."],
-                max_output_tokens=100,
-                temperature=1.0
-            )
-        )
+        model, generation_config = get_model()
+        response = model.generate_content(prompt, generation_config=generation_config)
 
         # Directly access candidates in the response
-        candidates = response.candidates if hasattr(response, 'candidates') else []
-        if candidates and len(candidates) > 0:
-            chatbot_response = candidates[0].content.parts[0].text
-        else:
-            chatbot_response = "Sorry, I couldn't find an answer."
-
-        return chatbot_response
+        return extract_text(response)
 
     except Exception as e:
-        print(f"Error with Gemini API: {e}")
+        logger.error("Error with Gemini API: %s", e)
         return "Sorry, something went wrong with the chatbot."
 
 # Function to create different prompt types for Gemini
@@ -0,0 +1,116 @@
+# geohash.py
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode(lat, lon, precision=6):
+    """
+    Encode a coordinate as a geohash string.
+
+    Parameters:
+        lat (float): Latitude in degrees.
+        lon (float): Longitude in degrees.
+        precision (int): Number of characters; 5 is ~4.9 km cells,
+            6 is ~1.2 km x 0.6 km, 7 is ~150 m.
+
+    Returns:
+        str: The geohash of the cell containing the point.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        # Bits alternate between longitude (even) and latitude (odd).
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """
+    (height, width) in degrees of the cells at a precision.
+    """
+    bits = 5 * precision
+    # Longitude takes the extra bit when the count is odd
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def covering_cells(lat_min, lat_max, lon_min, lon_max, max_cells=32):
+    """
+    Geohashes of the cells covering a lat/lon box, at the finest precision
+    that needs at most `max_cells` of them. Every point inside the box has
+    a geohash starting with one of the returned prefixes.
+
+    The box is clipped to [-90, 90] x [-180, 180]; it doesn't wrap around
+    the antimeridian.
+    """
+    lat_min, lat_max = max(lat_min, -90.0), min(lat_max, 90.0)
+    lon_min, lon_max = max(lon_min, -180.0), min(lon_max, 180.0)
+    for precision in range(12, 0, -1):
+        height, width = cell_size(precision)
+        rows, columns = round(180.0 / height), round(360.0 / width)
+        # Cell indices of the box corners, clamped for the +90/+180 edges
+        row_min = min(int((lat_min + 90.0) // height), rows - 1)
+        row_max = min(int((lat_max + 90.0) // height), rows - 1)
+        column_min = min(int((lon_min + 180.0) // width), columns - 1)
+        column_max = min(int((lon_max + 180.0) // width), columns - 1)
+        if (row_max - row_min + 1) * (column_max - column_min + 1) <= max_cells or precision == 1:
+            break
+
+    return sorted(
+        encode((row + 0.5) * height - 90.0, (column + 0.5) * width - 180.0, precision)
+        for row in range(row_min, row_max + 1)
+        for column in range(column_min, column_max + 1)
+    )
+
+
+def prefix_ranges(prefixes):
+    """
+    Merge sorted geohash prefixes into (low, high) string ranges,
+    `low <= geohash < high` (no upper bound when `high` is None), joining
+    same-length prefixes that are consecutive in geohash order so a query
+    needs fewer index range scans.
+    """
+    ranges = []
+    previous = None
+    for prefix in prefixes:
+        value = 0
+        for char in prefix:
+            value = value * 32 + _BASE32.index(char)
+        if previous == (len(prefix), value - 1):
+            ranges[-1][1] = prefix
+        else:
+            ranges.append([prefix, prefix])
+        previous = (len(prefix), value)
+    return [(low, successor(high)) for low, high in ranges]
+
+
+def successor(prefix):
+    """
+    The smallest geohash string after every hash starting with `prefix`
+    ("dhw" -> "dhx", "dhz" -> "dj"), or None when there is none ("zz").
+
+    Built from geohash characters only, so it bounds the range the same
+    way under any collation that orders digits before letters.
+    """
+    prefix = prefix.rstrip(_BASE32[-1])
+    if not prefix:
+        return None
+    return prefix[:-1] + _BASE32[_BASE32.index(prefix[-1]) + 1]
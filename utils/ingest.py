@@ -0,0 +1,677 @@
+# ingest.py
+#
+# Background ingestion for a fixed list of monitored coastal regions: poll
+# OpenWeather for every point each cycle (asyncio, bounded concurrency, a
+# token-bucket rate limit that backs off on HTTP 429), classify the whole
+# snapshot in one batch and append it to a rolling time series
+# (utils.timeseries.ColumnStore). The app serves /assess for those regions
+# from the latest snapshot while it is fresh.
+#
+#   python -m utils.ingest                    # poll every INGEST_INTERVAL seconds
+#   python -m utils.ingest --once             # one cycle, then exit
+#
+# Against the local OpenWeather stub instead of the real API:
+#
+#   python benchmarks/stubs.py --weather-rate-limit 5 &
+#   OPENWEATHER_URL=http://127.0.0.1:8765/data/2.5/weather \
+#       python -m utils.ingest --once --store /tmp/monitored
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.coastline import DEFAULT_COASTLINE_PATH, EARTH_RADIUS_KM, CoastlineIndex
+from utils.distance_raster import DEFAULT_RASTER_PATH, DistanceRaster
+from utils.model_registry import DEFAULT_REGISTRY_PATH, ModelRegistry, load_active_bundle
+from utils.prediction import KMH_PER_KNOT, describe_prediction, predict_features
+from utils.timeseries import MANIFEST_FILE, ColumnStore
+from utils.weather import OPENWEATHER_URL, extract_weather_fields, local_time_fields
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGIONS_PATH = "data/monitored_regions.csv"
+DEFAULT_STORE_PATH = "data/monitored"
+
+# Most recent rows scanned for each region's latest snapshot, in cycles.
+TAIL_CYCLES = 8
+
+
+def snapshot_columns(n_classes):
+    """
+    ColumnStore schema of one ingested observation. `region`, `description`
+    and `model_version` index into the lists of the same name in the
+    store's attrs.
+    """
+    return {
+        "fetched_at": ("<f8", ()),
+        "observed_at": ("<i8", ()),
+        "region": ("<i4", ()),
+        "timezone_offset": ("<i4", ()),
+        # km/h, as /assess reports it; the model saw it in knots
+        "wind_speed": ("<f8", ()),
+        "sea_level_pressure": ("<f8", ()),
+        "temperature": ("<f8", ()),
+        "is_day": ("u1", ()),
+        "description": ("<i2", ()),
+        "model_version": ("<i2", ()),
+        "prediction": ("<i4", ()),
+        "probabilities": ("<f4", (n_classes,)),
+    }
+
+
+def load_regions(path=DEFAULT_REGIONS_PATH):
+    """
+    Monitored points from a CSV file with `lat`, `lon` and `name` columns.
+
+    Returns:
+        list: {"name", "lat", "lon"} dicts in file order.
+    """
+    with open(path, newline="") as f:
+        regions = [
+            {"name": row["name"].strip(), "lat": float(row["lat"]), "lon": float(row["lon"])}
+            for row in csv.DictReader(f)
+        ]
+    if not regions:
+        raise ValueError(f"No monitored regions found in {path}")
+    return regions
+
+
+def region_distances(regions, raster_path=DEFAULT_RASTER_PATH,
+                     coastline_path=DEFAULT_COASTLINE_PATH):
+    # Fixed per point, so computed once at startup: the raster where it
+    # covers the point, the coastline index elsewhere
+    lats = np.array([region["lat"] for region in regions])
+    lons = np.array([region["lon"] for region in regions])
+    distances = np.full(len(regions), np.nan)
+    if raster_path and os.path.exists(raster_path):
+        distances = DistanceRaster.load(raster_path).lookup(lats, lons)
+    missing = np.isnan(distances)
+    if missing.any():
+        distances[missing] = CoastlineIndex.from_file(coastline_path).query(
+            lats[missing], lons[missing]
+        )
+    return distances
+
+
+def _intern(values, value):
+    # Index of `value` in an append-only attrs list, appending it if new
+    if value not in values:
+        values.append(value)
+    return values.index(value)
+
+
+class RateLimiter:
+    """
+    Token bucket shared by the fetch tasks of one event loop: `rate`
+    requests per second on average, bursts of up to `burst`. `pause` holds
+    every task back, for upstream Retry-After responses.
+
+    Uses no asyncio primitives, so it can outlive the loop of one cycle.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class WeatherIngestor:
+    """
+    Polls OpenWeather for every monitored region and appends each cycle's
+    snapshot, classified in one batch, to a ColumnStore.
+
+    Requests run on threads through one pooled `requests` session (no async
+    HTTP client is required); `concurrency` bounds how many are in flight
+    and the rate limiter how fast they start. Timeouts and 5xx responses
+    are retried with exponential backoff, 429s after the Retry-After delay.
+
+    Parameters:
+        regions (list): {"name", "lat", "lon"} dicts, see load_regions.
+        store (ColumnStore): Created with snapshot_columns().
+        get_bundle (callable): Returns the ModelBundle to classify with.
+        distances (array-like): Distance to land (km) per region.
+    """
+
+    def __init__(self, regions, store, get_bundle, distances, api_key,
+                 base_url=OPENWEATHER_URL, concurrency=8, rate=1.0, burst=4, timeout=10.0,
+                 max_retries=3, backoff=1.0, retention=72 * 3600.0):
+        self.regions = regions
+        self.store = store
+        self.get_bundle = get_bundle
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate, burst)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.retention = retention
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Region positions in the store's append-only attrs list, so editing
+        # the regions file never renumbers stored rows
+        attrs = store.attrs
+        self._stored_regions = list(attrs.get("regions", []))
+        names = [region["name"] for region in self._stored_regions]
+        self.region_index = []
+        for region, distance in zip(regions, self.distances):
+            entry = dict(region, distance_to_land=float(distance))
+            if region["name"] in names:
+                self._stored_regions[names.index(region["name"])] = entry
+            else:
+                self._stored_regions.append(entry)
+                names.append(region["name"])
+            self.region_index.append(names.index(region["name"]))
+
+        self.cycles = 0
+        self.requests = 0
+        self.fetched = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttled = 0
+        self.last_cycle = None
+        self._last_compacted = 0.0
+
+    def _get(self, region):
+        params = {
+            "lat": region["lat"], "lon": region["lon"], "appid": self.api_key, "units": "metric",
+        }
+        return self.session.get(self.base_url, params=params, timeout=self.timeout)
+
+    async def _fetch(self, region, semaphore):
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+            delay = self.backoff * 2 ** attempt
+            async with semaphore:
+                await self.limiter.acquire()
+                self.requests += 1
+                try:
+                    response = await asyncio.to_thread(self._get, region)
+                except requests.RequestException as e:
+                    logger.warning("Weather request for %s failed: %s", region["name"], e)
+                    response = None
+
+            if response is not None:
+                if response.status_code == 200:
+                    try:
+                        return response.json()
+                    except ValueError:
+                        logger.warning("Invalid weather response for %s", region["name"])
+                        return None
+                if response.status_code == 429:
+                    self.throttled += 1
+                    try:
+                        delay = float(response.headers.get("Retry-After", delay))
+                    except ValueError:
+                        pass
+                    # Everyone waits, not just this task
+                    self.limiter.pause(delay)
+                elif response.status_code < 500:
+                    logger.warning(
+                        "Weather request for %s rejected with HTTP %s",
+                        region["name"], response.status_code,
+                    )
+                    return None
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay)
+        return None
+
+    def _classify(self, rows, fetched_at):
+        bundle = self.get_bundle()
+        classes = [int(c) for c in bundle.model.classes_]
+        attrs = self.store.attrs
+        if attrs.get("classes", classes) != classes:
+            raise ValueError(
+                f"Model {bundle.version} predicts classes {classes}, the store holds "
+                f"{attrs['classes']}; ingest into a new --store"
+            )
+
+        positions = [position for position, _, _ in rows]
+        # Knots, as the model was trained; the store keeps km/h like /assess
+        features = np.array(
+            [
+                [
+                    fields["wind_speed"] / KMH_PER_KNOT,
+                    float(fields["sea_level_pressure"]),
+                    self.distances[position],
+                    self.regions[position]["lat"],
+                    self.regions[position]["lon"],
+                    fields["wind_speed"] / KMH_PER_KNOT / float(fields["sea_level_pressure"]),
+                    1.0 if fields["is_day"] else 0.0,
+                ]
+                for position, _, fields in rows
+            ],
+            dtype=np.float64,
+        )
+        predictions, probabilities = predict_features(bundle.model, bundle.preprocessor, features)
+
+        descriptions = list(attrs.get("descriptions", []))
+        model_versions = list(attrs.get("model_versions", []))
+        version = _intern(model_versions, bundle.version)
+        self.store.append(
+            {
+                "fetched_at": np.full(len(rows), fetched_at),
+                "observed_at": [data["dt"] for _, data, _ in rows],
+                "region": [self.region_index[position] for position in positions],
+                "timezone_offset": [fields["timezone_offset"] for _, _, fields in rows],
+                "wind_speed": [fields["wind_speed"] for _, _, fields in rows],
+                "sea_level_pressure": features[:, 1],
+                "temperature": [
+                    np.nan if temperature is None else temperature
+                    for temperature in ((data.get("main") or {}).get("temp") for _, data, _ in rows)
+                ],
+                "is_day": [fields["is_day"] for _, _, fields in rows],
+                "description": [
+                    _intern(descriptions, (data.get("weather") or [{}])[0].get("description"))
+                    for _, data, _ in rows
+                ],
+                "model_version": np.full(len(rows), version),
+                "prediction": predictions,
+                "probabilities": probabilities,
+            },
+            attrs={
+                "regions": self._stored_regions,
+                "classes": classes,
+                "descriptions": descriptions,
+                "model_versions": model_versions,
+                "ingest": self.stats(),
+            },
+        )
+        return len(rows)
+
+    def _compact(self, now):
+        # Retention is applied at most hourly; each pass rewrites the store
+        if now - self._last_compacted < 3600 or not self.store.rows:
+            return 0
+        self._last_compacted = now
+        cutoff = now - self.retention
+        dropped = self.store.compact(lambda store: store.read("fetched_at") >= cutoff)
+        if dropped:
+            logger.info("Dropped %d snapshot rows older than %.0f hours", dropped,
+                        self.retention / 3600)
+        return dropped
+
+    async def run_cycle(self):
+        """
+        Fetch, classify and store one snapshot of every region.
+
+        Returns:
+            dict: Per-cycle counts and timings (also kept as `last_cycle`).
+        """
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        responses = await asyncio.gather(
+            *(self._fetch(region, semaphore) for region in self.regions)
+        )
+        fetch_seconds = time.perf_counter() - started
+        # Never earlier than the last stored row, even if the clock steps
+        # back: readers binary-search fetched_at
+        last = self.store.read("fetched_at", -1)
+        fetched_at = max(time.time(), float(last[0]) if len(last) else 0.0)
+
+        rows = []
+        for position, data in enumerate(responses):
+            if data is None:
+                continue
+            try:
+                rows.append((position, data, extract_weather_fields(data)))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(
+                    "Unexpected weather response for %s: %s", self.regions[position]["name"], e
+                )
+        self.fetched += len(rows)
+        self.failed += len(self.regions) - len(rows)
+        self.cycles += 1
+        self.last_cycle = {
+            "at": fetched_at,
+            "regions": len(self.regions),
+            "fetched": len(rows),
+            "fetch_seconds": round(fetch_seconds, 3),
+        }
+
+        if rows:
+            stored = await asyncio.to_thread(self._classify, rows, fetched_at)
+        else:
+            stored = 0
+        await asyncio.to_thread(self._compact, fetched_at)
+        self.last_cycle.update(
+            stored=stored, total_seconds=round(time.perf_counter() - started, 3)
+        )
+        logger.info(
+            "Ingested %d/%d regions in %.2fs", stored, len(self.regions),
+            self.last_cycle["total_seconds"],
+        )
+        return self.last_cycle
+
+    async def run(self, interval, cycles=None):
+        """
+        Run a cycle every `interval` seconds (measured start to start), for
+        `cycles` cycles or until cancelled.
+        """
+        count = 0
+        while cycles is None or count < cycles:
+            started = time.monotonic()
+            try:
+                await self.run_cycle()
+            except Exception:
+                logger.exception("Ingestion cycle failed")
+            count += 1
+            if cycles is None or count < cycles:
+                await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def stats(self):
+        return {
+            "cycles": self.cycles,
+            "requests": self.requests,
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "last_cycle": self.last_cycle,
+        }
+
+
+class MonitoredRegions:
+    """
+    Request-side view of the ingested time series: the latest snapshot of
+    the monitored region nearest a point, when one is within `match_km` and
+    was fetched less than `max_age` seconds ago.
+
+    The store is reopened lazily (ingestion may start after the app) and
+    its manifest checked at most every `refresh_interval` seconds, by
+    whichever request comes first; requests arriving while it rebuilds
+    keep using the previous snapshots instead of waiting.
+    """
+
+    def __init__(self, store_path=DEFAULT_STORE_PATH, max_age=900.0, match_km=10.0,
+                 refresh_interval=5.0):
+        self.store_path = store_path
+        self.max_age = max_age
+        self.match_km = match_km
+        self.refresh_interval = refresh_interval
+        self.store = None
+        # (regions, tree, latest snapshot per region), replaced as a whole
+        # so lock-free readers always see one consistent build
+        self._state = ([], None, {})
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.getenv("INGEST_STORE_PATH", DEFAULT_STORE_PATH),
+            max_age=float(os.getenv("MONITORED_MAX_AGE", "900")),
+            match_km=float(os.getenv("MONITORED_MATCH_KM", "10")),
+            refresh_interval=float(os.getenv("MONITORED_REFRESH_INTERVAL", "5")),
+        )
+
+    @property
+    def regions(self):
+        return self._state[0]
+
+    def refresh(self, force=False):
+        """
+        Pick up rows committed since the last check. Returns whether the
+        snapshots were rebuilt.
+        """
+        now = time.monotonic()
+        checked_at = self._checked_at
+        if not force and checked_at is not None and now - checked_at < self.refresh_interval:
+            return False
+        if not self._lock.acquire(blocking=force):
+            return False
+        try:
+            self._checked_at = now
+            if self.store is None:
+                if not os.path.exists(os.path.join(self.store_path, MANIFEST_FILE)):
+                    return False
+                self.store = ColumnStore(self.store_path)
+            elif not self.store.refresh():
+                return False
+            self._state = self._rebuild()
+            return True
+        finally:
+            self._lock.release()
+
+    def _rebuild(self):
+        from sklearn.neighbors import BallTree
+
+        store = self.store
+        regions = store.attrs.get("regions", [])
+        tree = (
+            BallTree(
+                np.radians([[region["lat"], region["lon"]] for region in regions]),
+                metric="haversine",
+            )
+            if regions
+            else None
+        )
+        start = max(0, store.rows - len(regions) * TAIL_CYCLES)
+        latest = {}
+        for offset, region in reversed(list(enumerate(store.read("region", start).tolist()))):
+            latest.setdefault(region, start + offset)
+        snapshots = {region: self._snapshot(regions, row) for region, row in latest.items()}
+        return regions, tree, snapshots
+
+    def _snapshot(self, regions, row):
+        attrs = self.store.attrs
+        values = {name: column[0] for name, column in self.store.read_rows(row, row + 1).items()}
+        region = regions[int(values["region"])]
+        temperature = float(values["temperature"])
+        prediction = int(values["prediction"])
+        return {
+            "region": region["name"],
+            "region_lat": region["lat"],
+            "region_lng": region["lon"],
+            "fetched_at": float(values["fetched_at"]),
+            "observed_at": int(values["observed_at"]),
+            **local_time_fields(int(values["observed_at"]), int(values["timezone_offset"])),
+            "is_day": bool(values["is_day"]),
+            "temperature": None if np.isnan(temperature) else temperature,
+            "description": attrs["descriptions"][int(values["description"])],
+            "wind_speed": float(values["wind_speed"]),
+            "sea_level_pressure": float(values["sea_level_pressure"]),
+            # The region centre's distance, which the model was given
+            "region_distance_to_land": region["distance_to_land"],
+            "prediction": prediction,
+            "status": describe_prediction(prediction),
+            "probabilities": {
+                str(c): round(float(p), 6)
+                for c, p in zip(attrs["classes"], values["probabilities"])
+            },
+            "model_version": attrs["model_versions"][int(values["model_version"])],
+        }
+
+    def nearest(self, lat, lon, tree=None):
+        # Index of the closest monitored region within match_km, or None
+        tree = self._state[1] if tree is None else tree
+        if tree is None:
+            return None
+        angles, indices = tree.query(np.radians([[lat, lon]]), k=1)
+        if angles[0, 0] * EARTH_RADIUS_KM > self.match_km:
+            return None
+        return int(indices[0, 0])
+
+    def lookup(self, lat, lon):
+        """
+        The fresh snapshot covering (lat, lon), or None to fetch live.
+        """
+        self.refresh()
+        _, tree, latest = self._state
+        region = self.nearest(lat, lon, tree)
+        snapshot = latest.get(region) if region is not None else None
+        if snapshot is None:
+            return None
+        age = time.time() - snapshot["fetched_at"]
+        if age > self.max_age:
+            self.stale += 1
+            return None
+        self.hits += 1
+        return dict(snapshot, age_seconds=round(age, 1))
+
+    def latest(self):
+        self.refresh()
+        now = time.time()
+        return [
+            dict(
+                snapshot,
+                age_seconds=round(now - snapshot["fetched_at"], 1),
+                fresh=now - snapshot["fetched_at"] <= self.max_age,
+            )
+            for snapshot in self._state[2].values()
+        ]
+
+    def history(self, name, since):
+        """
+        Stored observations of one region fetched at or after `since`.
+
+        fetched_at never decreases, so only the tail of the store from the
+        first row at or after `since` is read.
+
+        Returns:
+            dict: Column lists (fetched_at, observed_at, wind_speed,
+            sea_level_pressure, prediction, confidence), or None for an
+            unknown region.
+        """
+        self.refresh()
+        names = [region["name"] for region in self.regions]
+        if name not in names:
+            return None
+        store = self.store
+        stop = store.rows
+        start = int(np.searchsorted(store.read("fetched_at", 0, stop), since, side="left"))
+        rows = np.flatnonzero(store.read("region", start, stop) == names.index(name))
+        columns = ("fetched_at", "observed_at", "wind_speed", "sea_level_pressure", "prediction")
+        history = {column: store.read(column, start, stop)[rows].tolist() for column in columns}
+        history["confidence"] = (
+            store.read("probabilities", start, stop)[rows]
+            .max(axis=1).astype(np.float64).round(6).tolist()
+        )
+        return history
+
+    def stats(self):
+        self.refresh()
+        return {
+            "store": self.store.describe() if self.store is not None else None,
+            "ingest": self.store.attrs.get("ingest") if self.store is not None else None,
+            "regions": len(self.regions),
+            "max_age_seconds": self.max_age,
+            "match_km": self.match_km,
+            "hits": self.hits,
+            "stale": self.stale,
+        }
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(
+        description="Poll OpenWeather for monitored regions and store classified snapshots."
+    )
+    parser.add_argument("--regions", default=os.getenv("INGEST_REGIONS_PATH", DEFAULT_REGIONS_PATH))
+    parser.add_argument("--store", default=os.getenv("INGEST_STORE_PATH", DEFAULT_STORE_PATH))
+    parser.add_argument("--interval", type=float,
+                        default=float(os.getenv("INGEST_INTERVAL", "600")),
+                        help="Seconds between cycles")
+    parser.add_argument("--concurrency", type=int,
+                        default=int(os.getenv("INGEST_CONCURRENCY", "8")))
+    parser.add_argument("--rate", type=float, default=float(os.getenv("INGEST_RATE", "1")),
+                        help="Upstream requests per second (OpenWeather free tier: 60/min)")
+    parser.add_argument("--retention-hours", type=float,
+                        default=float(os.getenv("INGEST_RETENTION_HOURS", "72")))
+    parser.add_argument("--once", action="store_true", help="Run a single cycle and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    # Same artifacts as the app; promotions in the registry are picked up
+    # at the start of each cycle
+    bundle = load_active_bundle(
+        os.getenv("MODEL_REGISTRY_PATH", DEFAULT_REGISTRY_PATH),
+        fast_preprocess=os.getenv("FAST_PREPROCESS", "1") == "1",
+        compact_forest_path=os.getenv("COMPACT_FOREST_PATH", "Models/forest4"),
+    )
+    current = {"bundle": bundle}
+    registry = ModelRegistry(
+        os.getenv("MODEL_REGISTRY_PATH", DEFAULT_REGISTRY_PATH),
+        fast_preprocess=os.getenv("FAST_PREPROCESS", "1") == "1",
+    )
+
+    def get_bundle():
+        version = registry.current_version() if registry.exists() else None
+        if version and version != current["bundle"].version:
+            try:
+                current["bundle"] = registry.load(version).warm_up()
+                logger.info("Classifying with model version %s", version)
+            except Exception:
+                logger.exception("Keeping model version %s", current["bundle"].version)
+        return current["bundle"]
+
+    regions = load_regions(args.regions)
+    store = ColumnStore.create(
+        args.store, snapshot_columns(len(bundle.model.classes_)),
+        attrs={"classes": [int(c) for c in bundle.model.classes_]},
+    )
+    ingestor = WeatherIngestor(
+        regions,
+        store,
+        get_bundle,
+        region_distances(
+            regions,
+            os.getenv("DISTANCE_RASTER_PATH", DEFAULT_RASTER_PATH),
+            os.getenv("COASTLINE_PATH", DEFAULT_COASTLINE_PATH),
+        ),
+        os.getenv("openweather_api_key"),
+        base_url=os.getenv("OPENWEATHER_URL", OPENWEATHER_URL),
+        concurrency=args.concurrency,
+        rate=args.rate,
+        timeout=float(os.getenv("WEATHER_TIMEOUT", "10")),
+        retention=args.retention_hours * 3600,
+    )
+    try:
+        asyncio.run(ingestor.run(args.interval, cycles=1 if args.once else None))
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(dict(ingestor.stats(), store=store.describe()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# metrics.py
+
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Exported `le` bucket bounds in seconds for the Prometheus histograms.
+EXPORT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+EXPORT_QUANTILES = (0.5, 0.95, 0.99)
+
+# Values are recorded in microseconds; below 2**SUB_BUCKET_BITS each value
+# has its own bucket, above it every power of two is split into
+# 2**(SUB_BUCKET_BITS - 1) buckets (~3% relative error for 6 bits).
+SUB_BUCKET_BITS = 6
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_HALF_BUCKETS = _SUB_BUCKETS >> 1
+# Longest value tracked exactly; larger ones land in the last bucket
+MAX_TRACKABLE_US = 3600 * 1000000
+
+
+def bucket_index(value):
+    if value < _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return _SUB_BUCKETS + (shift - 1) * _HALF_BUCKETS + ((value >> shift) - _HALF_BUCKETS)
+
+
+def bucket_upper(index):
+    """Largest value (microseconds) counted in a bucket."""
+    if index < _SUB_BUCKETS:
+        return index
+    shift = (index - _SUB_BUCKETS) // _HALF_BUCKETS + 1
+    mantissa = (index - _SUB_BUCKETS) % _HALF_BUCKETS + _HALF_BUCKETS
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram with log-linear buckets.
+
+    Recording is a constant-time bucket increment, memory is fixed (about
+    a thousand counters up to an hour) and quantiles are accurate to the
+    bucket width, however many values are recorded.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (bucket_index(MAX_TRACKABLE_US) + 1)
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        index = bucket_index(min(max(int(seconds * 1e6), 0), MAX_TRACKABLE_US))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_seconds += seconds
+            if seconds > self.max_seconds:
+                self.max_seconds = seconds
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.total_seconds, self.max_seconds
+
+    @staticmethod
+    def quantiles(counts, count, quantiles=EXPORT_QUANTILES):
+        """
+        Upper bound (seconds) of the bucket holding each quantile.
+        """
+        if not count:
+            return {q: 0.0 for q in quantiles}
+        ranks = sorted((max(1, int(round(q * count))), q) for q in quantiles)
+        result = {}
+        seen = 0
+        position = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            while position < len(ranks) and seen >= ranks[position][0]:
+                result[ranks[position][1]] = bucket_upper(index) / 1e6
+                position += 1
+            if position == len(ranks):
+                break
+        return result
+
+    @staticmethod
+    def cumulative(counts, bounds=EXPORT_BUCKETS):
+        """
+        Cumulative counts at each export bound, to within the bucket width.
+        """
+        limits = [bucket_index(int(bound * 1e6)) for bound in bounds]
+        result = []
+        seen = 0
+        start = 0
+        for limit in limits:
+            seen += sum(counts[start:limit + 1])
+            start = limit + 1
+            result.append(seen)
+        return result
+
+
+# (route, sampled) for the request being handled in this context
+_current_request = contextvars.ContextVar("metrics_request", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+class MetricsRegistry:
+    """
+    Per-process request counters and per-stage latency histograms,
+    rendered in the Prometheus text exposition format.
+
+    Every request's total latency is recorded; stage timings are taken for
+    a `sample_rate` fraction of requests so the hot path stays cheap.
+    """
+
+    def __init__(self, sample_rate=1.0, prefix="prehurricane"):
+        self.sample_rate = sample_rate
+        self.prefix = prefix
+        self.histograms = {}
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    def sampled(self):
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def histogram(self, route, stage):
+        key = (route, stage)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def observe(self, route, stage, seconds):
+        self.histogram(route, stage).record(seconds)
+
+    def count_request(self, route, method, status):
+        key = (route, method, status)
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def begin_request(self, route):
+        _current_request.set((route, self.sampled()))
+
+    def end_request(self, route, method, status, seconds):
+        self.observe(route, "request", seconds)
+        self.count_request(route, method, status)
+        _current_request.set(None)
+
+    @contextmanager
+    def stage(self, name, route=None):
+        """
+        Time a block as stage `name` of the current request, or of `route`
+        for work outside a request (background workers, sampled the same way).
+        """
+        if route is None:
+            current = _current_request.get()
+            if current is None or not current[1]:
+                yield
+                return
+            route = current[0]
+        elif not self.sampled():
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(route, name, time.perf_counter() - started)
+
+    def render(self):
+        prefix = self.prefix
+        lines = [
+            f"# HELP {prefix}_requests_total Requests handled by this worker.",
+            f"# TYPE {prefix}_requests_total counter",
+        ]
+        with self._lock:
+            requests = sorted(self.requests.items())
+            histograms = sorted(self.histograms.items())
+        for (route, method, status), count in requests:
+            lines.append(
+                f"{prefix}_requests_total{{{_labels(route=route, method=method, status=status)}}} "
+                f"{count}"
+            )
+
+        snapshots = [(key, histogram.snapshot()) for key, histogram in histograms]
+        lines += [
+            f"# HELP {prefix}_stage_duration_seconds Latency per route and stage "
+            f"(stage=\"request\" is the whole request).",
+            f"# TYPE {prefix}_stage_duration_seconds histogram",
+        ]
+        for (route, stage), (counts, count, total, _) in snapshots:
+            labels = _labels(route=route, stage=stage)
+            for bound, cumulative in zip(EXPORT_BUCKETS, LatencyHistogram.cumulative(counts)):
+                lines.append(
+                    f'{prefix}_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{prefix}_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{prefix}_stage_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{prefix}_stage_duration_seconds_count{{{labels}}} {count}")
+
+        lines += [
+            f"# HELP {prefix}_stage_duration_quantile_seconds Latency quantiles from the "
+            f"HDR histograms since start.",
+            f"# TYPE {prefix}_stage_duration_quantile_seconds gauge",
+        ]
+        for (route, stage), (counts, count, _, max_seconds) in snapshots:
+            labels = _labels(route=route, stage=stage)
+            for q, value in sorted(LatencyHistogram.quantiles(counts, count).items()):
+                lines.append(
+                    f'{prefix}_stage_duration_quantile_seconds{{{labels},quantile="{q}"}} '
+                    f"{min(value, max_seconds):.6f}"
+                )
+            lines.append(
+                f'{prefix}_stage_duration_quantile_seconds{{{labels},quantile="1"}} '
+                f"{max_seconds:.6f}"
+            )
+
+        lines += [
+            f"# HELP {prefix}_stage_sample_rate Fraction of requests with stage timings.",
+            f"# TYPE {prefix}_stage_sample_rate gauge",
+            f"{prefix}_stage_sample_rate {self.sample_rate}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry; create_app() sets its sample rate
+registry = MetricsRegistry()
+stage = registry.stage
@@ -0,0 +1,527 @@
+# model_registry.py
+#
+# Versioned model artifacts with manifests, loaded and swapped in by each
+# worker without a restart.
+#
+#   Models/registry/
+#       CURRENT              <- name of the live version
+#       SHADOW               <- optional candidate scored alongside it
+#       v5/manifest.json
+#       v5/model.pkl         (or v5/forest/ from scripts/compile_forest.py)
+#       v5/preprocessor.pkl
+#
+#   python -m utils.model_registry publish v5 --model new_model.pkl \
+#       --preprocessor new_preprocessor.pkl
+#   python -m utils.model_registry shadow v5      # score v5 on sampled traffic
+#   python -m utils.model_registry promote v5     # make v5 live
+#   python -m utils.model_registry list
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from utils.feature_pipeline import compile_preprocessor
+from utils.forest import METADATA_FILE as FOREST_METADATA_FILE, CompactForest
+from utils.metrics import LatencyHistogram
+from utils.prediction import FEATURE_COLUMNS, predict_features
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+SHADOW_FILE = "SHADOW"
+DEFAULT_REGISTRY_PATH = "Models/registry"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_fingerprint(paths):
+    """
+    Digest of the size and modification time of every model artifact
+    (files, or every file inside a directory such as a compiled forest).
+    """
+    digest = hashlib.sha1()
+    for path in sorted(paths):
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, name) for name in os.listdir(path))
+        else:
+            files = [path]
+        for name in files:
+            try:
+                stat = os.stat(name)
+            except OSError:
+                continue
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+def artifact_files(directory, names):
+    """
+    Relative paths of every file making up the named artifacts (a compiled
+    forest is a directory of arrays).
+    """
+    files = []
+    for name in names:
+        path = os.path.join(directory, name)
+        if os.path.isdir(path):
+            files += sorted(os.path.join(name, child) for child in os.listdir(path))
+        else:
+            files.append(name)
+    return files
+
+
+class ModelBundle:
+    """
+    A model and the preprocessor it was trained with, loaded together.
+
+    Requests take one reference to the active bundle and use it
+    throughout, so a swap never mixes a new model with an old preprocessor.
+    """
+
+    def __init__(self, version, model, preprocessor, paths, manifest=None):
+        self.version = version
+        self.model = model
+        self.preprocessor = preprocessor
+        self.paths = list(paths)
+        self.manifest = manifest or {}
+        self.loaded_at = time.time()
+        # Identifies what was loaded, not what is on disk now: the manifest's
+        # content digests for registry versions, the files' size and mtime
+        # at load time otherwise
+        if self.manifest.get("sha256"):
+            digest = hashlib.sha1(json.dumps(self.manifest["sha256"], sort_keys=True).encode())
+            self.fingerprint = digest.hexdigest()[:16]
+        else:
+            self.fingerprint = artifact_fingerprint(self.paths)
+
+    def warm_up(self):
+        # First predict_proba call pays for lazy allocations; do it off the
+        # request path before the bundle goes live
+        predict_features(self.model, self.preprocessor, np.zeros((1, len(FEATURE_COLUMNS))))
+        return self
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "fingerprint": self.fingerprint,
+            "paths": self.paths,
+            "loaded_at": self.loaded_at,
+            "created_at": self.manifest.get("created_at"),
+            "notes": self.manifest.get("notes"),
+        }
+
+
+class ModelRegistry:
+    def __init__(self, root=DEFAULT_REGISTRY_PATH, fast_preprocess=True):
+        self.root = root
+        # Swap each version's ColumnTransformer for its verified NumPy compilation
+        self.fast_preprocess = fast_preprocess
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.root, CURRENT_FILE))
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, MANIFEST_FILE))
+        )
+
+    def _read_pointer(self, name):
+        try:
+            with open(os.path.join(self.root, name)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _write_pointer(self, name, version):
+        path = os.path.join(self.root, name)
+        if version is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version {version!r}")
+        # Write-then-rename so workers never read a half-written pointer
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp_path, path)
+
+    def current_version(self):
+        return self._read_pointer(CURRENT_FILE)
+
+    def shadow_version(self):
+        return self._read_pointer(SHADOW_FILE)
+
+    def promote(self, version):
+        self._write_pointer(CURRENT_FILE, version)
+
+    def set_shadow(self, version):
+        self._write_pointer(SHADOW_FILE, version)
+
+    def manifest(self, version):
+        with open(os.path.join(self.root, version, MANIFEST_FILE)) as f:
+            return json.load(f)
+
+    def load(self, version, verify=True):
+        """
+        Load a version's model and preprocessor, checking every file against
+        the manifest's SHA-256 digests first.
+
+        Raises:
+            ValueError: If a file is missing or doesn't match the manifest.
+        """
+        directory = os.path.join(self.root, version)
+        manifest = self.manifest(version)
+        if verify:
+            for name, expected in manifest["sha256"].items():
+                path = os.path.join(directory, name)
+                if not os.path.exists(path) or file_sha256(path) != expected:
+                    raise ValueError(f"Model version {version}: {name} does not match manifest")
+
+        if manifest.get("forest"):
+            model_path = os.path.join(directory, manifest["forest"])
+            model = CompactForest.load(model_path)
+        else:
+            model_path = os.path.join(directory, manifest["model"])
+            model = joblib.load(model_path)
+        preprocessor_path = os.path.join(directory, manifest["preprocessor"])
+        preprocessor = joblib.load(preprocessor_path)
+        if self.fast_preprocess:
+            preprocessor = compile_preprocessor(preprocessor)
+        return ModelBundle(version, model, preprocessor, [model_path, preprocessor_path], manifest)
+
+    def publish(self, version, preprocessor_path, model_path=None, forest_path=None, notes=""):
+        """
+        Copy artifacts into a new version directory and write its manifest.
+        """
+        if (model_path is None) == (forest_path is None):
+            raise ValueError("Publish exactly one of a model pickle or a compiled forest")
+        directory = os.path.join(self.root, version)
+        if os.path.exists(directory):
+            raise ValueError(f"Model version {version!r} already exists")
+        os.makedirs(directory)
+
+        manifest = {"version": version, "preprocessor": "preprocessor.pkl"}
+        shutil.copy2(preprocessor_path, os.path.join(directory, "preprocessor.pkl"))
+        if forest_path is not None:
+            if not os.path.exists(os.path.join(forest_path, FOREST_METADATA_FILE)):
+                raise ValueError(f"{forest_path} is not a compiled forest")
+            shutil.copytree(forest_path, os.path.join(directory, "forest"))
+            manifest["forest"] = "forest"
+        else:
+            shutil.copy2(model_path, os.path.join(directory, "model.pkl"))
+            manifest["model"] = "model.pkl"
+
+        names = [manifest.get("forest") or manifest["model"], manifest["preprocessor"]]
+        manifest.update(
+            {
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "features": FEATURE_COLUMNS,
+                "notes": notes,
+                "sha256": {
+                    name: file_sha256(os.path.join(directory, name))
+                    for name in artifact_files(directory, names)
+                },
+            }
+        )
+        # The manifest is written last; versions without one are ignored
+        with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+
+def load_active_bundle(registry_root=DEFAULT_REGISTRY_PATH, fast_preprocess=True,
+                       compact_forest_path="Models/forest4",
+                       model_path="Models/best_random_forest_model4.pkl",
+                       preprocessor_path="Models/preprocessor4.pkl", version=None):
+    """
+    The live bundle: the registry's CURRENT version (or `version`, when
+    given) when a registry has been set up, otherwise the unversioned
+    artifacts as "legacy-<fingerprint>", so replacing them on disk gives
+    them a new version too.
+
+    Prefers the compiled forest (scripts/compile_forest.py) over the joblib
+    pickle: its node arrays are memory-mapped and shared by all workers.
+    """
+    registry = ModelRegistry(registry_root, fast_preprocess=fast_preprocess)
+    if registry.exists():
+        return registry.load(version or registry.current_version())
+
+    if os.path.exists(os.path.join(compact_forest_path, FOREST_METADATA_FILE)):
+        model = CompactForest.load(compact_forest_path)
+        model_path = compact_forest_path
+    else:
+        model = joblib.load(model_path)
+    preprocessor = joblib.load(preprocessor_path)
+    if fast_preprocess:
+        preprocessor = compile_preprocessor(preprocessor)
+    paths = [model_path, preprocessor_path]
+    return ModelBundle(f"legacy-{artifact_fingerprint(paths)}", model, preprocessor, paths)
+
+
+class ShadowScorer:
+    """
+    Scores a sampled fraction of live traffic with a candidate bundle on a
+    background thread and compares it with the live predictions.
+
+    Comparisons are queued without blocking; when the queue is full the
+    sample is dropped, so a slow candidate never adds request latency.
+    """
+
+    def __init__(self, bundle, sample_rate=0.1, max_queue=256):
+        self.bundle = bundle
+        self.sample_rate = sample_rate
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.live_latency = LatencyHistogram()
+        self.candidate_latency = LatencyHistogram()
+        self.compared_rows = 0
+        self.agreed_rows = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="model-shadow", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, features, live_predictions, live_seconds):
+        if random.random() >= self.sample_rate:
+            return
+        self.ensure_started()
+        try:
+            self._queue.put_nowait((np.array(features), live_predictions, live_seconds))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _run(self):
+        while True:
+            features, live_predictions, live_seconds = self._queue.get()
+            try:
+                started = time.perf_counter()
+                predictions, _ = predict_features(
+                    self.bundle.model, self.bundle.preprocessor, features
+                )
+                elapsed = time.perf_counter() - started
+                agreed = int(np.sum(predictions == live_predictions))
+                with self._lock:
+                    self.compared_rows += len(predictions)
+                    self.agreed_rows += agreed
+                self.live_latency.record(live_seconds)
+                self.candidate_latency.record(elapsed)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.warning("Shadow scoring with %s failed: %s", self.bundle.version, e)
+
+    def stats(self):
+        def latency(histogram):
+            counts, count, total, max_seconds = histogram.snapshot()
+            quantiles = LatencyHistogram.quantiles(counts, count)
+            return {
+                "calls": count,
+                "avg_ms": 1000 * total / count if count else 0.0,
+                "p50_ms": 1000 * min(quantiles[0.5], max_seconds),
+                "p95_ms": 1000 * min(quantiles[0.95], max_seconds),
+                "p99_ms": 1000 * min(quantiles[0.99], max_seconds),
+            }
+
+        with self._lock:
+            compared, agreed = self.compared_rows, self.agreed_rows
+            dropped, errors = self.dropped, self.errors
+        return {
+            "candidate": self.bundle.version,
+            "sample_rate": self.sample_rate,
+            "compared_rows": compared,
+            "agreement_rate": agreed / compared if compared else None,
+            "dropped": dropped,
+            "errors": errors,
+            "live_latency": latency(self.live_latency),
+            "candidate_latency": latency(self.candidate_latency),
+        }
+
+
+class ModelReloader:
+    """
+    Polls the registry's CURRENT and SHADOW pointers and, when either
+    changes, loads the new version on this background thread and hands it
+    to `on_activate` / `on_shadow`. Swapping is a reference assignment in
+    the callback, so in-flight requests finish on the bundle they started
+    with and nothing is dropped.
+
+    A version that fails to load is not retried until its pointer moves or
+    its files change, and CURRENT and SHADOW are handled independently, so
+    a broken CURRENT doesn't hold up shadow updates.
+    """
+
+    def __init__(self, registry, on_activate, on_shadow, active_version=None,
+                 poll_interval=10.0):
+        self.registry = registry
+        self.on_activate = on_activate
+        self.on_shadow = on_shadow
+        self.active_version = active_version
+        self.shadow_version = None
+        self.poll_interval = poll_interval
+        self.swaps = 0
+        self.failures = 0
+        self.last_error = None
+        # role -> (version, file stamp) of the last version that failed to load
+        self._failed = {}
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def ensure_started(self):
+        # Called per request: with preload_app the thread started in the
+        # master doesn't survive the fork, so each worker starts its own
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="model-reloader", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.check_once()
+            except Exception as e:
+                logger.exception("Error polling model registry: %s", e)
+            time.sleep(self.poll_interval)
+
+    def check_once(self):
+        current = self.registry.current_version()
+        if current and current != self.active_version:
+            if self._load("current", current, self.on_activate):
+                self.active_version = current
+                self.swaps += 1
+
+        shadow = self.registry.shadow_version()
+        if shadow == current:
+            shadow = None
+        if shadow != self.shadow_version:
+            if shadow is None:
+                self.on_shadow(None)
+                self.shadow_version = None
+            elif self._load("shadow", shadow, self.on_shadow):
+                self.shadow_version = shadow
+
+    def _stamp(self, version):
+        # Modification times of every file in the version, so replacing a
+        # broken artifact (or its manifest) makes the version worth retrying
+        directory = os.path.join(self.registry.root, version)
+        stamp = []
+        for parent, _, names in os.walk(directory):
+            for name in names:
+                path = os.path.join(parent, name)
+                stamp.append((path, os.stat(path).st_mtime_ns))
+        return tuple(sorted(stamp))
+
+    def _load(self, role, version, callback):
+        # Returns whether `version` was loaded and handed to `callback`
+        try:
+            key = (version, self._stamp(version))
+        except OSError:
+            key = (version, None)
+        if self._failed.get(role) == key:
+            return False
+
+        started = time.perf_counter()
+        try:
+            bundle = self.registry.load(version).warm_up()
+            callback(bundle)
+        except Exception as e:
+            self._failed[role] = key
+            self.failures += 1
+            self.last_error = f"{version}: {e}"
+            logger.error("Could not load model version %s as %s: %s", version, role, e)
+            return False
+        self._failed.pop(role, None)
+        logger.info("Loaded model version %s in %.2fs", version, time.perf_counter() - started)
+        return True
+
+    def stats(self):
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "active_version": self.active_version,
+            "shadow_version": self.shadow_version,
+            "swaps": self.swaps,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage versioned model artifacts.")
+    parser.add_argument("--root", default=os.getenv("MODEL_REGISTRY_PATH", DEFAULT_REGISTRY_PATH))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    publish = commands.add_parser("publish", help="Add a new version")
+    publish.add_argument("version")
+    publish.add_argument("--preprocessor", required=True)
+    artifact = publish.add_mutually_exclusive_group(required=True)
+    artifact.add_argument("--model", help="Model pickle")
+    artifact.add_argument("--forest", help="Compiled forest directory")
+    publish.add_argument("--notes", default="")
+
+    promote = commands.add_parser("promote", help="Make a version live")
+    promote.add_argument("version")
+    shadow = commands.add_parser("shadow", help="Shadow-score a version ('none' to stop)")
+    shadow.add_argument("version")
+    commands.add_parser("list", help="List versions")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == "publish":
+        manifest = registry.publish(
+            args.version, args.preprocessor, model_path=args.model, forest_path=args.forest,
+            notes=args.notes,
+        )
+        print(json.dumps(manifest, indent=2))
+    elif args.command == "promote":
+        # Check the version actually loads before pointing workers at it
+        registry.load(args.version).warm_up()
+        registry.promote(args.version)
+        print(f"Promoted {args.version}")
+    elif args.command == "shadow":
+        version = None if args.version.lower() == "none" else args.version
+        if version is not None:
+            registry.load(version).warm_up()
+        registry.set_shadow(version)
+        print(f"Shadow version: {version}")
+    else:
+        current, shadow = registry.current_version(), registry.shadow_version()
+        for version in registry.versions():
+            marks = [label for label, name in (("live", current), ("shadow", shadow))
+                     if name == version]
+            print(f"{version}\t{','.join(marks)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# outbox.py
+
+import logging
+import threading
+import time
+
+from utils.db import register_schema
+from utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between polls while draining keeps failing (e.g. the
+# database is down), so a dead dependency costs one log line per interval.
+MAX_ERROR_BACKOFF = 300.0
+
+OUTBOX_DDL = {
+    "mysql": [
+        """
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            recipient VARCHAR(255) NOT NULL,
+            subject VARCHAR(255) NOT NULL,
+            body TEXT NOT NULL,
+            attempts INT NOT NULL DEFAULT 0,
+            next_attempt_at DOUBLE NOT NULL,
+            last_error TEXT,
+            INDEX idx_email_outbox_next_attempt (next_attempt_at)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS email_dead_letter (
+            id BIGINT PRIMARY KEY,
+            recipient VARCHAR(255) NOT NULL,
+            subject VARCHAR(255) NOT NULL,
+            body TEXT NOT NULL,
+            attempts INT NOT NULL,
+            last_error TEXT,
+            failed_at DOUBLE NOT NULL
+        )
+        """,
+    ],
+    "sqlite": [
+        """
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_error TEXT
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_email_outbox_next_attempt
+            ON email_outbox (next_attempt_at)
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS email_dead_letter (
+            id INTEGER PRIMARY KEY,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            last_error TEXT,
+            failed_at REAL NOT NULL
+        )
+        """,
+    ],
+}
+
+
+register_schema(OUTBOX_DDL)
+
+
+def enqueue_email(cursor, pool, recipient, subject, body):
+    """
+    Queue an email in the outbox using the caller's cursor, so it commits
+    (or rolls back) together with the caller's own writes.
+    """
+    cursor.execute(
+        pool.sql(
+            "INSERT INTO email_outbox (recipient, subject, body, attempts, next_attempt_at) "
+            "VALUES (%s, %s, %s, 0, %s)"
+        ),
+        (recipient, subject, body, time.time()),
+    )
+
+
+class OutboxWorker:
+    """
+    Background thread that drains `email_outbox` over one SMTP connection
+    per batch.
+
+    A row is claimed by bumping its `attempts` counter (compare-and-set on
+    the old value) and pushing `next_attempt_at` out by `lease` seconds, so
+    several gunicorn workers can poll the same table without sending twice
+    and rows claimed by a crashed worker become due again. Failed sends are
+    retried with exponential backoff; after `max_attempts` the row moves to
+    `email_dead_letter`. While polling itself fails the worker backs off
+    too, logging the first traceback and then one line per attempt.
+    """
+
+    def __init__(self, pool_factory, app, sender=None, batch_size=50,
+                 poll_interval=5.0, max_attempts=5, backoff=30.0, lease=300.0):
+        self.pool_factory = pool_factory
+        self.app = app
+        self._mail = None
+        self.sender = sender
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lease = lease
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.dead_lettered = 0
+        self.poll_errors = 0
+        self.last_error = None
+
+    @property
+    def mail(self):
+        # Flask-Mail is only imported once there is something to send
+        if self._mail is None:
+            from flask_mail import Mail
+
+            self._mail = Mail(self.app)
+        return self._mail
+
+    def ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="email-outbox", daemon=True
+                )
+                self._thread.start()
+
+    def notify(self):
+        """Wake the worker so freshly committed rows go out promptly."""
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                # Keep draining while full batches come back
+                while self.drain_once() == self.batch_size:
+                    pass
+            except Exception as e:
+                failures += 1
+                self.poll_errors += 1
+                self.last_error = str(e)
+                if failures == 1:
+                    logger.exception("Error draining email outbox: %s", e)
+                else:
+                    logger.warning(
+                        "Email outbox still failing after %d attempts: %s", failures, e
+                    )
+            else:
+                if failures:
+                    logger.info("Email outbox recovered after %d failed attempts", failures)
+                failures = 0
+            delay = self.poll_interval
+            if failures:
+                delay = min(self.poll_interval * 2 ** failures, MAX_ERROR_BACKOFF)
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def _claim(self, pool, connection):
+        now = time.time()
+        cursor = connection.cursor()
+        cursor.execute(
+            pool.sql(
+                "SELECT id, recipient, subject, body, attempts FROM email_outbox "
+                "WHERE next_attempt_at <= %s ORDER BY next_attempt_at, id LIMIT %s"
+            ),
+            (now, self.batch_size),
+        )
+        candidates = cursor.fetchall()
+
+        claimed = []
+        for row in candidates:
+            cursor.execute(
+                pool.sql(
+                    "UPDATE email_outbox SET attempts = attempts + 1, next_attempt_at = %s "
+                    "WHERE id = %s AND attempts = %s"
+                ),
+                (now + self.lease, row[0], row[4]),
+            )
+            if cursor.rowcount == 1:
+                claimed.append(row[:4] + (row[4] + 1,))
+        connection.commit()
+        cursor.close()
+        return claimed
+
+    def drain_once(self):
+        """
+        Claim and send one batch. Returns the number of rows claimed.
+        """
+        from flask_mail import Message
+
+        pool = self.pool_factory()
+        with stage("db_claim", route="outbox"), pool.connection() as connection:
+            claimed = self._claim(pool, connection)
+        if not claimed:
+            return 0
+
+        results = []
+        with self.app.app_context(), stage("smtp", route="outbox"):
+            try:
+                with self.mail.connect() as smtp:
+                    for row_id, recipient, subject, body, attempts in claimed:
+                        try:
+                            smtp.send(
+                                Message(
+                                    subject=subject,
+                                    sender=self.sender,
+                                    recipients=[recipient],
+                                    body=body,
+                                )
+                            )
+                            results.append((row_id, attempts, None))
+                        except Exception as e:
+                            results.append((row_id, attempts, str(e)))
+            except Exception as e:
+                # Couldn't open (or cleanly close) the SMTP connection; rows
+                # without a recorded result count as failed attempts.
+                done = {row_id for row_id, _, _ in results}
+                results.extend(
+                    (row[0], row[4], str(e)) for row in claimed if row[0] not in done
+                )
+
+        with stage("db_record", route="outbox"), pool.connection() as connection:
+            self._record(pool, connection, claimed, results)
+        return len(claimed)
+
+    def _record(self, pool, connection, claimed, results):
+        rows = {row[0]: row for row in claimed}
+        cursor = connection.cursor()
+        now = time.time()
+        for row_id, attempts, error in results:
+            if error is None:
+                cursor.execute(pool.sql("DELETE FROM email_outbox WHERE id = %s"), (row_id,))
+                self.sent += 1
+            elif attempts >= self.max_attempts:
+                _, recipient, subject, body, _ = rows[row_id]
+                cursor.execute(
+                    pool.sql(
+                        "INSERT INTO email_dead_letter "
+                        "(id, recipient, subject, body, attempts, last_error, failed_at) "
+                        "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+                    ),
+                    (row_id, recipient, subject, body, attempts, error, now),
+                )
+                cursor.execute(pool.sql("DELETE FROM email_outbox WHERE id = %s"), (row_id,))
+                self.dead_lettered += 1
+                logger.warning("Email %s to %s moved to dead letter: %s", row_id, recipient, error)
+            else:
+                cursor.execute(
+                    pool.sql(
+                        "UPDATE email_outbox SET next_attempt_at = %s, last_error = %s "
+                        "WHERE id = %s"
+                    ),
+                    (now + self.backoff * 2 ** (attempts - 1), error, row_id),
+                )
+                self.failed += 1
+        connection.commit()
+        cursor.close()
+
+    def stats(self):
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "dead_lettered": self.dead_lettered,
+            "poll_errors": self.poll_errors,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,150 @@
+# prediction.py
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import stage
+
+# Column order the preprocessor was fitted with.
+FEATURE_COLUMNS = [
+    "USA_WIND",
+    "USA_PRES",
+    "DIST2LAND",
+    "USA_LAT",
+    "USA_LON",
+    "wind_pressure_ratio",
+    "Day_Night_encoded",
+]
+
+# Encoded model output -> human readable status.
+LABEL_MAPPING = {
+    0: "Disturbance (0-20 mph) - A weak, disorganized system with minimal wind, often the early stage of a developing storm.",
+    1: "Extratropical Cyclone (30-60 mph) - Storms formed outside the tropics, often bringing heavy rain and strong winds.",
+    2: "Hurricane (74+ mph) - A powerful tropical storm with sustained winds above 74 mph, causing significant damage and heavy rainfall.",
+    3: "Gale Winds (39-54 mph) - Strong winds that can cause minor damage, but are not part of a tropical storm or hurricane.",
+    4: "Subtropical Depression (0-38 mph) - A weaker subtropical system with lower wind speeds, a mix of tropical and extratropical characteristics.",
+    5: "Subtropical Storm (39-73 mph) - A storm with both tropical and extratropical characteristics, typically less organized than a hurricane.",
+    6: "Tropical Depression (0-38 mph) - A tropical system with winds below 39 mph, often a precursor to a tropical storm.",
+    7: "Tropical Storm (39-73 mph) - A well-developed tropical system with winds between 39 and 73 mph, less intense than a hurricane.",
+    8: "Clear Sky (0 mph) - Calm weather with no active storm or disturbance.",
+    9: "Tropical Wave (10-30 mph) - A tropical disturbance with low wind speeds, which could develop into a stronger system.",
+}
+
+DEFAULT_LABEL = "Clear Sky"
+
+# USA_WIND, the wind feature the model was trained on, is in knots. Features
+# the server builds itself (/assess, utils.ingest) convert OpenWeather's
+# km/h to knots; /predict_status scores the windSpeed its callers send.
+KMH_PER_KNOT = 1.852
+
+
+def parse_point(data):
+    """
+    Convert one `/predict_status` JSON payload into a feature row.
+
+    Parameters:
+        data (dict): Payload with latitude, longitude, windSpeed, pressure,
+            distanceToLand and day_night keys (as sent by index.html).
+            windSpeed becomes the wind feature unconverted, as it always
+            has; index.html sends km/h.
+
+    Returns:
+        tuple: The seven model features in FEATURE_COLUMNS order.
+    """
+    wind_speed = float(data.get("windSpeed"))
+    pressure = float(data.get("pressure"))
+    distance_to_land = float(data.get("distanceToLand"))
+    lat = float(data.get("latitude"))
+    lng = float(data.get("longitude"))
+    day_night = float(data.get("day_night"))
+    wind_pressure_ratio = float(wind_speed / pressure)
+
+    return (wind_speed, pressure, distance_to_land, lat, lng, wind_pressure_ratio, day_night)
+
+
+def parse_points(points):
+    """
+    Convert a sequence of payloads into an (n, 7) float array.
+
+    Parameters:
+        points (iterable): Payload dicts accepted by `parse_point`.
+
+    Returns:
+        numpy.ndarray: Feature matrix in FEATURE_COLUMNS order.
+    """
+    rows = [parse_point(point) for point in points]
+    return np.asarray(rows, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+
+
+def parse_ndjson(text):
+    """
+    Parse newline-delimited JSON into a list of payloads, skipping blank lines.
+    """
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def build_feature_frame(features):
+    """
+    Build the columnar DataFrame the preprocessor expects from a feature matrix.
+    """
+    features = np.asarray(features, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+    return pd.DataFrame(features, columns=FEATURE_COLUMNS)
+
+
+def predict_features(model, preprocessor, features):
+    """
+    Run the preprocessor and classifier once over a whole feature matrix.
+
+    Parameters:
+        model: Fitted classifier with predict_proba and classes_.
+        preprocessor: Fitted ColumnTransformer, or a compiled one
+            (utils.feature_pipeline) that takes the matrix directly.
+        features (numpy.ndarray): (n, 7) matrix in FEATURE_COLUMNS order.
+
+    Returns:
+        tuple: (predictions, probabilities) where predictions holds the encoded
+        class per row and probabilities is an (n, n_classes) array ordered
+        like model.classes_.
+    """
+    if getattr(preprocessor, "accepts_arrays", False):
+        with stage("transform"):
+            processed = preprocessor.transform(features)
+    else:
+        with stage("dataframe"):
+            frame = build_feature_frame(features)
+        with stage("transform"):
+            processed = preprocessor.transform(frame)
+    with stage("predict"):
+        probabilities = model.predict_proba(processed)
+    # Same argmax rule as RandomForestClassifier.predict, so single and
+    # batch requests agree without a second pass through the forest.
+    predictions = model.classes_.take(np.argmax(probabilities, axis=1), axis=0)
+    return predictions, probabilities
+
+
+def describe_prediction(prediction):
+    """
+    Map an encoded prediction to its status description.
+    """
+    return LABEL_MAPPING.get(int(prediction), DEFAULT_LABEL)
+
+
+def format_predictions(model, predictions, probabilities):
+    """
+    Build the JSON-serialisable result rows for a batch of predictions.
+    """
+    classes = [int(c) for c in model.classes_]
+    results = []
+    for prediction, row in zip(predictions, probabilities):
+        results.append(
+            {
+                "prediction": int(prediction),
+                "status": describe_prediction(prediction),
+                "probabilities": {
+                    str(c): round(float(p), 6) for c, p in zip(classes, row)
+                },
+            }
+        )
+    return results
@@ -0,0 +1,225 @@
+# prediction_cache.py
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from utils.cache import TTLCache
+from utils.prediction import FEATURE_COLUMNS, predict_features
+
+# Decimal places each feature is rounded to before it becomes a cache key:
+# 0.1 wind units (knots from /assess, as sent to /predict_status) / 0.1 mb /
+# 0.1 km, ~1 km of latitude/longitude.
+DEFAULT_PRECISION = (1, 1, 1, 2, 2, 4, 0)
+
+# Approximate bytes per local entry (key tuple plus probability row).
+ENTRY_BYTES = 256
+
+
+def parse_precision(value):
+    """
+    PREDICTION_CACHE_PRECISION: one number of decimal places for every
+    feature, or a comma-separated value per feature in FEATURE_COLUMNS order.
+    """
+    if not value:
+        return DEFAULT_PRECISION
+    parts = [int(part) for part in value.split(",")]
+    if len(parts) == 1:
+        return tuple(parts * len(FEATURE_COLUMNS))
+    if len(parts) != len(FEATURE_COLUMNS):
+        raise ValueError(
+            f"PREDICTION_CACHE_PRECISION needs 1 or {len(FEATURE_COLUMNS)} values"
+        )
+    return tuple(parts)
+
+
+class RedisBackend:
+    """
+    Cache tier shared by every worker (and host) through Redis. Needs the
+    optional `redis` package; entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, url, ttl, prefix="prehurricane:prediction"):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get_many(self, namespace, keys):
+        names = [f"{self.prefix}:{namespace}:{key}" for key in keys]
+        return [None if raw is None else json.loads(raw) for raw in self.client.mget(names)]
+
+    def put_many(self, namespace, items):
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in items:
+            pipeline.set(f"{self.prefix}:{namespace}:{key}", json.dumps(value), ex=self.ttl)
+        pipeline.execute()
+
+
+class PredictionCache:
+    """
+    Memoizes (prediction, probabilities) per feature vector, keyed on the
+    seven model features rounded to `precision` decimal places.
+
+    A hit skips the DataFrame, `preprocessor.transform` and the forest;
+    requests that differ by less than the rounding step share one result
+    (the one computed for whichever of them missed first). Lookups go to
+    the in-process LRU first, then the optional shared backend.
+
+    Entries are namespaced by the caller, with the version and fingerprint
+    of the model bundle that computed them (ModelBundle.fingerprint), so a
+    result is only ever served for the model actually loaded, in this
+    worker or any other sharing the backend.
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION, max_entries=65536, ttl=3600,
+                 backend=None):
+        self.precision = tuple(precision)
+        self.local = TTLCache(ttl=ttl, max_entries=max_entries,
+                              max_bytes=max_entries * ENTRY_BYTES)
+        self.backend = backend
+        self.namespace = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.backend_errors = 0
+        self.miss_seconds = 0.0
+        self.hit_seconds = 0.0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Configured from PREDICTION_CACHE_PRECISION, PREDICTION_CACHE_MAX_ENTRIES,
+        PREDICTION_CACHE_TTL and, for the shared tier, PREDICTION_CACHE_REDIS_URL.
+        """
+        ttl = int(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+        redis_url = os.getenv("PREDICTION_CACHE_REDIS_URL")
+        return cls(
+            precision=parse_precision(os.getenv("PREDICTION_CACHE_PRECISION")),
+            max_entries=int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "65536")),
+            ttl=ttl,
+            backend=RedisBackend(redis_url, ttl) if redis_url else None,
+        )
+
+    def activate(self, namespace):
+        """
+        Note the namespace of the newly active model; after a swap, the
+        local entries cached for the previous one are dropped.
+        """
+        with self._lock:
+            if namespace == self.namespace:
+                return
+            if self.namespace is not None:
+                self.local.clear()
+                self.invalidations += 1
+            self.namespace = namespace
+
+    def keys(self, features):
+        # `+ 0.0` folds -0.0 into 0.0 so both round to the same key
+        rounded = [
+            np.round(features[:, column], decimals) + 0.0
+            for column, decimals in enumerate(self.precision)
+        ]
+        return [
+            ",".join(repr(value) for value in row)
+            for row in zip(*(column.tolist() for column in rounded))
+        ]
+
+    def predict(self, model, preprocessor, features, namespace):
+        """
+        Drop-in for utils.prediction.predict_features: only rows without a
+        cached result go through the preprocessor and model, in one batch.
+        `namespace` identifies the bundle `model` came from
+        (f"{bundle.version}-{bundle.fingerprint}"), so requests still running
+        on a swapped-out model never fill the new model's entries.
+        """
+        started = time.perf_counter()
+        features = np.asarray(features, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+        raw_keys = self.keys(features)
+        keys = [f"{namespace}:{key}" for key in raw_keys]
+        results = [self.local.get(key) for key in keys]
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        shared_hits = 0
+        backend_errors = 0
+        if missing and self.backend is not None:
+            try:
+                shared = self.backend.get_many(namespace, [raw_keys[i] for i in missing])
+            except Exception:
+                shared = [None] * len(missing)
+                backend_errors += 1
+            for i, value in zip(missing, shared):
+                if value is not None:
+                    results[i] = (value[0], np.asarray(value[1], dtype=np.float64))
+                    self.local.put(keys[i], results[i], ENTRY_BYTES)
+                    shared_hits += 1
+            missing = [i for i in missing if results[i] is None]
+
+        hit_count = len(features) - len(missing)
+        if missing:
+            miss_started = time.perf_counter()
+            predictions, probabilities = predict_features(
+                model, preprocessor, features[missing]
+            )
+            for row, i in enumerate(missing):
+                # Copy the row: a view would keep the whole batch array alive
+                results[i] = (predictions[row], probabilities[row].copy())
+                self.local.put(keys[i], results[i], ENTRY_BYTES)
+            if self.backend is not None:
+                try:
+                    self.backend.put_many(
+                        namespace,
+                        [
+                            (raw_keys[i], [predictions[row].item(), probabilities[row].tolist()])
+                            for row, i in enumerate(missing)
+                        ],
+                    )
+                except Exception:
+                    backend_errors += 1
+            miss_elapsed = time.perf_counter() - miss_started
+        else:
+            miss_elapsed = 0.0
+
+        with self._lock:
+            self.hits += hit_count
+            self.shared_hits += shared_hits
+            self.backend_errors += backend_errors
+            self.misses += len(missing)
+            self.miss_seconds += miss_elapsed
+            if hit_count:
+                lookup = time.perf_counter() - started - miss_elapsed
+                self.hit_seconds += lookup
+
+        predictions = np.array([result[0] for result in results], dtype=model.classes_.dtype)
+        probabilities = np.vstack([result[1] for result in results])
+        return predictions, probabilities
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            miss_cost = self.miss_seconds / self.misses if self.misses else 0.0
+            hit_cost = self.hit_seconds / self.hits if self.hits else 0.0
+            return {
+                "entries": len(self.local),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "avg_miss_ms": 1000 * miss_cost,
+                "avg_hit_ms": 1000 * hit_cost,
+                # Each hit avoided roughly one average miss
+                "estimated_saved_seconds": max(miss_cost - hit_cost, 0.0) * self.hits,
+                "evictions": self.local.evictions,
+                "invalidations": self.invalidations,
+                "backend": "redis" if self.backend is not None else None,
+                "backend_errors": self.backend_errors,
+                "precision": dict(zip(FEATURE_COLUMNS, self.precision)),
+                "namespace": self.namespace,
+            }
@@ -0,0 +1,211 @@
+# risk_grid.py
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RISK_GRID_PATH = os.path.join(BASE_DIR, "data", "risk_grid")
+METADATA_FILE = "risk_grid.json"
+
+# Default (wind, pressure, day_night) sweep, roughly tropical storm through
+# category 5 in the training data's units (knots, mb).
+DEFAULT_SCENARIOS = (
+    (40.0, 1000.0, 1),
+    (65.0, 987.0, 1),
+    (90.0, 970.0, 1),
+    (115.0, 950.0, 1),
+    (140.0, 925.0, 1),
+)
+
+# Confidence is stored as a byte; 255 means probability 1.0.
+CONFIDENCE_SCALE = 255.0
+
+
+def grid_axes(lat_min, lat_max, lon_min, lon_max, step):
+    """
+    Latitude and longitude coordinates of every grid row and column.
+    """
+    lats = lat_min + step * np.arange(int(round((lat_max - lat_min) / step)) + 1)
+    lons = lon_min + step * np.arange(int(round((lon_max - lon_min) / step)) + 1)
+    return lats, lons
+
+
+def scenario_features(lats, lons, distance, scenario):
+    """
+    Model feature matrix for a block of grid cells under one scenario.
+
+    Parameters:
+        lats (numpy.ndarray): Row latitudes of the block.
+        lons (numpy.ndarray): Column longitudes of the grid.
+        distance (numpy.ndarray): (len(lats), len(lons)) distance to land in km.
+        scenario (tuple): (wind, pressure, day_night).
+
+    Returns:
+        numpy.ndarray: (cells, 7) features in FEATURE_COLUMNS order.
+    """
+    wind, pressure, day_night = scenario
+    lat_grid, lon_grid = np.meshgrid(lats, lons, indexing="ij")
+    n = lat_grid.size
+    return np.column_stack([
+        np.full(n, wind),
+        np.full(n, pressure),
+        distance.ravel(),
+        lat_grid.ravel(),
+        lon_grid.ravel(),
+        np.full(n, wind / pressure),
+        np.full(n, float(day_night)),
+    ])
+
+
+def content_hash(classes, confidence):
+    """
+    Short SHA-256 digest of both grids' bytes, recorded in the metadata so
+    the served version changes whenever the predictions do.
+    """
+    digest = hashlib.sha256()
+    for grid in (classes, confidence):
+        digest.update(repr(grid.shape).encode())
+        # One scenario at a time, so a memory-mapped grid is never copied whole
+        for layer in grid:
+            digest.update(np.ascontiguousarray(layer, dtype=np.uint8).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def save_risk_grid(directory, classes, confidence, class_labels, scenarios,
+                   lat_min, lon_min, step, model_version=None, source=None):
+    """
+    Write class and confidence grids as `.npy` files plus a JSON manifest.
+
+    Parameters:
+        directory (str): Output directory.
+        classes (numpy.ndarray): (n_scenarios, n_lat, n_lon) uint8 indexes
+            into `class_labels`.
+        confidence (numpy.ndarray): Same shape, uint8 probability of the
+            predicted class scaled by CONFIDENCE_SCALE.
+        class_labels (list): Model class values.
+        scenarios (list): (wind, pressure, day_night) per scenario.
+        lat_min, lon_min, step (float): Grid origin and spacing in degrees.
+        model_version (str): Registry version of the model that scored it.
+        source (dict): Optional provenance (artifact paths).
+    """
+    os.makedirs(directory, exist_ok=True)
+    # Write-then-rename, so a server still mapping the previous grid keeps
+    # its files intact and picks up the new ones with the new manifest
+    for name, grid in (("classes.npy", classes), ("confidence.npy", confidence)):
+        path = os.path.join(directory, name)
+        with open(f"{path}.tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(grid, dtype=np.uint8))
+        os.replace(f"{path}.tmp", path)
+    meta_path = os.path.join(directory, METADATA_FILE)
+    with open(f"{meta_path}.tmp", "w") as f:
+        json.dump(
+            {
+                "lat_min": lat_min,
+                "lon_min": lon_min,
+                "step": step,
+                "shape": list(classes.shape),
+                "classes": [c.item() if hasattr(c, "item") else c for c in class_labels],
+                "scenarios": [
+                    {"wind": w, "pressure": p, "day_night": int(d)} for w, p, d in scenarios
+                ],
+                "model_version": model_version,
+                "content_hash": content_hash(classes, confidence),
+                "source": source or {},
+            },
+            f,
+            indent=2,
+        )
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+
+class RiskGrid:
+    """
+    Precomputed predicted class and confidence per grid cell and scenario
+    (scripts/build_risk_grid.py).
+
+    Both grids are memory-mapped, so slicing a region only touches the
+    pages it covers and every gunicorn worker shares the same file.
+    """
+
+    def __init__(self, classes, confidence, meta):
+        self.classes = classes
+        self.confidence = confidence
+        self.class_labels = meta["classes"]
+        self.scenarios = meta["scenarios"]
+        # None for grids built before versions were recorded
+        self.model_version = meta.get("model_version")
+        self.lat_min = float(meta["lat_min"])
+        self.lon_min = float(meta["lon_min"])
+        self.step = float(meta["step"])
+        self.n_scenarios, self.n_lat, self.n_lon = classes.shape
+        # Model version plus content hash, used as the HTTP validator; grids
+        # saved before the hash was recorded are hashed on load
+        self.content_hash = meta.get("content_hash") or content_hash(classes, confidence)
+        self.version = f"{self.model_version or 'unversioned'}-{self.content_hash}"
+
+    @classmethod
+    def load(cls, directory=DEFAULT_RISK_GRID_PATH):
+        meta_path = os.path.join(directory, METADATA_FILE)
+        with open(meta_path) as f:
+            meta = json.load(f)
+        classes = np.load(os.path.join(directory, "classes.npy"), mmap_mode="r")
+        confidence = np.load(os.path.join(directory, "confidence.npy"), mmap_mode="r")
+        if list(classes.shape) != meta["shape"] or confidence.shape != classes.shape:
+            raise ValueError(f"Risk grid {directory} does not match its metadata")
+        return cls(classes, confidence, meta)
+
+    @property
+    def lat_max(self):
+        return self.lat_min + (self.n_lat - 1) * self.step
+
+    @property
+    def lon_max(self):
+        return self.lon_min + (self.n_lon - 1) * self.step
+
+    def describe(self):
+        return {
+            "lat_min": self.lat_min,
+            "lat_max": self.lat_max,
+            "lon_min": self.lon_min,
+            "lon_max": self.lon_max,
+            "step": self.step,
+            "classes": self.class_labels,
+            "scenarios": self.scenarios,
+            "model_version": self.model_version,
+            "version": self.version,
+        }
+
+    def slice(self, scenario, lat_min, lat_max, lon_min, lon_max, stride=1):
+        """
+        Cells of one scenario inside a bounding box, every `stride` cells.
+
+        Returns:
+            dict: Origin, effective step, and row-major `classes` (indexes
+            into `class_labels`) and `confidence` (0-1) lists.
+        """
+        if not 0 <= scenario < self.n_scenarios:
+            raise ValueError(f"Scenario must be between 0 and {self.n_scenarios - 1}")
+        if stride < 1:
+            raise ValueError("Stride must be at least 1")
+
+        r0 = max(int(np.ceil((lat_min - self.lat_min) / self.step)), 0)
+        r1 = min(int(np.floor((lat_max - self.lat_min) / self.step)), self.n_lat - 1)
+        c0 = max(int(np.ceil((lon_min - self.lon_min) / self.step)), 0)
+        c1 = min(int(np.floor((lon_max - self.lon_min) / self.step)), self.n_lon - 1)
+        if r1 < r0 or c1 < c0:
+            raise ValueError("Bounding box does not overlap the risk grid")
+
+        classes = self.classes[scenario, r0:r1 + 1:stride, c0:c1 + 1:stride]
+        confidence = self.confidence[scenario, r0:r1 + 1:stride, c0:c1 + 1:stride]
+        return {
+            "scenario": self.scenarios[scenario],
+            "lat_min": self.lat_min + r0 * self.step,
+            "lon_min": self.lon_min + c0 * self.step,
+            "step": self.step * stride,
+            "shape": list(classes.shape),
+            "classes": classes.tolist(),
+            "confidence": np.round(confidence / CONFIDENCE_SCALE, 3).tolist(),
+        }
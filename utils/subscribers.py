@@ -0,0 +1,510 @@
+# subscribers.py
+#
+# Bulk import/export and location queries for the `subscribers` table.
+#
+#   python -m utils.subscribers import subscribers.csv --batch-size 500
+#   python -m utils.subscribers export subscribers-export.csv
+#   python -m utils.subscribers near --lat 25.76 --lon -80.19 --radius-km 150
+#   python -m utils.subscribers migrate [--delete-duplicates]
+#
+# Import CSVs have name, email and phone columns, and optionally lat and lon
+# (or lng). Emails are unique (case-insensitively): importing an address
+# that already exists updates that subscriber instead of adding a row.
+# Locally, point DATABASE_URL at SQLite (sqlite:///subscribers.db).
+#
+# Tables created before locations and unique emails need `migrate` once;
+# until then the app refuses to start. It reports duplicate emails and
+# only deletes them (keeping each address's first subscription) when
+# asked to.
+
+import argparse
+import csv
+import json
+import logging
+import math
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from utils import geohash
+from utils.coastline import EARTH_RADIUS_KM
+from utils.db import (
+    DatabasePool,
+    get_pool,
+    register_schema_check,
+    table_columns,
+    table_indexes,
+)
+
+logger = logging.getLogger(__name__)
+
+# ~5 m cells; radius queries pick coarser prefixes of the stored hash.
+GEOHASH_PRECISION = 9
+
+# Range scans compare geohashes as plain ASCII; MySQL's default utf8mb4
+# collations are case- and accent-insensitive with their own ordering.
+GEOHASH_MYSQL_TYPE = "VARCHAR(12) CHARACTER SET ascii COLLATE ascii_bin"
+
+INSERT_COLUMNS = ("name", "email", "phone", "lat", "lon", "geohash")
+EXPORT_COLUMNS = ("id", "name", "email", "phone", "lat", "lon")
+
+# SQLite caps the bound parameters per statement (999 before 3.32).
+SQLITE_MAX_VARIABLES = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+
+LOCATION_COLUMNS = (
+    ("lat", "DOUBLE", "REAL"),
+    ("lon", "DOUBLE", "REAL"),
+    ("geohash", GEOHASH_MYSQL_TYPE, "TEXT"),
+)
+
+
+def _geohash_collation(cursor):
+    cursor.execute(
+        "SELECT COLLATION_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'subscribers' "
+        "AND COLUMN_NAME = 'geohash'"
+    )
+    (collation,) = cursor.fetchone()
+    return collation
+
+
+def check_subscribers(dialect, cursor):
+    """
+    What an existing `subscribers` table lacks compared with the current
+    schema; empty when it is up to date or doesn't exist yet.
+    """
+    columns = table_columns(dialect, cursor, "subscribers")
+    if not columns:
+        return []
+    problems = [
+        f"subscribers.{name} is missing"
+        for name, _, _ in LOCATION_COLUMNS
+        if name not in columns
+    ]
+    if dialect == "mysql" and "geohash" in columns and _geohash_collation(cursor) != "ascii_bin":
+        problems.append("subscribers.geohash is not ascii_bin")
+    indexes = table_indexes(dialect, cursor, "subscribers")
+    for index in ("uq_subscribers_email", "idx_subscribers_geohash"):
+        if index not in indexes:
+            problems.append(f"index {index} is missing")
+    if problems:
+        problems[-1] += "; run `python -m utils.subscribers migrate`"
+    return problems
+
+
+register_schema_check(check_subscribers)
+
+
+def duplicate_subscribers(cursor):
+    """
+    Every subscriber sharing an email (ignoring case and surrounding
+    spaces) with another, grouped by address, oldest subscription first.
+    """
+    cursor.execute(
+        "SELECT s.id, s.name, s.email, s.phone FROM subscribers s JOIN ("
+        "SELECT LOWER(TRIM(email)) AS address FROM subscribers WHERE email IS NOT NULL "
+        "GROUP BY LOWER(TRIM(email)) HAVING COUNT(*) > 1"
+        ") d ON LOWER(TRIM(s.email)) = d.address ORDER BY d.address, s.id"
+    )
+    return cursor.fetchall()
+
+
+def migrate_subscribers(pool, delete_duplicates=False):
+    """
+    Bring a `subscribers` table created before locations and unique emails
+    up to date: add the location columns, normalise emails, then build the
+    unique email and geohash indexes.
+
+    Duplicate emails block the unique index. They are always reported;
+    with `delete_duplicates` all but each address's first subscription
+    are deleted, otherwise the table is left without the index for them
+    to be merged by hand. Run it from one place: on MySQL a named lock
+    keeps a second run waiting rather than racing on the same DDL.
+
+    Returns:
+        dict: Columns and indexes added, the duplicate rows (id, name,
+        email, phone), how many were deleted, and what is still pending.
+    """
+    report = {"added_columns": [], "created_indexes": [], "duplicates": [], "deleted": 0}
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        if pool.dialect == "mysql":
+            cursor.execute("SELECT GET_LOCK('subscribers_migration', 60)")
+            if cursor.fetchone()[0] != 1:
+                raise RuntimeError("Another subscribers migration is running")
+        try:
+            columns = table_columns(pool.dialect, cursor, "subscribers")
+            for name, mysql_type, sqlite_type in LOCATION_COLUMNS:
+                if columns and name not in columns:
+                    column_type = mysql_type if pool.dialect == "mysql" else sqlite_type
+                    cursor.execute(f"ALTER TABLE subscribers ADD COLUMN {name} {column_type}")
+                    report["added_columns"].append(name)
+            if pool.dialect == "mysql" and "geohash" in columns:
+                # Tables migrated before the column had a binary collation
+                if _geohash_collation(cursor) != "ascii_bin":
+                    cursor.execute(f"ALTER TABLE subscribers MODIFY geohash {GEOHASH_MYSQL_TYPE}")
+
+            # New tables get everything from the DDL
+            indexes = table_indexes(pool.dialect, cursor, "subscribers") if columns else None
+            if indexes is not None and "uq_subscribers_email" not in indexes:
+                duplicates = duplicate_subscribers(cursor)
+                report["duplicates"] = [
+                    dict(zip(("id", "name", "email", "phone"), row)) for row in duplicates
+                ]
+                if duplicates and delete_duplicates:
+                    first = {}
+                    doomed = []
+                    for row in duplicates:
+                        address = row[2].strip(" ").lower()
+                        if address in first:
+                            doomed.append(row[0])
+                        else:
+                            first[address] = row[0]
+                    for start in range(0, len(doomed), 500):
+                        batch = doomed[start:start + 500]
+                        cursor.execute(
+                            pool.sql(
+                                "DELETE FROM subscribers WHERE id IN "
+                                f"({', '.join(['%s'] * len(batch))})"
+                            ),
+                            batch,
+                        )
+                    report["deleted"] = len(doomed)
+                    logger.warning(
+                        "Deleted %d duplicate subscribers: %s", len(doomed),
+                        ", ".join(map(str, doomed)),
+                    )
+                if not duplicates or delete_duplicates:
+                    cursor.execute("UPDATE subscribers SET email = LOWER(TRIM(email))")
+                    cursor.execute("CREATE UNIQUE INDEX uq_subscribers_email ON subscribers (email)")
+                    report["created_indexes"].append("uq_subscribers_email")
+            if indexes is not None and "idx_subscribers_geohash" not in indexes:
+                cursor.execute("CREATE INDEX idx_subscribers_geohash ON subscribers (geohash)")
+                report["created_indexes"].append("idx_subscribers_geohash")
+            connection.commit()
+            report["pending"] = check_subscribers(pool.dialect, cursor)
+        finally:
+            if pool.dialect == "mysql":
+                cursor.execute("SELECT RELEASE_LOCK('subscribers_migration')")
+                cursor.fetchone()
+            cursor.close()
+    if not columns:
+        pool.ensure_schema()
+    return report
+
+
+def subscriber_row(name, email, phone, lat=None, lon=None):
+    """
+    Validate and normalise one subscriber into INSERT_COLUMNS order.
+
+    Raises:
+        ValueError: For a missing/invalid email or an incomplete or out of
+        range location.
+    """
+    email = (email or "").strip().lower()
+    if "@" not in email or len(email) > 255:
+        raise ValueError(f"Invalid email {email!r}")
+    lat = None if lat in (None, "") else float(lat)
+    lon = None if lon in (None, "") else float(lon)
+    if (lat is None) != (lon is None):
+        raise ValueError("Location needs both lat and lon")
+    if lat is not None:
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"Location out of range: {lat}, {lon}")
+        cell = geohash.encode(lat, lon, GEOHASH_PRECISION)
+    else:
+        cell = None
+    return ((name or "").strip(), email, (phone or "").strip(), lat, lon, cell)
+
+
+def upsert_sql(pool, rows=1, on_duplicate="update"):
+    """
+    Multi-row INSERT of `rows` subscribers that resolves email conflicts
+    through the unique index: "update" overwrites name/phone (and location,
+    when the new row has one), "skip" keeps the existing subscriber.
+    """
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * rows)
+    query = f"INSERT INTO subscribers ({', '.join(INSERT_COLUMNS)}) VALUES {values}"
+    if pool.dialect == "mysql":
+        if on_duplicate == "skip":
+            return query + " ON DUPLICATE KEY UPDATE email = email"
+        return query + (
+            " ON DUPLICATE KEY UPDATE name = VALUES(name), phone = VALUES(phone),"
+            " lat = COALESCE(VALUES(lat), lat), lon = COALESCE(VALUES(lon), lon),"
+            " geohash = COALESCE(VALUES(geohash), geohash)"
+        )
+    if on_duplicate == "skip":
+        return pool.sql(query + " ON CONFLICT(email) DO NOTHING")
+    return pool.sql(
+        query + " ON CONFLICT(email) DO UPDATE SET name = excluded.name,"
+        " phone = excluded.phone, lat = COALESCE(excluded.lat, lat),"
+        " lon = COALESCE(excluded.lon, lon), geohash = COALESCE(excluded.geohash, geohash)"
+    )
+
+
+def upsert_subscriber(cursor, pool, name, email, phone, lat=None, lon=None):
+    """
+    Add or update one subscriber using the caller's cursor (and transaction).
+    """
+    cursor.execute(upsert_sql(pool), subscriber_row(name, email, phone, lat, lon))
+
+
+def count_subscribers(pool):
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM subscribers")
+        (count,) = cursor.fetchone()
+        cursor.close()
+    return count
+
+
+def import_csv(pool, lines, batch_size=500, on_duplicate="update"):
+    """
+    Load subscribers from CSV with one multi-row INSERT per `batch_size`
+    rows, committed per batch. Duplicate emails, within the file or
+    already stored, are resolved by the unique index (see upsert_sql).
+
+    Parameters:
+        lines (iterable): CSV text lines, header first.
+
+    Returns:
+        dict: rows read, rows inserted (new emails), rows rejected with
+        line numbers and reasons, and throughput.
+    """
+    if pool.dialect == "sqlite":
+        batch_size = min(batch_size, SQLITE_MAX_VARIABLES // len(INSERT_COLUMNS))
+    started = time.perf_counter()
+    before = count_subscribers(pool)
+    full_batch_sql = upsert_sql(pool, batch_size, on_duplicate)
+
+    read = 0
+    rejected = []
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+
+        def flush(batch):
+            query = full_batch_sql if len(batch) == batch_size else upsert_sql(
+                pool, len(batch), on_duplicate
+            )
+            cursor.execute(query, [value for row in batch for value in row])
+            connection.commit()
+
+        batch = []
+        reader = csv.DictReader(lines)
+        for record in reader:
+            read += 1
+            try:
+                batch.append(
+                    subscriber_row(
+                        record.get("name"), record.get("email"), record.get("phone"),
+                        record.get("lat"), record.get("lon", record.get("lng")),
+                    )
+                )
+            except ValueError as e:
+                rejected.append((reader.line_num, str(e)))
+                continue
+            if len(batch) == batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+        cursor.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": read,
+        "inserted": count_subscribers(pool) - before,
+        "rejected": len(rejected),
+        "rejected_lines": rejected[:100],
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_sec": round(read / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def iter_subscribers(pool, fetch_size=1000):
+    """
+    Yield every subscriber as an EXPORT_COLUMNS tuple in id order.
+
+    MySQL uses an unbuffered cursor, so rows stream from the server
+    `fetch_size` at a time instead of the whole result being materialised
+    client-side; SQLite cursors step through the result lazily anyway.
+    """
+    with pool.connection() as connection:
+        if pool.dialect == "mysql":
+            cursor = connection.cursor(buffered=False)
+        else:
+            cursor = connection.cursor()
+        try:
+            cursor.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM subscribers ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            # An abandoned unbuffered result must be drained before the
+            # connection goes back to the pool
+            if pool.dialect == "mysql" and connection.unread_result:
+                connection.consume_results()
+            cursor.close()
+
+
+def export_csv(pool, out, fetch_size=1000):
+    """
+    Write all subscribers to `out` as CSV, streaming. Returns the row count.
+    """
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for row in iter_subscribers(pool, fetch_size):
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def haversine_km(lat, lon, lats, lons):
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = (
+        np.sin((lats - lat) / 2) ** 2
+        + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def area_filter(lat, lon, radius_km, max_cells=32):
+    """
+    SQL condition and parameters matching subscribers whose geohash falls in
+    the cells covering the circle's bounding box: a superset of the circle,
+    answered with range scans on idx_subscribers_geohash. Callers filter
+    the candidates by exact distance.
+    """
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    lat_min, lat_max = lat - lat_delta, lat + lat_delta
+    spread = math.sin(radius_km / EARTH_RADIUS_KM) / max(math.cos(math.radians(lat)), 1e-12)
+    if lat_min <= -90 or lat_max >= 90 or spread >= 1:
+        # The circle reaches a pole (or is huge): every longitude
+        boxes = [(-180.0, 180.0)]
+    else:
+        lon_delta = math.degrees(math.asin(spread))
+        lon_min, lon_max = lon - lon_delta, lon + lon_delta
+        boxes = [(max(lon_min, -180.0), min(lon_max, 180.0))]
+        # Split boxes crossing the antimeridian
+        if lon_min < -180:
+            boxes.append((lon_min + 360.0, 180.0))
+        if lon_max > 180:
+            boxes.append((-180.0, lon_max - 360.0))
+
+    cells = set()
+    for box_lon_min, box_lon_max in boxes:
+        cells.update(
+            geohash.covering_cells(lat_min, lat_max, box_lon_min, box_lon_max, max_cells)
+        )
+    terms, params = [], []
+    for low, high in geohash.prefix_ranges(sorted(cells)):
+        if high is None:
+            terms.append("geohash >= %s")
+            params.append(low)
+        else:
+            terms.append("(geohash >= %s AND geohash < %s)")
+            params += [low, high]
+    return f"({' OR '.join(terms)})", params
+
+
+def subscribers_near(pool, lat, lon, radius_km):
+    """
+    Subscribers with a location within `radius_km` of (lat, lon).
+
+    Returns:
+        list: (id, name, email, phone, distance_km) tuples, nearest first.
+    """
+    condition, params = area_filter(lat, lon, radius_km)
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            pool.sql(f"SELECT id, name, email, phone, lat, lon FROM subscribers WHERE {condition}"),
+            params,
+        )
+        rows = cursor.fetchall()
+        cursor.close()
+    if not rows:
+        return []
+    distances = haversine_km(
+        lat, lon, np.array([row[4] for row in rows]), np.array([row[5] for row in rows])
+    )
+    nearby = [
+        (row[0], row[1], row[2], row[3], round(float(distance), 3))
+        for row, distance in zip(rows, distances)
+        if distance <= radius_km
+    ]
+    return sorted(nearby, key=lambda row: row[4])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk subscriber import/export and queries.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("import", help="Add or update subscribers from a CSV file")
+    load.add_argument("path", help="CSV file ('-' for stdin)")
+    load.add_argument("--batch-size", type=int, default=500, help="Rows per INSERT")
+    load.add_argument("--on-duplicate", choices=("update", "skip"), default="update")
+
+    dump = commands.add_parser("export", help="Write all subscribers as CSV")
+    dump.add_argument("path", nargs="?", default="-", help="Output file ('-' for stdout)")
+    dump.add_argument("--fetch-size", type=int, default=1000)
+
+    near = commands.add_parser("near", help="Subscribers within a radius of a point")
+    near.add_argument("--lat", type=float, required=True)
+    near.add_argument("--lon", type=float, required=True)
+    near.add_argument("--radius-km", type=float, required=True)
+
+    migrate = commands.add_parser(
+        "migrate", help="Bring a subscribers table from an older release up to date"
+    )
+    migrate.add_argument(
+        "--delete-duplicates", action="store_true",
+        help="Delete all but the first subscription of each duplicated email "
+             "(by default they are only reported)",
+    )
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        # get_pool() refuses to hand out connections until this has run
+        report = migrate_subscribers(DatabasePool.from_env(), args.delete_duplicates)
+        print(json.dumps(report, indent=2, default=str))
+        if report["pending"]:
+            print(
+                f"{len(report['duplicates'])} subscribers share an email; merge them or "
+                "rerun with --delete-duplicates",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+        return
+
+    pool = get_pool()
+    if args.command == "import":
+        if args.path == "-":
+            report = import_csv(pool, sys.stdin, args.batch_size, args.on_duplicate)
+        else:
+            with open(args.path, newline="") as f:
+                report = import_csv(pool, f, args.batch_size, args.on_duplicate)
+        print(json.dumps(report, indent=2))
+    elif args.command == "export":
+        if args.path == "-":
+            count = export_csv(pool, sys.stdout, args.fetch_size)
+        else:
+            with open(args.path, "w", newline="") as f:
+                count = export_csv(pool, f, args.fetch_size)
+        print(f"Exported {count} subscribers", file=sys.stderr)
+    else:
+        for subscriber_id, name, email, _, distance in subscribers_near(
+            pool, args.lat, args.lon, args.radius_km
+        ):
+            print(f"{subscriber_id}\t{distance:.1f} km\t{name} <{email}>")
+
+
+if __name__ == "__main__":
+    main()
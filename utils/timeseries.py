@@ -0,0 +1,207 @@
+# timeseries.py
+#
+# Append-only columnar storage for the ingested weather time series
+# (utils/ingest.py). One directory per store:
+#
+#   data/monitored/
+#       store.json             <- schema, committed row count, generation, attrs
+#       time.3.col             <- raw little-endian values, one file per column
+#       wind_speed.3.col
+#       ...
+#
+# One process appends; any number read. A row exists once store.json counts
+# it, so readers never see a partly written append.
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+MANIFEST_FILE = "store.json"
+
+
+def _write_json(path, data):
+    # Write-then-rename so readers see the old manifest or the new one
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class ColumnStore:
+    """
+    Fixed-width columns appended in lockstep. `columns` maps each name to
+    (dtype, shape): shape () for scalars, (n,) for a vector per row such as
+    class probabilities.
+
+    Reads are memory-mapped slices of the committed rows. `compact` drops
+    rows older than a cutoff by writing the survivors to a new generation
+    of column files; readers still holding the previous generation keep
+    their mappings until they refresh.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self.refresh(force=True)
+
+    @classmethod
+    def create(cls, directory, columns, attrs=None):
+        """
+        Open the store in `directory`, creating it if it doesn't exist.
+
+        Raises:
+            ValueError: If an existing store has different columns.
+        """
+        schema = {
+            name: {"dtype": np.dtype(dtype).str, "shape": list(shape)}
+            for name, (dtype, shape) in columns.items()
+        }
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            store = cls(directory)
+            if store.manifest["columns"] != schema:
+                raise ValueError(f"{directory} holds a store with different columns")
+            return store
+
+        os.makedirs(directory, exist_ok=True)
+        manifest = {
+            "columns": schema,
+            "rows": 0,
+            "generation": 0,
+            "attrs": attrs or {},
+            "updated_at": time.time(),
+        }
+        for name in schema:
+            open(os.path.join(directory, f"{name}.0.col"), "wb").close()
+        _write_json(manifest_path, manifest)
+        return cls(directory)
+
+    @property
+    def rows(self):
+        return self.manifest["rows"]
+
+    @property
+    def attrs(self):
+        return self.manifest["attrs"]
+
+    def _path(self, name, generation=None):
+        generation = self.manifest["generation"] if generation is None else generation
+        return os.path.join(self.directory, f"{name}.{generation}.col")
+
+    def _dtype(self, name):
+        column = self.manifest["columns"][name]
+        return np.dtype(column["dtype"]), tuple(column["shape"])
+
+    def refresh(self, force=False):
+        """
+        Re-read the manifest if another process has committed since the last
+        read. Returns whether anything changed.
+        """
+        manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+        mtime = os.stat(manifest_path).st_mtime_ns
+        if not force and mtime == self._manifest_mtime:
+            return False
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+        self._manifest_mtime = mtime
+        return True
+
+    def read(self, name, start=0, stop=None):
+        """
+        Committed values of one column for rows [start, stop), memory-mapped
+        read-only.
+        """
+        for attempt in range(2):
+            manifest = self.manifest
+            rows = manifest["rows"]
+            start_, stop_, _ = slice(start, stop).indices(rows)
+            dtype, shape = self._dtype(name)
+            if stop_ <= start_:
+                return np.empty((0,) + shape, dtype=dtype)
+            try:
+                values = np.memmap(
+                    self._path(name, manifest["generation"]), dtype=dtype, mode="r",
+                    shape=(rows,) + shape,
+                )
+            except FileNotFoundError:
+                # Compacted away since the manifest was read
+                if attempt:
+                    raise
+                self.refresh(force=True)
+                continue
+            return values[start_:stop_]
+
+    def read_rows(self, start=0, stop=None, names=None):
+        return {name: self.read(name, start, stop) for name in names or self.manifest["columns"]}
+
+    def append(self, values, attrs=None):
+        """
+        Append equal-length arrays for every column, then commit them (and
+        any `attrs` updates) in one manifest write.
+        """
+        with self._lock:
+            manifest = self.manifest
+            rows = manifest["rows"]
+            arrays = {}
+            for name in manifest["columns"]:
+                dtype, shape = self._dtype(name)
+                arrays[name] = np.ascontiguousarray(values[name], dtype=dtype).reshape((-1,) + shape)
+            lengths = {len(array) for array in arrays.values()}
+            if len(lengths) != 1:
+                raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+            count = lengths.pop()
+
+            for name, array in arrays.items():
+                path = self._path(name)
+                row_bytes = array.itemsize * int(np.prod(array.shape[1:], dtype=np.int64))
+                # Bytes past the committed rows are from an append that never
+                # committed; drop them before writing
+                if os.path.getsize(path) != rows * row_bytes:
+                    os.truncate(path, rows * row_bytes)
+                with open(path, "ab") as f:
+                    f.write(array.tobytes())
+
+            manifest = dict(manifest, rows=rows + count, updated_at=time.time())
+            if attrs:
+                manifest["attrs"] = dict(manifest["attrs"], **attrs)
+            _write_json(os.path.join(self.directory, MANIFEST_FILE), manifest)
+            self.manifest = manifest
+            return count
+
+    def compact(self, keep):
+        """
+        Rewrite the store keeping only rows where the boolean mask
+        `keep(store)` is true. Returns the number of rows dropped.
+        """
+        with self._lock:
+            mask = np.asarray(keep(self), dtype=bool)
+            dropped = int(self.rows - mask.sum())
+            if not dropped:
+                return 0
+            old_generation = self.manifest["generation"]
+            generation = old_generation + 1
+            for name in self.manifest["columns"]:
+                with open(self._path(name, generation), "wb") as f:
+                    f.write(np.ascontiguousarray(self.read(name)[mask]).tobytes())
+            manifest = dict(
+                self.manifest, rows=int(mask.sum()), generation=generation,
+                updated_at=time.time(),
+            )
+            _write_json(os.path.join(self.directory, MANIFEST_FILE), manifest)
+            self.manifest = manifest
+            for name in manifest["columns"]:
+                os.remove(self._path(name, old_generation))
+            return dropped
+
+    def describe(self):
+        return {
+            "path": self.directory,
+            "rows": self.rows,
+            "columns": list(self.manifest["columns"]),
+            "generation": self.manifest["generation"],
+            "updated_at": self.manifest["updated_at"],
+        }
@@ -0,0 +1,245 @@
+# track.py
+
+import csv
+import json
+import math
+from datetime import datetime, timezone
+from itertools import islice
+
+import numpy as np
+
+# Accepted column names for each track field (IBTrACS names first).
+FIELD_ALIASES = {
+    "time": ("ISO_TIME", "time", "timestamp", "datetime"),
+    "lat": ("USA_LAT", "LAT", "lat", "latitude"),
+    "lon": ("USA_LON", "LON", "lon", "lng", "longitude"),
+    "wind": ("USA_WIND", "WMO_WIND", "wind", "windSpeed", "wind_speed"),
+    "pressure": ("USA_PRES", "WMO_PRES", "pressure", "pres"),
+}
+
+def parse_time(value):
+    """
+    Seconds since the epoch for an ISO-8601 string or a numeric timestamp.
+    Naive times are taken as UTC, as in IBTrACS.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _pick(record, field):
+    for name in FIELD_ALIASES[field]:
+        value = record.get(name)
+        if value is not None and str(value).strip():
+            return value
+    raise ValueError(f"Track point is missing '{field}'")
+
+
+def _pick_optional(record, field):
+    # Like _pick, but a blank or NaN value is None rather than an error
+    for name in FIELD_ALIASES[field]:
+        value = record.get(name)
+        if value is not None and str(value).strip():
+            value = float(value)
+            return None if math.isnan(value) else value
+    return None
+
+
+def _to_point(record):
+    # None when wind or pressure is missing: IBTrACS leaves them blank for
+    # some fixes, and the resampler interpolates across the gap
+    wind = _pick_optional(record, "wind")
+    pressure = _pick_optional(record, "pressure")
+    if wind is None or pressure is None:
+        return None
+    return (
+        parse_time(_pick(record, "time")),
+        float(_pick(record, "lat")),
+        float(_pick(record, "lon")),
+        wind,
+        pressure,
+    )
+
+
+def iter_track_points(lines, fmt, counts=None):
+    """
+    Parse a track one line at a time.
+
+    Parameters:
+        lines (iterable): Text lines of the body.
+        fmt (str): "csv" (with a header row) or "ndjson".
+        counts (dict): Optional; its "points" and "skipped" entries are
+            incremented for every point read and every point skipped for
+            missing wind or pressure.
+
+    Yields:
+        tuple: (time, lat, lon, wind, pressure) with time in epoch seconds.
+    """
+    if fmt == "csv":
+        # IBTrACS CSVs carry a units row right after the header; skip it.
+        records = (
+            record for record in csv.DictReader(lines)
+            if not ("ISO_TIME" in record and not str(record["ISO_TIME"]).strip())
+        )
+    else:
+        records = (json.loads(line) for line in lines if line.strip())
+
+    for record in records:
+        point = _to_point(record)
+        if counts is not None:
+            counts["points"] = counts.get("points", 0) + 1
+            if point is None:
+                counts["skipped"] = counts.get("skipped", 0) + 1
+        if point is not None:
+            yield point
+
+
+def _lon_delta(a, b):
+    # Shortest signed change in longitude from a to b, so a track crossing
+    # the antimeridian (179 -> -179) moves 2 degrees rather than 358
+    return (b - a + 180.0) % 360.0 - 180.0
+
+
+def _wrap_lon(lon):
+    return (lon + 180.0) % 360.0 - 180.0
+
+
+def resample(points, interval):
+    """
+    Linearly interpolate a track onto a fixed time step.
+
+    Works pairwise on consecutive observations, so only two points are
+    held at a time. The first output is the first observation; later ones
+    fall every `interval` seconds up to the last observation. Longitude
+    follows the shorter way round and is returned in [-180, 180).
+    """
+    prev = None
+    next_time = None
+    for point in points:
+        if prev is None:
+            prev = point
+            next_time = point[0]
+            continue
+        if point[0] < prev[0]:
+            raise ValueError("Track times must be in increasing order")
+        span = point[0] - prev[0]
+        while next_time <= point[0]:
+            frac = (next_time - prev[0]) / span if span else 0.0
+            lat, lon, wind, pressure = (
+                a + (b - a) * frac for a, b in zip(prev[1:], point[1:])
+            )
+            lon = _wrap_lon(prev[2] + _lon_delta(prev[2], point[2]) * frac)
+            yield (next_time, lat, lon, wind, pressure)
+            next_time += interval
+        prev = point
+
+    if prev is not None and next_time == prev[0]:
+        # Single-observation track
+        yield prev
+
+
+def extrapolate(before, last, interval, horizon):
+    """
+    Future positions beyond the last sample, continuing its most recent
+    motion at constant speed with wind and pressure held constant.
+    """
+    if before is None or last[0] == before[0]:
+        velocity = (0.0, 0.0)
+    else:
+        dt = last[0] - before[0]
+        velocity = ((last[1] - before[1]) / dt, _lon_delta(before[2], last[2]) / dt)
+
+    steps = int(horizon // interval)
+    for step in range(1, steps + 1):
+        dt = step * interval
+        lat = min(max(last[1] + velocity[0] * dt, -90.0), 90.0)
+        lon = _wrap_lon(last[2] + velocity[1] * dt)
+        yield (last[0] + dt, lat, lon, last[3], last[4])
+
+
+def with_forecast(samples, interval, horizon):
+    """
+    Yield (sample, is_forecast) for the resampled track followed by its
+    extrapolated future positions.
+    """
+    before = last = None
+    for sample in samples:
+        before, last = last, sample
+        yield sample, False
+    if last is not None and horizon > 0:
+        for sample in extrapolate(before, last, interval, horizon):
+            yield sample, True
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def is_daytime(times, lat, lon):
+    """
+    Vectorized day/night from solar elevation (NOAA approximation).
+
+    Parameters:
+        times (array-like): Epoch seconds (UTC).
+        lat (array-like): Latitudes in degrees.
+        lon (array-like): Longitudes in degrees.
+
+    Returns:
+        numpy.ndarray: True where the sun is above the horizon, allowing
+        for refraction (-0.833 degrees).
+    """
+    times = np.asarray(times, dtype=np.float64)
+    stamps = times.astype("datetime64[s]")
+    year_start = stamps.astype("datetime64[Y]").astype("datetime64[s]")
+    day_of_year = np.floor((stamps - year_start).astype(np.float64) / 86400.0)
+    utc_hours = (times % 86400.0) / 3600.0
+
+    gamma = 2 * np.pi / 365 * (day_of_year + (utc_hours - 12) / 24)
+    eq_time = 229.18 * (
+        0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+        - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma)
+    )
+    decl = (
+        0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+        - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+        - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma)
+    )
+    solar_minutes = utc_hours * 60 + eq_time + 4 * np.asarray(lon, dtype=np.float64)
+    hour_angle = np.radians(solar_minutes / 4 - 180)
+    lat_rad = np.radians(np.asarray(lat, dtype=np.float64))
+
+    sin_elevation = (
+        np.sin(lat_rad) * np.sin(decl) + np.cos(lat_rad) * np.cos(decl) * np.cos(hour_angle)
+    )
+    return sin_elevation > np.sin(np.radians(-0.833))
+
+
+def track_features(samples, distance_fn):
+    """
+    Build the (n, 7) model feature matrix for a chunk of track samples.
+
+    Parameters:
+        samples (numpy.ndarray): (n, 5) time, lat, lon, wind, pressure.
+        distance_fn (callable): Vectorized distance-to-land lookup (km).
+
+    Returns:
+        tuple: (features, distance_to_land, day_night)
+    """
+    times, lat, lon, wind, pressure = samples.T
+    distance = np.asarray(distance_fn(lat, lon), dtype=np.float64)
+    day_night = is_daytime(times, lat, lon).astype(np.float64)
+    features = np.column_stack([wind, pressure, distance, lat, lon, wind / pressure, day_night])
+    return features, distance, day_night
@@ -0,0 +1,224 @@
+# weather.py
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import geohash
+from utils.cache import TTLCache
+from utils.metrics import stage
+
+OPENWEATHER_URL = "http://api.openweathermap.org/data/2.5/weather"
+
+
+def extract_weather_fields(weather_data):
+    """
+    Pull the fields the app uses out of an OpenWeather `weather` response.
+
+    Parameters:
+        weather_data (dict): Decoded OpenWeather JSON.
+
+    Returns:
+        dict: local_time, day_of_week, wind_speed (km/h), sea_level_pressure,
+        timezone_offset (seconds from UTC) and is_day.
+    """
+    timezone_offset = weather_data["timezone"]
+    wind_speed_mps = weather_data["wind"]["speed"]
+    sea_level_pressure = weather_data["main"]["pressure"]
+
+    return {
+        **local_time_fields(weather_data["dt"], timezone_offset),
+        "wind_speed": wind_speed_mps * 3.6,
+        "sea_level_pressure": sea_level_pressure,
+        "timezone_offset": timezone_offset,
+        "is_day": is_daytime(weather_data),
+    }
+
+
+def local_time_fields(dt, timezone_offset):
+    """
+    local_time ("%Y-%m-%d %H:%M:%S") and day_of_week at the observation's
+    location, from a Unix timestamp and its offset from UTC in seconds.
+    """
+    # Convert Unix timestamp to UTC datetime, then apply the timezone offset
+    local_time = datetime.utcfromtimestamp(dt) + timedelta(seconds=timezone_offset)
+    return {
+        "local_time": local_time.strftime("%Y-%m-%d %H:%M:%S"),
+        "day_of_week": local_time.strftime("%A"),
+    }
+
+
+def is_daytime(weather_data):
+    """
+    Whether the observation time falls between sunrise and sunset.
+
+    Mirrors the check index.html used to do client-side: the timezone
+    offset is applied to all three timestamps, so it cancels out and the
+    comparison can be made on the raw UTC values. Falls back to local
+    06:00-18:00 when the response has no sunrise/sunset (polar day/night).
+    """
+    dt = weather_data["dt"]
+    sys_data = weather_data.get("sys") or {}
+    sunrise = sys_data.get("sunrise")
+    sunset = sys_data.get("sunset")
+    if sunrise is None or sunset is None:
+        local_hour = datetime.utcfromtimestamp(dt + weather_data["timezone"]).hour
+        return 6 <= local_hour < 18
+    return sunrise <= dt < sunset
+
+
+class WeatherCache(TTLCache):
+    """
+    TTLCache of weather responses keyed by geohash cell; entry sizes are
+    the raw response body lengths.
+    """
+
+    def __init__(self, precision=6, ttl=300, max_entries=4096, max_bytes=16 * 1024 * 1024):
+        super().__init__(ttl=ttl, max_entries=max_entries, max_bytes=max_bytes)
+        self.precision = precision
+
+    def key(self, lat, lon):
+        return geohash.encode(float(lat), float(lon), self.precision)
+
+
+class _Call:
+    # One in-flight upstream request that concurrent callers wait on.
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class WeatherClient:
+    """
+    OpenWeather client with a pooled keep-alive session, a geohash/TTL cache
+    and single-flight deduplication of concurrent lookups for the same cell.
+    """
+
+    def __init__(self, api_key, cache=None, base_url=OPENWEATHER_URL, timeout=5.0, pool_size=10):
+        self.api_key = api_key
+        self.cache = cache if cache is not None else WeatherCache()
+        self.base_url = base_url
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_errors = 0
+        self.upstream_calls = 0
+        self.upstream_seconds = 0.0
+        self.upstream_max_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, api_key):
+        cache = WeatherCache(
+            precision=int(os.getenv("WEATHER_CACHE_PRECISION", "6")),
+            ttl=float(os.getenv("WEATHER_CACHE_TTL", "300")),
+            max_entries=int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "4096")),
+            max_bytes=int(os.getenv("WEATHER_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+        )
+        return cls(
+            api_key,
+            cache=cache,
+            base_url=os.getenv("OPENWEATHER_URL", OPENWEATHER_URL),
+            timeout=float(os.getenv("WEATHER_TIMEOUT", "5")),
+            pool_size=int(os.getenv("WEATHER_POOL_SIZE", "10")),
+        )
+
+    def _count(self, name):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def fetch(self, lat, lon, api_key=None):
+        """
+        Return the OpenWeather response for a point, from cache when fresh.
+
+        Raises:
+            requests.RequestException: If the upstream call fails or times out.
+        """
+        key = self.cache.key(lat, lon)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count("hits")
+            return cached
+
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+
+        if not leader:
+            self._count("coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        self._count("misses")
+        try:
+            call.result = self._request(lat, lon, api_key or self.api_key, key)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def _request(self, lat, lon, api_key, key):
+        params = {"lat": lat, "lon": lon, "appid": api_key, "units": "metric"}
+        start = time.perf_counter()
+        try:
+            with stage("upstream_weather"):
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            weather_data = response.json()
+        except Exception:
+            self._count("upstream_errors")
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self.upstream_calls += 1
+                self.upstream_seconds += elapsed
+                self.upstream_max_seconds = max(self.upstream_max_seconds, elapsed)
+
+        self.cache.put(key, weather_data, len(response.content))
+        return weather_data
+
+    def stats(self):
+        with self._stats_lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                "upstream_calls": self.upstream_calls,
+                "upstream_errors": self.upstream_errors,
+                "upstream_avg_ms": (
+                    1000 * self.upstream_seconds / self.upstream_calls
+                    if self.upstream_calls
+                    else 0.0
+                ),
+                "upstream_max_ms": 1000 * self.upstream_max_seconds,
+                "cache_entries": len(self.cache),
+                "cache_bytes": self.cache.size_bytes,
+                "cache_evictions": self.cache.evictions,
+                "precision": self.cache.precision,
+                "ttl_seconds": self.cache.ttl,
+            }